@@ -0,0 +1,69 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    Runs a batch function over the items submitted by concurrent callers.
+    A batch starts with the first waiting request and is run once it holds `max_batch_size` items
+    or `max_wait` seconds later; every caller gets the rows of its own items back.
+    `fn` takes a list of items and returns an array with one row per item.
+    """
+
+    def __init__(self, fn, max_batch_size: int = 64, max_wait: float = 0.005, name: str = "micro-batcher"):
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batches = 0  # number of fn calls, for monitoring
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, items) -> Future:
+        """Queues items; the future resolves to an array with one row per item."""
+        future = Future()
+        self._queue.put((list(items), future))
+        return future
+
+    def __call__(self, items) -> np.ndarray:
+        return self.submit(items).result()
+
+    async def call_async(self, items) -> np.ndarray:
+        """Like calling the batcher, for async code: the event loop is not blocked while the batch runs."""
+        return await asyncio.wrap_future(self.submit(items))
+
+    def _run(self):
+        while True:
+            requests = [self._queue.get()]
+            size = len(requests[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    request = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                requests.append(request)
+                size += len(request[0])
+            self._run_batch(requests)
+
+    def _run_batch(self, requests):
+        items = [item for request_items, _ in requests for item in request_items]
+        try:
+            outputs = []
+            for start in range(0, len(items), self.max_batch_size):
+                outputs.append(np.asarray(self.fn(items[start:start + self.max_batch_size])))
+                self.batches += 1
+            results = np.concatenate(outputs) if outputs else np.zeros(0)
+        except Exception as e:
+            for _, future in requests:
+                future.set_exception(e)
+            return
+        start = 0
+        for request_items, future in requests:
+            future.set_result(results[start:start + len(request_items)])
+            start += len(request_items)
@@ -0,0 +1,367 @@
+import json
+import math
+import mmap
+import os
+import shutil
+from collections import Counter
+import numpy as np
+from app.chunk_store import build_id, open_chunks
+from app.fusion import top_n
+from app.metadata_index import restrict
+from app.manifest import file_hash
+from app.tokenizer import tokenizer, tokenize_batch
+
+SNAPSHOT_SUFFIX = ".bm25"
+SNAPSHOT_ARRAYS = ("indptr", "doc_ids", "impacts", "tfs", "max_impacts", "doc_len", "idf")
+# The vocabulary is saved sorted by UTF-8 bytes (vocab.bin + byte offsets) with the term id of each entry,
+# so a loaded snapshot looks terms up by binary search over memory maps instead of building a dict
+VOCAB_FILES = ("vocab.bin", "vocab_offsets.npy", "vocab_ids.npy")
+
+
+# Slack on the term upper bounds of top_k pruning, so float rounding never drops a document that belongs in the top k
+BOUND_SLACK = 1e-6
+
+
+def max_impacts(indptr: np.ndarray, impacts: np.ndarray) -> np.ndarray:
+    """Highest impact in the postings of every term (0 for terms without postings): the score bound of top_k."""
+    indptr = np.asarray(indptr)
+    result = np.zeros(len(indptr) - 1, dtype=np.float32)
+    starts = np.flatnonzero(np.diff(indptr) > 0)
+    if len(starts):
+        result[starts] = np.maximum.reduceat(np.asarray(impacts), indptr[starts])
+    return result
+
+
+def snapshot_path(chunks_path: str) -> str:
+    return chunks_path + SNAPSHOT_SUFFIX
+
+
+def corpus_version(chunks_path: str) -> str:
+    """
+    Version of a chunks file for BM25 snapshots: the build ID recorded by the chunks writer, file size and
+    tokenizer. Files without a build ID (older builds) fall back to a content hash, which reads the whole file.
+    """
+    chunks_build = build_id(chunks_path)
+    if chunks_build is None:
+        chunks_build = file_hash(chunks_path)
+    return f"{chunks_build}:{os.path.getsize(chunks_path)}:{tokenizer.name}"
+
+
+class BM25Index:
+    """
+    BM25 over an inverted index, with the scoring of rank_bm25.BM25Okapi
+    (idf floor of epsilon * average idf, repeated query terms counted again).
+    Postings are CSR arrays: the documents of term t are doc_ids[indptr[t]:indptr[t + 1]] (ascending),
+    with their precomputed BM25 impact (term score) in impacts. A query only touches the postings
+    of its own terms.
+    """
+
+    def __init__(self, corpus=(), k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        vocab = {}
+        term_ids, doc_ids, tfs, doc_len = [], [], [], []
+        for doc_id, tokens in enumerate(corpus):
+            doc_len.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                term_ids.append(vocab.setdefault(term, len(vocab)))
+                doc_ids.append(doc_id)
+                tfs.append(tf)
+        self.vocab = vocab
+        self._build(np.asarray(term_ids, dtype=np.int64), np.asarray(doc_ids, dtype=np.int64),
+                    np.asarray(tfs, dtype=np.float64), np.asarray(doc_len, dtype=np.int64))
+
+    def _build(self, term_ids, doc_ids, tfs, doc_len):
+        self.corpus_size = len(doc_len)
+        self.doc_len = doc_len
+        self.avgdl = float(doc_len.sum()) / self.corpus_size if self.corpus_size else 0.0
+
+        df = np.bincount(term_ids, minlength=len(self.vocab))
+        idf = np.log(self.corpus_size - df + 0.5) - np.log(df + 0.5)
+        self.average_idf = float(math.fsum(idf)) / len(idf) if len(idf) else 0.0
+        idf[idf < 0] = self.epsilon * self.average_idf
+        self.idf = idf
+
+        # Stable sort by term keeps the documents of every term in ascending order
+        order = np.argsort(term_ids, kind="stable")
+        self.indptr = np.concatenate([[0], np.cumsum(df)]).astype(np.int64)
+        self.doc_ids = doc_ids[order].astype(np.int32)
+        tf = tfs[order]
+        norm = self.k1 * (1 - self.b + self.b * doc_len[self.doc_ids] / self.avgdl) if self.avgdl else self.k1
+        self.impacts = (idf[term_ids[order]] * (tf * (self.k1 + 1) / (tf + norm))).astype(np.float32)
+        self.tfs = tf.astype(np.int32)  # kept so later builds can reuse these postings (see update)
+        self.max_impacts = max_impacts(self.indptr, self.impacts)
+
+    @classmethod
+    def update(cls, previous, old_rows, new_docs, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25):
+        """
+        Index of a corpus whose document i is document old_rows[i] of the `previous` index or, where old_rows[i]
+        is -1, the next token list of `new_docs`. The postings of reused documents are copied, so only new
+        documents are tokenized; the result equals BM25Index over the whole corpus.
+        """
+        old_rows = np.asarray(old_rows, dtype=np.int64)
+        reused = np.flatnonzero(old_rows >= 0)
+        new_row_of_old = np.full(previous.corpus_size, -1, dtype=np.int64)
+        new_row_of_old[old_rows[reused]] = reused
+        posting_terms = np.repeat(np.arange(len(previous.indptr) - 1), np.diff(previous.indptr))
+        posting_docs = new_row_of_old[previous.doc_ids]
+        keep = posting_docs >= 0
+        doc_len = np.zeros(len(old_rows), dtype=np.int64)
+        doc_len[reused] = np.asarray(previous.doc_len)[old_rows[reused]]
+
+        vocab = dict(previous.vocab.items())  # new terms get the next ids
+        term_ids, doc_ids, tfs = [], [], []
+        for doc_id, tokens in zip(np.flatnonzero(old_rows < 0).tolist(), new_docs):
+            doc_len[doc_id] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                term_ids.append(vocab.setdefault(term, len(vocab)))
+                doc_ids.append(doc_id)
+                tfs.append(tf)
+        term_ids = np.concatenate([posting_terms[keep], np.asarray(term_ids, dtype=np.int64)])
+        doc_ids = np.concatenate([posting_docs[keep], np.asarray(doc_ids, dtype=np.int64)])
+        tfs = np.concatenate([np.asarray(previous.tfs)[keep], np.asarray(tfs, dtype=np.int32)]).astype(np.float64)
+
+        # Terms that no document uses any more are dropped, as a fresh build would not have them
+        used = np.bincount(term_ids, minlength=len(vocab)) > 0
+        new_term_id = np.cumsum(used) - 1
+        index = cls.__new__(cls)
+        index.k1, index.b, index.epsilon = k1, b, epsilon
+        index.vocab = {term: int(new_term_id[term_id]) for term, term_id in vocab.items() if used[term_id]}
+        order = np.argsort(doc_ids, kind="stable")  # document order within every term, as _build expects
+        index._build(new_term_id[term_ids[order]], doc_ids[order], tfs[order], doc_len)
+        return index
+
+    def _query_terms(self, query):
+        """(term id, number of occurrences in the query) of the known query terms."""
+        counts = Counter(term for term in map(self.vocab.get, query) if term is not None)
+        return list(counts.items())
+
+    def _postings(self, term: int):
+        start, stop = self.indptr[term], self.indptr[term + 1]
+        return self.doc_ids[start:stop], self.impacts[start:stop]
+
+    def get_scores(self, query) -> np.ndarray:
+        """Scores of all documents, like BM25Okapi.get_scores."""
+        scores = np.zeros(self.corpus_size)
+        for term, count in self._query_terms(query):
+            docs, impacts = self._postings(term)
+            scores[docs] += count * impacts
+        return scores
+
+    def get_batch_scores(self, query, doc_ids) -> np.ndarray:
+        """Scores of the given documents only."""
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        scores = np.zeros(len(doc_ids))
+        for term, count in self._query_terms(query):
+            docs, impacts = self._postings(term)
+            pos = np.searchsorted(docs, doc_ids)
+            found = pos < len(docs)
+            found[found] = docs[pos[found]] == doc_ids[found]
+            scores[found] += count * impacts[pos[found]]
+        return scores
+
+    def top_k(self, query, k: int, candidates: np.ndarray = None):
+        """
+        The `k` best documents containing at least one query term, best first (ties keep document order).
+        Only documents in the sorted array `candidates` (rows of a metadata filter) are returned.
+        Returns (doc indices, scores).
+
+        MaxScore pruning: terms are taken by descending score bound (query count * highest impact). Once the
+        bounds of the remaining terms add up to less than the k-th best partial score, documents that contain
+        none of the terms taken so far cannot reach the top k. The remaining postings are then only probed
+        (binary search) for the surviving documents instead of being scanned. Results equal the exhaustive scan.
+        """
+        terms = self._query_terms(query)
+        if not terms:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        postings = [self._postings(term) for term, _ in terms]
+        survivors = self._maxscore_candidates(terms, postings, k, candidates)
+        if survivors is not None:
+            scores = np.zeros(len(survivors))
+            # Summed in query term order, like the exhaustive scan, so scores (and ties) are bit-identical
+            for (_, count), (term_docs, impacts) in zip(terms, postings):
+                pos = np.minimum(np.searchsorted(term_docs, survivors), len(term_docs) - 1)
+                hit = term_docs[pos] == survivors
+                scores[hit] += count * impacts[pos[hit]].astype(np.float64)
+            best = top_n(scores, k)
+            return survivors[best].astype(np.int64), scores[best]
+        docs = np.concatenate([docs for docs, _ in postings])
+        weights = np.concatenate([count * impacts.astype(np.float64)
+                                  for (_, count), (_, impacts) in zip(terms, postings)])
+        matches, inverse = np.unique(docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights)
+        if candidates is not None:
+            keep = restrict(matches, candidates)
+            matches, scores = matches[keep], scores[keep]
+        best = top_n(scores, k)
+        return matches[best].astype(np.int64), scores[best]
+
+    def _maxscore_candidates(self, terms, postings, k: int, candidates: np.ndarray = None):
+        """
+        Sorted documents that can still reach the top k once the terms with the highest bounds are scored,
+        or None when nothing can be pruned (the caller scans exhaustively).
+        """
+        if k <= 0 or len(terms) < 2:
+            return None
+        bounds = np.array([count * float(self.max_impacts[term]) for term, count in terms])
+        if bounds.min() < 0:
+            return None  # negative impacts: partial scores are no lower bounds
+        order = np.argsort(-bounds, kind="stable")
+        for taken in range(1, len(terms)):
+            rest = float(bounds[order[taken:]].sum()) * (1 + BOUND_SLACK)
+            docs = np.concatenate([postings[t][0] for t in order[:taken]])
+            weights = np.concatenate([terms[t][1] * postings[t][1].astype(np.float64) for t in order[:taken]])
+            matches, inverse = np.unique(docs, return_inverse=True)
+            partial = np.bincount(inverse, weights=weights)
+            if candidates is not None:
+                keep = restrict(matches, candidates)
+                matches, partial = matches[keep], partial[keep]
+            if len(matches) < k:
+                continue
+            threshold = -np.partition(-partial, k - 1)[k - 1]
+            if rest < threshold:
+                return matches[partial + rest >= threshold]
+        return None
+
+    def split(self, shard_of_doc, n_shards: int) -> list:
+        """
+        Splits the index by document: shard s holds the documents with shard_of_doc == s, renumbered
+        in ascending order. idf and avgdl stay those of the whole corpus, so every document keeps its score.
+        """
+        shard_of_doc = np.asarray(shard_of_doc, dtype=np.int64)
+        n_terms = len(self.indptr) - 1
+        local = np.empty(self.corpus_size, dtype=np.int64)
+        rows = [np.flatnonzero(shard_of_doc == s) for s in range(n_shards)]
+        for shard_rows in rows:
+            local[shard_rows] = np.arange(len(shard_rows))
+        terms = np.repeat(np.arange(n_terms), np.diff(self.indptr))
+        posting_shard = shard_of_doc[self.doc_ids]
+        # Stable: within a shard, postings stay sorted by term, then document
+        order = np.argsort(posting_shard, kind="stable")
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(posting_shard, minlength=n_shards))])
+        shards = []
+        for s in range(n_shards):
+            postings = order[bounds[s]:bounds[s + 1]]
+            index = BM25Index.__new__(BM25Index)
+            for key in ("k1", "b", "epsilon", "avgdl", "average_idf", "idf", "vocab"):
+                setattr(index, key, getattr(self, key))
+            index.corpus_size = len(rows[s])
+            index.doc_len = np.asarray(self.doc_len[rows[s]])
+            index.indptr = np.concatenate([[0], np.cumsum(np.bincount(terms[postings], minlength=n_terms))])
+            index.indptr = index.indptr.astype(np.int64)
+            index.doc_ids = local[self.doc_ids[postings]].astype(np.int32)
+            index.impacts = np.asarray(self.impacts[postings])
+            index.tfs = np.asarray(self.tfs[postings])
+            index.max_impacts = max_impacts(index.indptr, index.impacts)
+            shards.append(index)
+        return shards
+
+    def save(self, path: str, version: str = ""):
+        """Writes the index as a snapshot directory of .npy arrays plus the sorted vocabulary and parameters."""
+        tmp_path = path + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for name in SNAPSHOT_ARRAYS:
+            np.save(os.path.join(tmp_path, name + ".npy"), getattr(self, name))
+        terms = sorted((term.encode("utf-8"), term_id) for term, term_id in self.vocab.items())
+        with open(os.path.join(tmp_path, "vocab.bin"), "wb") as f:
+            f.write(b"".join(term for term, _ in terms))
+        np.save(os.path.join(tmp_path, "vocab_offsets.npy"),
+                np.concatenate([[0], np.cumsum([len(term) for term, _ in terms], dtype=np.uint64)]).astype(np.uint64))
+        np.save(os.path.join(tmp_path, "vocab_ids.npy"), np.asarray([term_id for _, term_id in terms], dtype=np.int64))
+        with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": version, "k1": self.k1, "b": self.b, "epsilon": self.epsilon,
+                       "corpus_size": self.corpus_size, "avgdl": self.avgdl, "average_idf": self.average_idf}, f)
+        # Swap the directory in; a reader never sees a half-written snapshot
+        shutil.rmtree(path + ".old", ignore_errors=True)
+        if os.path.exists(path):
+            os.replace(path, path + ".old")
+        os.replace(tmp_path, path)
+        shutil.rmtree(path + ".old", ignore_errors=True)
+
+    @classmethod
+    def load(cls, path: str, version: str = None):
+        """
+        Loads a snapshot with memory-mapped postings and vocabulary.
+        Returns None if there is no (complete) snapshot or it was built for another `version`.
+        """
+        meta_path = os.path.join(path, "meta.json")
+        files = [name + ".npy" for name in SNAPSHOT_ARRAYS] + list(VOCAB_FILES)
+        if not os.path.exists(meta_path) or not all(os.path.exists(os.path.join(path, name)) for name in files):
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if version is not None and meta["version"] != version:
+            return None
+        index = cls.__new__(cls)
+        for key in ("k1", "b", "epsilon", "corpus_size", "avgdl", "average_idf"):
+            setattr(index, key, meta[key])
+        for name in SNAPSHOT_ARRAYS:
+            setattr(index, name, np.load(os.path.join(path, name + ".npy"), mmap_mode="r"))
+        index.vocab = MappedVocab(path)
+        return index
+
+
+class MappedVocab:
+    """Read-only term -> term id mapping of a snapshot, binary-searched over its memory-mapped sorted vocabulary."""
+
+    def __init__(self, path: str):
+        self._offsets = np.load(os.path.join(path, "vocab_offsets.npy"), mmap_mode="r")
+        self._ids = np.load(os.path.join(path, "vocab_ids.npy"), mmap_mode="r")
+        with open(os.path.join(path, "vocab.bin"), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _term(self, i: int) -> bytes:
+        return self._data[int(self._offsets[i]):int(self._offsets[i + 1])]
+
+    def get(self, term: str, default=None):
+        key = term.encode("utf-8")
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return int(self._ids[lo]) if lo < len(self) and self._term(lo) == key else default
+
+    def __contains__(self, term: str) -> bool:
+        return self.get(term) is not None
+
+    def __getitem__(self, term: str) -> int:
+        term_id = self.get(term)
+        if term_id is None:
+            raise KeyError(term)
+        return term_id
+
+    def items(self):
+        """(term, term id) pairs in sorted term order."""
+        for i in range(len(self)):
+            yield self._term(i).decode("utf-8"), int(self._ids[i])
+
+    def __iter__(self):
+        return (term for term, _ in self.items())
+
+
+def build_snapshot(chunks_path: str, workers: int = 1, previous=None) -> BM25Index:
+    """
+    Tokenizes a chunks file and saves its BM25 snapshot next to it.
+    `previous` is (BM25 index of an earlier build, previous row of every chunk or -1): the postings of
+    reused chunks are copied from it (see BM25Index.update) and only the other chunks are tokenized.
+    """
+    chunks = open_chunks(chunks_path)
+    if previous is None:
+        index = BM25Index(tokenize_batch((chunk["content"] for chunk in chunks), workers=workers))
+    else:
+        previous_index, old_rows = previous
+        new_rows = np.flatnonzero(np.asarray(old_rows) < 0)
+        index = BM25Index.update(previous_index, old_rows,
+                                 tokenize_batch((chunks.content(int(row)) for row in new_rows), workers=workers))
+    chunks.close()
+    index.save(snapshot_path(chunks_path), corpus_version(chunks_path))
+    return index
@@ -0,0 +1,213 @@
+import json
+import mmap
+import os
+import threading
+import uuid
+import numpy as np
+from cachetools import LRUCache
+
+# A JSONL chunk store is made of four files:
+#   <path>          one chunk per line: {"id", "content", "metadata"}
+#   <path>.idx.npy  uint64 byte offset of every line, plus the final file size
+#   <path>.meta     one {"id", "metadata"} line per chunk, loaded eagerly
+#   <path>.build    random ID of the build that wrote the store (see build_id)
+# Builds store chunks as spans: a chunk has no "content", only metadata "text_id", "char_start" and "char_end",
+# and its text is sliced on read from the preprocessed document / page / record text, saved once in a second
+# store, <chunks path>.texts. Overlapping chunk text is therefore not duplicated on disk.
+INDEX_SUFFIX = ".idx.npy"
+META_SUFFIX = ".meta"
+BUILD_SUFFIX = ".build"
+TEXTS_SUFFIX = ".texts"
+TEXT_CACHE_SIZE = 64  # decoded source texts kept per store; neighbouring chunks share their text
+
+
+def write_build_id(path: str, suffix: str = ""):
+    """Writes a new build ID for the chunks file `path` (to <path>.build<suffix>) and returns it."""
+    new_id = uuid.uuid4().hex
+    with open(path + BUILD_SUFFIX + suffix, "w", encoding="utf-8") as f:
+        f.write(new_id)
+    return new_id
+
+
+def build_id(path: str):
+    """ID of the build that wrote the chunks file `path`, None for files without one (older builds)."""
+    if not os.path.exists(path + BUILD_SUFFIX):
+        return None
+    with open(path + BUILD_SUFFIX, "r", encoding="utf-8") as f:
+        return f.read().strip() or None
+
+
+class ChunkStoreWriter:
+    """Streams chunks into a JSONL chunk store. Files are swapped in atomically on close()."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._data = open(path + ".tmp", "wb")
+        self._meta = open(path + META_SUFFIX + ".tmp", "w", encoding="utf-8")
+        self._offsets = [0]
+
+    def add(self, chunk: dict):
+        line = json.dumps(chunk, ensure_ascii=False).encode("utf-8") + b"\n"
+        self._data.write(line)
+        self._offsets.append(self._offsets[-1] + len(line))
+        self._meta.write(json.dumps({"id": chunk["id"], "metadata": chunk["metadata"]}, ensure_ascii=False) + "\n")
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def close(self):
+        self._data.close()
+        self._meta.close()
+        with open(self.path + INDEX_SUFFIX + ".tmp", "wb") as f:
+            np.save(f, np.asarray(self._offsets, dtype=np.uint64))
+        write_build_id(self.path, ".tmp")
+        for suffix in (META_SUFFIX, INDEX_SUFFIX, BUILD_SUFFIX, ""):
+            os.replace(self.path + suffix + ".tmp", self.path + suffix)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._data.close()
+            self._meta.close()
+
+
+class ChunkStore:
+    """
+    Read side of a JSONL chunk store.
+    IDs and metadata are loaded eagerly; chunk content is read on demand from a memory map.
+    Behaves like a read-only list of chunk dicts.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.ids, self.metadatas = [], []
+        with open(path + META_SUFFIX, "r", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                self.ids.append(entry["id"])
+                self.metadatas.append(entry["metadata"])
+        self.id_to_index = {cid: idx for idx, cid in enumerate(self.ids)}
+        self.offsets = np.load(path + INDEX_SUFFIX, mmap_mode="r")
+
+        size = os.path.getsize(path)
+        if len(self.offsets) != len(self.ids) + 1 or int(self.offsets[-1]) != size:
+            raise ValueError(f"{path} does not match its index; rebuild the chunk store.")
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.texts = SourceTexts(path)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, idx: int) -> dict:
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        return self.texts.resolve(json.loads(self._mm[int(self.offsets[idx]):int(self.offsets[idx + 1])]))
+
+    def __iter__(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                yield self.texts.resolve(json.loads(line))
+
+    def content(self, idx: int) -> str:
+        return self[idx]["content"]
+
+    def get(self, chunk_id: str) -> dict:
+        """Fetches a chunk by ID, None if unknown."""
+        idx = self.id_to_index.get(chunk_id)
+        return None if idx is None else self[idx]
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._file.close()
+        self.texts.close()
+
+
+class ChunkList(list):
+    """
+    In-memory chunks from a JSON array, with the same accessors as ChunkStore.
+    Span chunks get their content from the source text store on load. Chunks without an "id" get their
+    index as ID, so every chunk the store hands out carries one.
+    """
+
+    def __init__(self, chunks, texts=None):
+        self.texts = texts or SourceTexts(None)
+        super().__init__(self.texts.resolve(c) for c in chunks)
+        self.ids = [c.setdefault("id", str(idx)) for idx, c in enumerate(self)]
+        self.metadatas = [c["metadata"] for c in self]
+        self.id_to_index = {cid: idx for idx, cid in enumerate(self.ids)}
+
+    def content(self, idx: int) -> str:
+        return self[idx]["content"]
+
+    def get(self, chunk_id: str) -> dict:
+        idx = self.id_to_index.get(chunk_id)
+        return None if idx is None else self[idx]
+
+    def close(self):
+        self.texts.close()
+
+
+class SourceTexts:
+    """
+    Source text store of a chunks file (<chunks path>.texts), opened on first use.
+    Resolves span chunks to their text; recently used texts are kept decoded.
+    """
+
+    def __init__(self, chunks_path: str = None):
+        self.path = chunks_path + TEXTS_SUFFIX if chunks_path else None
+        self._store = None
+        self._cache = LRUCache(maxsize=TEXT_CACHE_SIZE)
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return self.path is not None and os.path.exists(self.path + META_SUFFIX)
+
+    def get(self, text_id: str):
+        """Text by ID, None if unknown."""
+        with self._lock:
+            if text_id in self._cache:
+                return self._cache[text_id]
+            if self._store is None:
+                if not self.available:
+                    return None
+                self._store = ChunkStore(self.path)
+            entry = self._store.get(text_id)
+            text = None if entry is None else entry["content"]
+            self._cache[text_id] = text
+            return text
+
+    def resolve(self, chunk: dict) -> dict:
+        """Fills in the "content" of a span chunk (one without content) from its source text."""
+        if "content" not in chunk:
+            meta = chunk["metadata"]
+            text = self.get(meta["text_id"])
+            if text is None:
+                raise ValueError(f"Source text '{meta['text_id']}' of chunk '{chunk.get('id')}' is missing "
+                                 f"from {self.path}; rebuild the chunks.")
+            chunk["content"] = text[meta["char_start"]:meta["char_end"]]
+        return chunk
+
+    def close(self):
+        with self._lock:
+            if self._store is not None:
+                self._store.close()
+                self._store = None
+            self._cache.clear()
+
+
+def open_chunks(path: str):
+    """Opens a chunks file: a JSONL chunk store (.jsonl) or a JSON array (anything else)."""
+    if path.endswith(".jsonl"):
+        return ChunkStore(path)
+    with open(path, "r", encoding="utf-8") as f:
+        return ChunkList(json.load(f), SourceTexts(path))
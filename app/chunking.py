@@ -1,4 +1,6 @@
-from typing import List
+from typing import Callable, List, Optional, Tuple
+
+Span = Tuple[int, int]
 
 
 def semantic_chunk(text: str, max_chunk_size: int = 500) -> List[str]:
@@ -37,6 +39,7 @@ def semantic_chunk_with_overlap(text: str, max_chunk_size: int = 500, overlap: i
     lines = text.split("\n")
     chunks = []
     current_chunk_lines = []
+    current_length = -1  # length of "\n".join(current_chunk_lines)
 
     i = 0
     while i < len(lines):
@@ -45,12 +48,13 @@ def semantic_chunk_with_overlap(text: str, max_chunk_size: int = 500, overlap: i
             i += 1
             continue
         current_chunk_lines.append(line)
+        current_length += len(line) + 1
         # Check if chunk reached max size
-        current_text = "\n".join(current_chunk_lines)
-        if len(current_text) >= max_chunk_size:
-            chunks.append(current_text.strip())
+        if current_length >= max_chunk_size:
+            chunks.append("\n".join(current_chunk_lines).strip())
             # Prepare next chunk with overlap
             current_chunk_lines = current_chunk_lines[-overlap:] if overlap > 0 else []
+            current_length = sum(len(l) + 1 for l in current_chunk_lines) - 1
         i += 1
     if current_chunk_lines:
         chunks.append("\n".join(current_chunk_lines).strip())
@@ -95,3 +99,98 @@ def chunk_document(parsed_doc, max_lines=5, overlap=1):
         return semantic_chunk_with_line_overlap("\n".join(lines), max_lines=max_lines, overlap=overlap)
     else:
         return semantic_chunk_with_line_overlap(text, max_lines=max_lines, overlap=overlap)
+
+
+# Offset-based chunking: the functions below compute chunk boundaries as (start, end) character offsets
+# into the (preprocessed) document instead of copying lines into new strings. On preprocessed text, where
+# lines carry no surrounding whitespace and there are no blank lines, text[start:end] is exactly the chunk
+# the string-based function of the same strategy returns.
+
+
+def html_line_filter(line: str) -> bool:
+    return len(line.strip()) > 3
+
+
+def line_spans(text: str, keep: Optional[Callable[[str], bool]] = None) -> List[Span]:
+    """Offsets of the non-empty lines of `text` (only lines passing `keep`), without surrounding whitespace."""
+    spans = []
+    pos = 0
+    for line in text.split("\n"):
+        stripped = line.strip()
+        if stripped and (keep is None or keep(line)):
+            start = pos + len(line) - len(line.lstrip())
+            spans.append((start, start + len(stripped)))
+        pos += len(line) + 1
+    return spans
+
+
+def line_overlap_spans(text: str, max_lines: int = 5, overlap: int = 1,
+                       keep: Optional[Callable[[str], bool]] = None) -> List[Span]:
+    """Offset version of semantic_chunk_with_line_overlap."""
+    lines = line_spans(text, keep)
+    spans = []
+    i = 0
+    while i < len(lines):
+        window = lines[i:i + max_lines]
+        spans.append((window[0][0], window[-1][1]))
+        i += max_lines - overlap
+    return spans
+
+
+def size_overlap_spans(text: str, max_chunk_size: int = 500, overlap: int = 1) -> List[Span]:
+    """Offset version of semantic_chunk_with_overlap."""
+    spans = []
+    current = []  # line spans of the current chunk
+    current_length = -1
+    for line in line_spans(text):
+        current.append(line)
+        current_length += line[1] - line[0] + 1
+        if current_length >= max_chunk_size:
+            spans.append((current[0][0], current[-1][1]))
+            current = current[-overlap:] if overlap > 0 else []
+            current_length = sum(end - start + 1 for start, end in current) - 1
+    if current:
+        spans.append((current[0][0], current[-1][1]))
+    return spans
+
+
+def semantic_spans(text: str, max_chunk_size: int = 500) -> List[Span]:
+    """
+    Offset version of semantic_chunk: bullets and table rows always stay with the current chunk.
+    Unlike semantic_chunk it never emits an empty chunk and never drops the last one.
+    """
+    spans = []
+    start = end = None
+    length = 0
+    for line_start, line_end in line_spans(text):
+        line = text[line_start:line_end]
+        is_special_block = line.startswith("-") or "|" in line
+        if start is not None and length + len(line) + 1 > max_chunk_size and not is_special_block:
+            spans.append((start, end))
+            start = None
+        if start is None:
+            start, length = line_start, len(line)
+        else:
+            length += len(line) + 1
+        end = line_end
+    if start is not None:
+        spans.append((start, end))
+    return spans
+
+
+def chunk_document_spans(parsed_doc, max_lines=5, overlap=1) -> List[Span]:
+    """Offset version of chunk_document: same per-type strategy, returns spans into parsed_doc['content']."""
+    doc_type = parsed_doc['metadata'].get('type', 'unknown')
+    keep = html_line_filter if doc_type == 'html' else None
+    return line_overlap_spans(parsed_doc['content'], max_lines=max_lines, overlap=overlap, keep=keep)
+
+
+def materialize(text: str, span: Span, keep: Optional[Callable[[str], bool]] = None) -> str:
+    """
+    Text of a chunk span. `keep` re-applies a line filter to the lines inside the span
+    (e.g. html_line_filter, for the short lines chunk_document drops from HTML chunks).
+    """
+    piece = text[span[0]:span[1]]
+    if keep is None:
+        return piece
+    return "\n".join(line for line in piece.split("\n") if keep(line))
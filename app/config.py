@@ -5,7 +5,21 @@ BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 DOCUMENTS_DIR = os.path.join(BASE_DIR, "documents")
 OUTPUT_DIR = os.path.join(BASE_DIR, "output")
 CHROMA_DB_DIR = os.path.join(OUTPUT_DIR, "chroma_db")
-CHUNKS_FILE = os.path.join(OUTPUT_DIR, "chunks.json")
+CHUNKS_FILE = os.path.join(OUTPUT_DIR, "chunks.jsonl")  # .json for a single JSON array
+MANIFEST_FILE = os.path.join(OUTPUT_DIR, "manifest.json")
+EMBEDDING_STORE_DIR = os.path.join(OUTPUT_DIR, "embeddings")
+DENSE_INDEX_DIR = os.path.join(OUTPUT_DIR, "dense_index")
+HNSW_INDEX_DIR = os.path.join(OUTPUT_DIR, "hnsw_index")
+EXPANSION_CACHE_FILE = os.path.join(OUTPUT_DIR, "expansions.sqlite")
+ONNX_MODEL_DIR = os.path.join(OUTPUT_DIR, "onnx_models")
+
+# Models
+EMBED_MODEL_NAME = "all-MiniLM-L6-v2"
+CROSS_ENCODER_MODEL_NAME = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+EXPANSION_MODEL_NAME = "google/flan-t5-small"
+INFERENCE_BACKEND = "torch"  # torch | onnx (experimental; ONNX Runtime on CPU, needs optimum[onnxruntime])
+ONNX_QUANTIZATION = None  # None | "avx2" | "avx512" | "avx512_vnni" | "arm64": dynamic int8 quantization
+INFERENCE_THREADS = None  # intra-op threads of the models; None = runtime default
 
 # Chunking defaults
 MAX_LINES = 5
@@ -14,3 +28,58 @@ OVERLAP = 1
 # Cache
 QUERY_CACHE_TTL = 600
 QUERY_CACHE_SIZE = 100
+
+# Tokenization (BM25 index and queries)
+TOKENIZER_STOPWORDS = False  # drop English stopwords
+TOKENIZER_STEMMING = False  # Porter stemming
+TOKENIZER_QUERY_CACHE_SIZE = 4096  # LRU of query tokens
+
+# Retrieval
+VECTOR_BACKEND = "chroma"  # chroma | dense (exact search over a memory-mapped matrix) | hnsw (local hnswlib ANN)
+DENSE_BLOCK_SIZE = 65536  # matrix rows per matmul block in the dense backend
+HNSW_M = 16  # graph degree; higher = better recall, more memory
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 100  # search breadth; higher = better recall, slower queries
+HYBRID_CANDIDATES = 100  # default rank depth: top-N candidates per retriever fused by hybrid_search
+HYBRID_FUSION = "weighted"  # weighted | minmax | zscore | rrf
+RRF_K = 60  # Reciprocal Rank Fusion constant
+
+# Query embedding batches (concurrent embed_text calls)
+QUERY_EMBED_BATCH_SIZE = 32  # max queries per SentenceTransformer.encode call
+QUERY_EMBED_MAX_WAIT_MS = 2  # how long a batch waits for queries of other requests
+
+# Query expansion (advanced_search)
+EXPANSION_CACHE_ENABLED = True  # keep expansions in EXPANSION_CACHE_FILE, shared across workers
+EXPANSION_DEADLINE_MS = 500  # on a cache miss, use the original query if generation takes longer; None = wait
+EXPANSION_MAX_PENDING = 4  # distinct queries waiting for generation; further misses use the original query
+
+# Reranking (cross-encoder)
+RERANK_BATCH_SIZE = 64  # max (query, chunk) pairs per forward pass, across concurrent requests
+RERANK_MAX_WAIT_MS = 5  # how long a batch waits for pairs of other requests
+RERANK_CACHE_SIZE = 10000  # LRU of pair scores keyed by (query, chunk ID)
+
+# Sharding (ShardedDocumentStore, used by the API when SHARDS > 1)
+SHARDS = 1  # shards of the BM25 and vector indexes, searched in parallel
+SHARD_KEY = None  # None: shard by a hash of the chunk ID; a metadata field (e.g. "source") keeps its chunks together
+SHARD_WORKERS = None  # threads for the shard fan-out; None = one per shard
+
+# Startup (see app/startup.py; the timings are served at /startup_report)
+LAZY_LOADING = True  # load models, the vector index and BM25 on first use instead of in DocumentStore()
+WARMUP_ON_STARTUP = False  # the API loads everything and runs each model once before serving
+STARTUP_INGEST = True  # the API syncs the chunks into the vector index before serving (no-op when unchanged)
+OFFLINE_MODE = False  # load models from the local Hugging Face cache only, never contact the Hub
+
+# Ingestion
+INGEST_WORKERS = os.cpu_count() or 1
+INGEST_MAX_PENDING = 4  # in-flight files per worker
+INCREMENTAL_INGEST = True
+EMBED_BATCH_SIZE = 64  # texts per SentenceTransformer.encode batch
+EMBEDDING_STORE_ENABLED = True  # reuse chunk embeddings across rebuilds and workers, keyed by (model, text)
+INGEST_BATCH_SIZE = 1024  # chunks per ChromaDB write
+INGEST_PIPELINE = True  # encode the next batch while the current one is written
+PDF_PAGE_MODE = True  # stream PDFs page by page; chunks never span pages and keep their page number
+PDF_PAGES_PER_TASK = 200  # larger PDFs are split into page ranges across workers
+HTML_STREAMING = True  # parse HTML with lxml's incremental parser instead of a BeautifulSoup tree
+JSON_RECORDS_MODE = True  # every element of a top-level JSON array is chunked as its own document
+JSON_RECORDS_PER_TASK = 1000
+BM25_SNAPSHOT = True  # write the BM25 index next to the chunks file at build time; workers memory-map it
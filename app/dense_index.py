@@ -0,0 +1,231 @@
+import json
+import os
+import tempfile
+import numpy as np
+from app.vector_backends import VectorBackend, MetadataIndex, normalize
+
+# A dense index directory holds three files:
+#   vectors.npy     float32 (n, dim) matrix of L2-normalized embeddings, memory-mapped on load
+#   ids.npy         chunk ID of every row
+#   metadatas.json  metadata of every row
+VECTORS_FILE = "vectors.npy"
+IDS_FILE = "ids.npy"
+METADATAS_FILE = "metadatas.json"
+LOCK_FILE = "lock"
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-writer only
+    fcntl = None
+
+
+class DenseIndex(VectorBackend):
+    """
+    Exact in-process vector index over a memory-mapped float32 matrix.
+    Cosine similarity of normalized embeddings, top-k by blocked matrix multiply + argpartition.
+    Distances are cosine distances (1 - similarity). Writes are kept in memory until persist(),
+    which rewrites the files atomically.
+    """
+
+    space = "cosine"
+
+    def __init__(self, path: str, dim: int, documents=None, block_size: int = 65536):
+        self.path = path
+        self.dim = dim
+        self.block_size = block_size
+        self.documents = documents  # optional callable: chunk ID -> document text
+        os.makedirs(path, exist_ok=True)
+
+        self.ids, self.metadatas = [], []
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        if os.path.exists(os.path.join(path, VECTORS_FILE)):
+            self.vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r")
+            self.ids = np.load(os.path.join(path, IDS_FILE)).tolist()
+            with open(os.path.join(path, METADATAS_FILE), "r", encoding="utf-8") as f:
+                self.metadatas = json.load(f)
+            if not len(self.vectors) == len(self.ids) == len(self.metadatas) or self.vectors.shape[1] != dim:
+                raise ValueError(f"{path} is inconsistent or was built for another embedding size; rebuild it.")
+        self.id_to_row = {cid: row for row, cid in enumerate(self.ids)}
+        self.live = np.ones(len(self.ids), dtype=bool)
+        # Rows added since the last persist(), kept in memory: the first pending_count rows of a buffer
+        # that grows geometrically, so adds and reads never re-stack the pending rows
+        self.pending = np.zeros((0, dim), dtype=np.float32)
+        self.pending_count = 0
+        self.dirty = False
+        self._metadata_index = None  # built on the first filtered query, dropped on writes
+
+    def count(self) -> int:
+        return int(self.live.sum())
+
+    def _row_vectors(self, rows):
+        """Vectors of the given rows, from the memory map or the pending rows."""
+        rows = np.asarray(rows, dtype=np.int64)
+        saved = len(self.vectors)
+        out = np.empty((len(rows), self.dim), dtype=np.float32)
+        in_map = rows < saved
+        if in_map.any():
+            out[in_map] = self.vectors[rows[in_map]]
+        if not in_map.all():
+            out[~in_map] = self.pending[rows[~in_map] - saved]
+        return out
+
+    def _blocks(self):
+        """Yields (first row, matrix block) over all rows, saved rows first."""
+        for start in range(0, len(self.vectors), self.block_size):
+            yield start, self.vectors[start:start + self.block_size]
+        for start in range(0, self.pending_count, self.block_size):
+            yield len(self.vectors) + start, self.pending[start:min(start + self.block_size, self.pending_count)]
+
+    def add(self, ids, embeddings, metadatas=None, documents=None):
+        """Appends rows; IDs already in the index are replaced."""
+        embeddings = normalize(embeddings).reshape(len(ids), self.dim)
+        metadatas = metadatas or [{}] * len(ids)
+        self.delete(ids=[cid for cid in ids if cid in self.id_to_row])
+        needed = self.pending_count + len(ids)
+        if needed > len(self.pending):
+            grown = np.empty((max(needed, 2 * len(self.pending)), self.dim), dtype=np.float32)
+            grown[:self.pending_count] = self.pending[:self.pending_count]
+            self.pending = grown
+        self.pending[self.pending_count:needed] = embeddings
+        self.pending_count = needed
+        for cid, meta in zip(ids, metadatas):
+            self.id_to_row[cid] = len(self.ids)
+            self.ids.append(cid)
+            self.metadatas.append(meta)
+        self.live = np.concatenate([self.live, np.ones(len(ids), dtype=bool)])
+        self.dirty = True
+        self._metadata_index = None
+
+    upsert = add
+
+    def delete(self, ids=None, where=None):
+        rows = [self.id_to_row.pop(cid) for cid in ids or [] if cid in self.id_to_row]
+        if where:
+            rows += self.filter_rows(where).tolist()
+            for row in rows:
+                self.id_to_row.pop(self.ids[row], None)
+        if rows:
+            self.live[rows] = False
+            self.dirty = True
+
+    def filter_rows(self, where: dict = None) -> np.ndarray:
+        """Sorted live rows matching `where`."""
+        if not where:
+            return np.flatnonzero(self.live)
+        if self._metadata_index is None:
+            self._metadata_index = MetadataIndex(self.metadatas)
+        rows = self._metadata_index.rows(where)
+        return rows[self.live[rows]]
+
+    def get(self, ids=None, where=None, include=("metadatas",)):
+        if ids is None:
+            rows = self.filter_rows(where).tolist()
+        else:
+            rows = [self.id_to_row[cid] for cid in ids if cid in self.id_to_row]
+        result = {"ids": [self.ids[row] for row in rows]}
+        if "embeddings" in include:
+            result["embeddings"] = self._row_vectors(rows)
+        if "metadatas" in include:
+            result["metadatas"] = [self.metadatas[row] for row in rows]
+        if "documents" in include:
+            result["documents"] = [self.documents(cid) if self.documents else None for cid in result["ids"]]
+        return result
+
+    def _candidate_blocks(self, candidates):
+        """Yields (rows, matrix block) over the sorted candidate rows only, gathered block by block."""
+        for start in range(0, len(candidates), self.block_size):
+            rows = candidates[start:start + self.block_size]
+            yield rows, self._row_vectors(rows)
+
+    def search(self, query_embeddings, n_results: int, candidates: np.ndarray = None):
+        """
+        Exact top-k for a batch of queries.
+        Returns (rows, similarities) arrays of shape (n_queries, <= n_results), best first.
+        With `candidates` (sorted live rows, e.g. of a metadata filter) only those rows are scored;
+        otherwise all live rows are.
+        """
+        queries = normalize(np.atleast_2d(query_embeddings))
+        k = min(n_results, self.count() if candidates is None else len(candidates))
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        best_scores = np.zeros((len(queries), 0), dtype=np.float32)
+        if k <= 0:
+            return best_rows, best_scores
+        if candidates is None:
+            blocks = ((np.arange(start, start + len(block)), block) for start, block in self._blocks())
+        else:
+            blocks = self._candidate_blocks(np.asarray(candidates, dtype=np.int64))
+        for block_rows, block in blocks:
+            scores = queries @ np.asarray(block).T
+            if candidates is None:
+                scores[:, ~self.live[block_rows]] = -np.inf
+            rows = np.broadcast_to(block_rows, scores.shape)
+            scores = np.hstack([best_scores, scores])
+            rows = np.hstack([best_rows, rows])
+            if scores.shape[1] > k:
+                keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, keep, axis=1)
+                rows = np.take_along_axis(rows, keep, axis=1)
+            best_scores, best_rows = scores, rows
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    def query(self, query_embeddings, n_results: int = 10, where: dict = None,
+              include=("metadatas", "documents", "distances")):
+        """Chroma-shaped query results for a batch of query embeddings."""
+        rows, scores = self.search(query_embeddings, n_results, self.filter_rows(where) if where else None)
+        result = {"ids": [[self.ids[row] for row in q_rows] for q_rows in rows]}
+        if "distances" in include:
+            result["distances"] = [(1 - q_scores).tolist() for q_scores in scores]
+        if "metadatas" in include:
+            result["metadatas"] = [[self.metadatas[row] for row in q_rows] for q_rows in rows]
+        if "documents" in include:
+            result["documents"] = [[self.documents(cid) if self.documents else None for cid in q_ids]
+                                   for q_ids in result["ids"]]
+        return result
+
+    def persist(self):
+        """
+        Writes live rows to disk (atomically) and memory-maps the new matrix.
+        Files are written to unique temporary names and swapped in under an exclusive file lock,
+        so concurrent persists (threads or processes) never write into each other's files.
+        """
+        if not self.dirty:
+            return
+        rows = np.flatnonzero(self.live)
+        ids = [self.ids[row] for row in rows]
+        with open(os.path.join(self.path, LOCK_FILE), "a") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            tmp = {}
+            try:
+                for name in (VECTORS_FILE, IDS_FILE, METADATAS_FILE):
+                    fd, tmp[name] = tempfile.mkstemp(dir=self.path, prefix=name + ".", suffix=".tmp")
+                    os.close(fd)
+                matrix = np.lib.format.open_memmap(tmp[VECTORS_FILE], mode="w+", dtype=np.float32,
+                                                   shape=(len(rows), self.dim))
+                for start in range(0, len(rows), self.block_size):
+                    matrix[start:start + self.block_size] = self._row_vectors(rows[start:start + self.block_size])
+                matrix.flush()
+                del matrix
+                with open(tmp[IDS_FILE], "wb") as f:
+                    np.save(f, np.array(ids, dtype=str))
+                with open(tmp[METADATAS_FILE], "w", encoding="utf-8") as f:
+                    json.dump([self.metadatas[row] for row in rows], f, ensure_ascii=False)
+                for name in (METADATAS_FILE, IDS_FILE, VECTORS_FILE):
+                    os.replace(tmp.pop(name), os.path.join(self.path, name))
+            finally:
+                for path in tmp.values():
+                    if os.path.exists(path):
+                        os.remove(path)
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+        self.vectors = np.load(os.path.join(self.path, VECTORS_FILE), mmap_mode="r")
+        self.ids = ids
+        self.metadatas = [self.metadatas[row] for row in rows]
+        self.id_to_row = {cid: row for row, cid in enumerate(ids)}
+        self.live = np.ones(len(ids), dtype=bool)
+        self.pending = np.zeros((0, self.dim), dtype=np.float32)
+        self.pending_count = 0
+        self.dirty = False
+        self._metadata_index = None
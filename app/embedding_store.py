@@ -0,0 +1,97 @@
+import hashlib
+import os
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-writer only
+    fcntl = None
+
+
+class EmbeddingStore:
+    """
+    Persistent, content-addressed embedding store shared across rebuilds and worker processes.
+    Rows are keyed by a hash of (model name, whitespace-normalized text) and live in two append-only files:
+      vectors.f32  float32 rows, read through a memory map
+      keys.bin     16-byte key per row, in row order
+    Writers append under an exclusive file lock; readers pick up rows written by other processes on a miss.
+    """
+
+    KEY_SIZE = 16
+
+    def __init__(self, path: str, model_name: str, dim: int):
+        self.path = os.path.join(path, model_name.replace("/", "__"))
+        self.model_name = model_name
+        self.dim = dim
+        os.makedirs(self.path, exist_ok=True)
+        self.vectors_path = os.path.join(self.path, "vectors.f32")
+        self.keys_path = os.path.join(self.path, "keys.bin")
+        self.lock_path = os.path.join(self.path, "lock")
+        self.rows = {}
+        self._row_count = 0
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._refresh()
+
+    def key(self, text: str) -> bytes:
+        normalized = " ".join(text.split())
+        return hashlib.blake2b(f"{self.model_name}\0{normalized}".encode("utf-8"), digest_size=self.KEY_SIZE).digest()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _refresh(self):
+        """Loads keys appended since the last refresh and remaps the vectors file."""
+        if not os.path.exists(self.keys_path) or not os.path.exists(self.vectors_path):
+            return
+        with open(self.keys_path, "rb") as f:
+            f.seek(self._row_count * self.KEY_SIZE)
+            data = f.read()
+        # Only rows whose key and vector are both complete
+        available = min(self._row_count + len(data) // self.KEY_SIZE,
+                        os.path.getsize(self.vectors_path) // (4 * self.dim))
+        for row in range(self._row_count, available):
+            offset = (row - self._row_count) * self.KEY_SIZE
+            self.rows.setdefault(data[offset:offset + self.KEY_SIZE], row)
+        if available > self._row_count:
+            self._row_count = available
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(available, self.dim))
+
+    def get_many(self, texts: list):
+        """Returns (vectors of shape (len(texts), dim), boolean mask of the texts that were found)."""
+        keys = [self.key(text) for text in texts]
+        if any(key not in self.rows for key in keys):
+            self._refresh()
+        found = np.array([key in self.rows for key in keys], dtype=bool)
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        if found.any():
+            vectors[found] = self._vectors[[self.rows[key] for key, hit in zip(keys, found) if hit]]
+        return vectors, found
+
+    def put_many(self, texts: list, vectors: np.ndarray):
+        """Appends the embeddings of texts that are not stored yet."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(texts), self.dim)
+        with open(self.lock_path, "a") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                new_keys, new_rows = [], []
+                for text, vector in zip(texts, vectors):
+                    key = self.key(text)
+                    if key not in self.rows and key not in new_keys:
+                        new_keys.append(key)
+                        new_rows.append(vector)
+                if not new_keys:
+                    return 0
+                first_row = os.path.getsize(self.keys_path) // self.KEY_SIZE if os.path.exists(self.keys_path) else 0
+                # Vectors go first, so a stored key always has its row; a torn write is cut off here
+                with open(self.vectors_path, "ab") as f:
+                    f.truncate(first_row * 4 * self.dim)
+                    f.write(np.stack(new_rows).tobytes())
+                with open(self.keys_path, "ab") as f:
+                    f.write(b"".join(new_keys))
+                self._refresh()
+                return len(new_keys)
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
@@ -0,0 +1,93 @@
+import os
+import sqlite3
+import threading
+from cachetools import LRUCache
+
+EXPANSION_PROMPT = "Rewrite this query to improve search results. Keep the meaning, add synonyms and context {query}"
+
+
+def expansion_prompt(query: str) -> str:
+    return EXPANSION_PROMPT.format(query=query)
+
+
+class ExpansionCache:
+    """
+    Persistent query-expansion cache in a SQLite file, shared across worker processes.
+    Entries are keyed by (model name, whitespace-normalized lowercase query); generation is
+    deterministic for a given query, so entries never expire.
+    """
+
+    def __init__(self, path: str, model_name: str):
+        self.path = path
+        self.model_name = model_name
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # WAL: readers in other workers are not blocked by a writer
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS expansions "
+                           "(model TEXT NOT NULL, query TEXT NOT NULL, expansion TEXT NOT NULL, "
+                           "PRIMARY KEY (model, query))")
+        self._conn.commit()
+
+    @staticmethod
+    def key(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM expansions WHERE model = ?",
+                                      (self.model_name,)).fetchone()[0]
+
+    def get(self, query: str):
+        """The cached expansion of `query`, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT expansion FROM expansions WHERE model = ? AND query = ?",
+                                     (self.model_name, self.key(query))).fetchone()
+        return row[0] if row else None
+
+    def put(self, query: str, expansion: str):
+        self.put_many([query], [expansion])
+
+    def put_many(self, queries: list, expansions: list):
+        with self._lock:
+            with self._conn:
+                self._conn.executemany("INSERT OR REPLACE INTO expansions VALUES (?, ?, ?)",
+                                       [(self.model_name, self.key(q), e) for q, e in zip(queries, expansions)])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class MemoryExpansionCache:
+    """
+    In-process stand-in for ExpansionCache (EXPANSION_CACHE_ENABLED = False): same keys and interface,
+    nothing is persisted, the least recently used entries are dropped beyond `maxsize`.
+    """
+
+    def __init__(self, model_name: str, maxsize: int = 10000):
+        self.model_name = model_name
+        self._lock = threading.Lock()
+        self._entries = LRUCache(maxsize=maxsize)
+
+    key = staticmethod(ExpansionCache.key)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, query: str):
+        with self._lock:
+            return self._entries.get(self.key(query))
+
+    def put(self, query: str, expansion: str):
+        self.put_many([query], [expansion])
+
+    def put_many(self, queries: list, expansions: list):
+        with self._lock:
+            for query, expansion in zip(queries, expansions):
+                self._entries[self.key(query)] = expansion
+
+    def close(self):
+        pass
@@ -0,0 +1,77 @@
+import numpy as np
+
+FUSION_MODES = ("weighted", "minmax", "zscore", "rrf")
+
+
+def top_n(scores: np.ndarray, n: int, mask: np.ndarray = None) -> np.ndarray:
+    """
+    Indices of the `n` highest scores, best first; ties keep index order.
+    Entries outside `mask` are never returned.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    candidates = np.arange(len(scores)) if mask is None else np.flatnonzero(mask)
+    if n <= 0:
+        return candidates[:0]
+    if n < len(candidates):
+        # Everything above the n-th best score, then the first of the chunks tied with it
+        kth = -np.partition(-scores[candidates], n - 1)[n - 1]
+        above = candidates[scores[candidates] > kth]
+        tied = candidates[scores[candidates] == kth][:n - len(above)]
+        candidates = np.concatenate([above, tied])
+        candidates.sort()
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def align_candidates(sem_indices, sem_scores, kw_indices, kw_scores):
+    """
+    Aligns the candidates of two retrievers on chunk index.
+    Returns (indices, sem, kw) over the sorted union of both candidate lists;
+    a score is NaN where that retriever did not return the chunk.
+    """
+    sem_indices = np.asarray(sem_indices, dtype=np.int64)
+    kw_indices = np.asarray(kw_indices, dtype=np.int64)
+    indices = np.union1d(sem_indices, kw_indices)
+    sem = np.full(len(indices), np.nan)
+    kw = np.full(len(indices), np.nan)
+    sem[np.searchsorted(indices, sem_indices)] = sem_scores
+    kw[np.searchsorted(indices, kw_indices)] = kw_scores
+    return indices, sem, kw
+
+
+def weighted_fusion(sem: np.ndarray, kw: np.ndarray, w_semantic: float, w_keyword: float) -> np.ndarray:
+    """Weighted sum of aligned candidate scores."""
+    return w_semantic * sem + w_keyword * kw
+
+
+def select_top(indices: np.ndarray, scores: np.ndarray, k: int):
+    """The `k` best (index, score) pairs, best first; ties keep chunk order."""
+    order = top_n(scores, k)
+    return indices[order], scores[order]
+
+
+def minmax_normalize(scores: np.ndarray) -> np.ndarray:
+    """Scales retrieved scores to [0, 1]; chunks a retriever did not return (NaN) get 0."""
+    present = ~np.isnan(scores)
+    out = np.zeros(len(scores))
+    if present.any():
+        low, high = scores[present].min(), scores[present].max()
+        out[present] = (scores[present] - low) / (high - low) if high > low else 1.0
+    return out
+
+
+def zscore_normalize(scores: np.ndarray) -> np.ndarray:
+    """Standardizes retrieved scores; chunks a retriever did not return (NaN) get the lowest z-score."""
+    present = ~np.isnan(scores)
+    out = np.zeros(len(scores))
+    if present.any():
+        std = scores[present].std()
+        out[present] = (scores[present] - scores[present].mean()) / std if std > 0 else 0.0
+        out[~present] = out[present].min()
+    return out
+
+
+def rank_fusion(sem_rank: np.ndarray, kw_rank: np.ndarray, w_semantic: float, w_keyword: float,
+                k: int = 60) -> np.ndarray:
+    """Weighted Reciprocal Rank Fusion of 0-based ranks; a chunk missing from a list (NaN) adds nothing."""
+    return (w_semantic * np.nan_to_num(1.0 / (k + sem_rank + 1), nan=0.0)
+            + w_keyword * np.nan_to_num(1.0 / (k + kw_rank + 1), nan=0.0))
@@ -0,0 +1,198 @@
+import os
+import shutil
+import sys
+import time
+import numpy as np
+from app.config import (EMBED_MODEL_NAME, CROSS_ENCODER_MODEL_NAME, EXPANSION_MODEL_NAME, CHUNKS_FILE,
+                        INFERENCE_BACKEND, ONNX_QUANTIZATION, INFERENCE_THREADS, ONNX_MODEL_DIR, OFFLINE_MODE)
+
+if OFFLINE_MODE:
+    # Read by huggingface_hub and transformers at import time: models come from the local cache only
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+from sentence_transformers import SentenceTransformer, CrossEncoder
+from transformers import AutoModelForSeq2SeqLM, AutoTokenizer, pipeline
+from app.vector_backends import normalize
+
+# Model loading for the PyTorch and ONNX Runtime backends.
+# ONNX models are exported (and optionally int8-quantized) once into ONNX_MODEL_DIR/<model name>/
+# and loaded from there afterwards; the ONNX backend needs optimum[onnxruntime] and is experimental:
+# its parity test (tests/test_inference.py) is skipped wherever optimum is not installed.
+INFERENCE_BACKENDS = ("torch", "onnx")
+QUANTIZATIONS = ("arm64", "avx2", "avx512", "avx512_vnni")  # dynamic int8 presets of optimum
+
+
+def _check(backend: str, quantization: str):
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected torch or onnx.")
+    if quantization is not None and quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown ONNX quantization '{quantization}', expected one of {', '.join(QUANTIZATIONS)}.")
+
+
+def model_variant(model_name: str, backend: str = INFERENCE_BACKEND, quantization: str = ONNX_QUANTIZATION) -> str:
+    """Name of the model as it runs: quantized models produce other outputs and must not share caches."""
+    return f"{model_name}@qint8_{quantization}" if backend == "onnx" and quantization else model_name
+
+
+def _set_torch_threads(threads: int):
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+
+
+def _session_options(threads: int):
+    import onnxruntime
+    options = onnxruntime.SessionOptions()
+    if threads:
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+    return options
+
+
+def _export_dir(model_name: str) -> str:
+    return os.path.join(ONNX_MODEL_DIR, model_name.replace("/", "__"))
+
+
+def _sentence_onnx_file(quantization: str) -> str:
+    """ONNX file of an exported SentenceTransformer / CrossEncoder, relative to its export directory."""
+    return f"onnx/model_qint8_{quantization}.onnx" if quantization else "onnx/model.onnx"
+
+
+def _load_sentence_model(cls, model_name: str, backend: str, quantization: str, threads: int):
+    """SentenceTransformer or CrossEncoder on the given backend."""
+    _check(backend, quantization)
+    if backend == "torch":
+        _set_torch_threads(threads)
+        return cls(model_name, local_files_only=OFFLINE_MODE)
+    path = _export_dir(model_name)
+    file_name = _sentence_onnx_file(quantization)
+    model_kwargs = {"provider": "CPUExecutionProvider", "session_options": _session_options(threads)}
+    if not os.path.exists(os.path.join(path, file_name)):
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+        print(f"Exporting {model_name} to ONNX{f' (int8, {quantization})' if quantization else ''}...")
+        model = cls(model_name, backend="onnx", model_kwargs=dict(model_kwargs), local_files_only=OFFLINE_MODE)
+        model.save_pretrained(path)
+        if quantization:
+            export_dynamic_quantized_onnx_model(model, quantization, path)
+    return cls(path, backend="onnx", model_kwargs=dict(model_kwargs, file_name=file_name))
+
+
+def load_embedder(model_name: str = EMBED_MODEL_NAME, backend: str = INFERENCE_BACKEND,
+                  quantization: str = ONNX_QUANTIZATION, threads: int = INFERENCE_THREADS) -> SentenceTransformer:
+    return _load_sentence_model(SentenceTransformer, model_name, backend, quantization, threads)
+
+
+def load_cross_encoder(model_name: str = CROSS_ENCODER_MODEL_NAME, backend: str = INFERENCE_BACKEND,
+                       quantization: str = ONNX_QUANTIZATION, threads: int = INFERENCE_THREADS) -> CrossEncoder:
+    return _load_sentence_model(CrossEncoder, model_name, backend, quantization, threads)
+
+
+SEQ2SEQ_ONNX_FILES = ("encoder_model", "decoder_model", "decoder_with_past_model", "decoder_model_merged")
+
+
+def _seq2seq_onnx_files(path: str) -> list:
+    """Encoder / decoder files of a seq2seq export (without .onnx): a merged decoder or split ones."""
+    return [name for name in SEQ2SEQ_ONNX_FILES if os.path.exists(os.path.join(path, f"{name}.onnx"))]
+
+
+def _quantize_seq2seq(path: str, quantization: str) -> str:
+    """
+    Quantizes the exported encoder and decoder files once into path/qint8_<quantization>/, keeping their file
+    names, so from_pretrained finds the same layout as the export (merged or split decoder). Returns that directory.
+    """
+    quantized_dir = os.path.join(path, f"qint8_{quantization}")
+    if os.path.exists(quantized_dir):
+        return quantized_dir
+    from optimum.onnxruntime import ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    config = getattr(AutoQuantizationConfig, quantization)(is_static=False)
+    tmp_dir = quantized_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for name in os.listdir(path):
+        if name.endswith(".json"):  # model and generation config
+            shutil.copy(os.path.join(path, name), tmp_dir)
+    for name in _seq2seq_onnx_files(path):
+        ORTQuantizer.from_pretrained(path, file_name=f"{name}.onnx").quantize(config, tmp_dir, file_suffix="")
+    os.replace(tmp_dir, quantized_dir)
+    return quantized_dir
+
+
+def load_rewriter(model_name: str = EXPANSION_MODEL_NAME, backend: str = INFERENCE_BACKEND,
+                  quantization: str = ONNX_QUANTIZATION, threads: int = INFERENCE_THREADS):
+    """text2text-generation pipeline of the query rewriter on the given backend."""
+    _check(backend, quantization)
+    if backend == "torch":
+        _set_torch_threads(threads)
+        return pipeline("text2text-generation",
+                        model=AutoModelForSeq2SeqLM.from_pretrained(model_name, local_files_only=OFFLINE_MODE),
+                        tokenizer=AutoTokenizer.from_pretrained(model_name, local_files_only=OFFLINE_MODE))
+    try:
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    except ImportError as e:
+        raise ImportError("The ONNX inference backend requires optimum (pip install optimum[onnxruntime]).") from e
+    path = _export_dir(model_name)
+    if not os.path.exists(os.path.join(path, "encoder_model.onnx")):
+        print(f"Exporting {model_name} to ONNX...")
+        ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True,
+                                             local_files_only=OFFLINE_MODE).save_pretrained(path)
+        AutoTokenizer.from_pretrained(model_name, local_files_only=OFFLINE_MODE).save_pretrained(path)
+    model_dir = _quantize_seq2seq(path, quantization) if quantization else path
+    model = ORTModelForSeq2SeqLM.from_pretrained(model_dir, provider="CPUExecutionProvider",
+                                                 session_options=_session_options(threads))
+    return pipeline("text2text-generation", model=model, tokenizer=AutoTokenizer.from_pretrained(path))
+
+
+def _timed(fn, *args, repeat: int = 3):
+    """(result, best wall time in ms) of fn(*args), after one warm-up call."""
+    result = fn(*args)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best * 1000
+
+
+def check_parity(texts: list, query: str, passages: list, quantization: str = ONNX_QUANTIZATION,
+                 threads: int = INFERENCE_THREADS, min_cosine: float = 0.98) -> dict:
+    """
+    Compares the ONNX models with the PyTorch ones: cosine similarity between the embeddings of `texts`
+    and the cross-encoder ranking of `passages` for `query`, plus the time of each call.
+    passed: every embedding has cosine >= min_cosine and the rerank order is unchanged.
+    """
+    report = {}
+    embeddings = {}
+    rerank_scores = {}
+    for backend in INFERENCE_BACKENDS:
+        embedder = load_embedder(backend=backend, quantization=quantization, threads=threads)
+        embeddings[backend], report[f"{backend}_embed_ms"] = _timed(
+            lambda t: np.asarray(embedder.encode(t, convert_to_numpy=True)), texts)
+        cross_encoder = load_cross_encoder(backend=backend, quantization=quantization, threads=threads)
+        rerank_scores[backend], report[f"{backend}_rerank_ms"] = _timed(
+            lambda p: np.asarray(cross_encoder.predict(p)), [[query, passage] for passage in passages])
+
+    cosine = np.sum(normalize(embeddings["torch"]) * normalize(embeddings["onnx"]), axis=1)
+    torch_order = np.argsort(-rerank_scores["torch"], kind="stable")
+    onnx_order = np.argsort(-rerank_scores["onnx"], kind="stable")
+    report.update({
+        "min_cosine": float(cosine.min()),
+        "mean_cosine": float(cosine.mean()),
+        "same_rerank_order": bool((torch_order == onnx_order).all()),
+        "same_top1": bool(torch_order[0] == onnx_order[0]),
+        "max_rerank_score_diff": float(np.abs(rerank_scores["torch"] - rerank_scores["onnx"]).max()),
+    })
+    report["passed"] = report["min_cosine"] >= min_cosine and report["same_rerank_order"]
+    return report
+
+
+if __name__ == "__main__":
+    # Parity check on chunks of the corpus: python -m app.inference
+    from app.chunk_store import open_chunks
+    chunks = open_chunks(CHUNKS_FILE)
+    sample = [chunks.content(i) for i in range(min(64, len(chunks)))]
+    report = check_parity(sample, "Alice 30 USA", sample[:20])
+    for key, value in report.items():
+        print(f"{key:24} {value:.4f}" if isinstance(value, float) else f"{key:24} {value}")
+    sys.exit(0 if report["passed"] else 1)
@@ -1,23 +1,34 @@
 import random
 from fastapi import FastAPI, HTTPException, Query
 from pydantic import BaseModel
-from typing import Optional, Dict
+from typing import Optional, Dict, Any, Literal
 from app.vector_store import DocumentStore
+from app.sharding import ShardedDocumentStore
+from app.config import HYBRID_FUSION, SHARDS, STARTUP_INGEST, WARMUP_ON_STARTUP
 
 
 class SearchRequest(BaseModel):
     query: str
     top_k: Optional[int] = 3
-    metadata_filter: Optional[Dict[str, str]] = None
+    metadata_filter: Optional[Dict[str, Any]] = None
     w_semantic: Optional[float] = 0.7
     w_keyword: Optional[float] = 0.3
+    fusion: Optional[Literal["weighted", "minmax", "zscore", "rrf"]] = HYBRID_FUSION
+    rank_depth: Optional[int] = None
 
 
 app = FastAPI(title="RAG Search API")
-store = DocumentStore()
-store.collection.delete(where={"source": "test_doc.txt"})
-print("Test chunks deleted successfully!")
-store.ingest_chunks()
+store = ShardedDocumentStore() if SHARDS > 1 else DocumentStore()
+if STARTUP_INGEST:
+    with store.startup.phase("ingest"):
+        store.collection.delete(where={"source": "test_doc.txt"})
+        print("Test chunks deleted successfully!")
+        store.ingest_chunks()
+elif store.collection.count() == 0:
+    print("WARNING: the vector index is empty and STARTUP_INGEST is off. Semantic, hybrid and advanced search "
+          "return nothing until store.ingest_chunks() has run.")
+if WARMUP_ON_STARTUP:
+    store.warmup()
 
 
 def serialize_chunks(chunks):
@@ -37,6 +48,12 @@ def root():
     return {"message": "RAG API is running"}
 
 
+@app.get("/startup_report")
+def startup_report():
+    """Time of each startup phase and the models/indexes loaded so far (the rest load on first use)."""
+    return store.startup_report()
+
+
 @app.post("/semantic_search")
 def semantic_search(req: SearchRequest):
     try:
@@ -63,7 +80,9 @@ def hybrid_search(req: SearchRequest):
             top_k=req.top_k,
             w_semantic=req.w_semantic,
             w_keyword=req.w_keyword,
-            metadata_filter=req.metadata_filter
+            metadata_filter=req.metadata_filter,
+            fusion=req.fusion,
+            rank_depth=req.rank_depth
         )
         results = serialize_chunks([chunk for score, chunk in raw_results])
         return {"query": req.query, "results": results}
@@ -0,0 +1,54 @@
+import hashlib
+import json
+import os
+
+
+def file_hash(path: str, block_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's content, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_entry(path: str, previous: dict = None) -> dict:
+    """
+    Manifest entry for a file: size, mtime and content hash.
+    The hash of `previous` is reused when size and mtime did not change.
+    """
+    stat = os.stat(path)
+    if previous and previous.get("size") == stat.st_size and previous.get("mtime") == stat.st_mtime_ns:
+        content_hash = previous["hash"]
+    else:
+        content_hash = file_hash(path)
+    return {"hash": content_hash, "size": stat.st_size, "mtime": stat.st_mtime_ns, "chunk_ids": []}
+
+
+def load_manifest(path: str) -> dict:
+    """Loads a manifest ({file path: {"hash", "chunk_ids", ...}}), empty if missing."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest: dict, path: str):
+    """Writes a manifest atomically."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def diff_manifests(old: dict, new: dict):
+    """
+    Compares two manifests.
+    Returns (changed, removed): paths that are new or whose hash changed,
+    and paths that no longer exist.
+    """
+    changed = [path for path, entry in new.items()
+               if path not in old or old[path]["hash"] != entry["hash"]]
+    removed = [path for path in old if path not in new]
+    return changed, removed
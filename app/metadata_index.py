@@ -0,0 +1,116 @@
+import operator
+import numpy as np
+
+COMPARISONS = {"$gt": operator.gt, "$gte": operator.ge, "$lt": operator.lt, "$lte": operator.le}
+
+
+class MetadataIndex:
+    """
+    Inverted index over chunk metadata: field -> value -> sorted array of chunk indices.
+    Evaluates Chroma-style filters with set operations on the sorted arrays, so a narrower filter
+    touches fewer rows. Supported: $and, $or, $eq, $ne, $in, $nin, $gt, $gte, $lt, $lte and plain
+    equality; a list value means $in and several fields in one dict are ANDed.
+    As in ChromaDB 1.x, $ne and $nin also match chunks that do not have the field.
+    """
+
+    def __init__(self, metadatas):
+        postings = {}
+        size = 0
+        for idx, meta in enumerate(metadatas):
+            size = idx + 1
+            for field, value in (meta or {}).items():
+                if isinstance(value, (list, dict)):
+                    continue
+                postings.setdefault(field, {}).setdefault(value, []).append(idx)
+        self.size = size
+        self.postings = {field: {value: np.asarray(rows, dtype=np.int64) for value, rows in values.items()}
+                         for field, values in postings.items()}
+        self._all = None
+
+    def _all_rows(self) -> np.ndarray:
+        if self._all is None:
+            self._all = np.arange(self.size, dtype=np.int64)
+        return self._all
+
+    def _union(self, arrays) -> np.ndarray:
+        arrays = [a for a in arrays if len(a)]
+        if not arrays:
+            return np.zeros(0, dtype=np.int64)
+        return arrays[0] if len(arrays) == 1 else np.unique(np.concatenate(arrays))
+
+    def _intersect(self, arrays) -> np.ndarray:
+        arrays = sorted(arrays, key=len)  # smallest first
+        rows = arrays[0]
+        for other in arrays[1:]:
+            if not len(rows):
+                break
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        return rows
+
+    def _field_rows(self, field: str, cond) -> np.ndarray:
+        values = self.postings.get(field, {})
+        empty = np.zeros(0, dtype=np.int64)
+        if isinstance(cond, list):
+            cond = {"$in": cond}
+        if not isinstance(cond, dict):
+            return values.get(cond, empty)
+        parts = []
+        for op, expected in cond.items():
+            if op == "$eq":
+                parts.append(values.get(expected, empty))
+            elif op == "$ne":
+                parts.append(np.setdiff1d(self._all_rows(), values.get(expected, empty), assume_unique=True))
+            elif op == "$in":
+                parts.append(self._union(values.get(v, empty) for v in expected))
+            elif op == "$nin":
+                parts.append(np.setdiff1d(self._all_rows(), self._union(values.get(v, empty) for v in expected),
+                                          assume_unique=True))
+            elif op in COMPARISONS:
+                compare = COMPARISONS[op]
+                parts.append(self._union(rows for value, rows in values.items()
+                                         if isinstance(value, type(expected)) and compare(value, expected)))
+            else:
+                raise ValueError(f"Unsupported filter operator '{op}'.")
+        return self._intersect(parts) if parts else self._all_rows()
+
+    def rows(self, where: dict) -> np.ndarray:
+        """Sorted indices of the chunks matching `where`."""
+        parts = []
+        for key, cond in where.items():
+            if key == "$and":
+                parts.append(self._intersect([self.rows(c) for c in cond]) if cond else self._all_rows())
+            elif key == "$or":
+                parts.append(self._union(self.rows(c) for c in cond))
+            else:
+                parts.append(self._field_rows(key, cond))
+        return self._intersect(parts) if parts else self._all_rows()
+
+    def candidates(self, where: dict = None):
+        """Sorted indices of the chunks matching `where`; None when there is no filter."""
+        return self.rows(where) if where else None
+
+
+def restrict(docs: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+    """Boolean mask of the `docs` that are in the sorted array `candidates` (binary search, no corpus-size mask)."""
+    pos = np.searchsorted(candidates, docs)
+    found = pos < len(candidates)
+    found[found] = candidates[pos[found]] == docs[found]
+    return found
+
+
+def to_chroma_where(where: dict):
+    """
+    Rewrites a filter into what ChromaDB accepts: several top-level fields become an explicit $and
+    and list values become $in.
+    """
+    if not where:
+        return None
+    clauses = []
+    for key, cond in where.items():
+        if key in ("$and", "$or"):
+            clauses.append({key: [to_chroma_where(c) for c in cond]})
+        elif isinstance(cond, list):
+            clauses.append({key: {"$in": cond}})
+        else:
+            clauses.append({key: cond})
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
@@ -1,23 +1,16 @@
 import fitz
 import json
 import os
+import posixpath
+import zipfile
+from xml.etree import ElementTree
 from bs4 import BeautifulSoup
-from docx import Document
+from lxml import etree
+from docx.styles import BabelFish
 
 
-def parse_pdf(file_path: str) -> dict:
-    """
-    Extracts text and metadata from a PDF file.
-    Returns a dictionary with cleaned content and metadata.
-    """
-    doc = fitz.open(file_path)
-
-    text = ""
-    for page_num, page in enumerate(doc, start=1):
-        text += f"\n--- Page {page_num} ---\n"
-        text += page.get_text("text")
-    text = text.strip()
-    metadata = {
+def _pdf_metadata(doc, file_path: str) -> dict:
+    return {
         "title": doc.metadata.get("title", ""),
         "author": doc.metadata.get("author", ""),
         "pages": doc.page_count,
@@ -25,6 +18,53 @@ def parse_pdf(file_path: str) -> dict:
         "type": "pdf",
     }
 
+
+def pdf_page_count(file_path: str) -> int:
+    with fitz.open(file_path) as doc:
+        return doc.page_count
+
+
+def iter_pdf_pages(file_path: str, start: int = 0, stop: int = None):
+    """
+    Yields the pages of a PDF one at a time as {"page": page number (1-based), "text": page text}.
+    `start`/`stop` select a 0-based page range, so one PDF can be split across workers.
+    """
+    with fitz.open(file_path) as doc:
+        stop = doc.page_count if stop is None else min(stop, doc.page_count)
+        for page_index in range(start, stop):
+            yield {"page": page_index + 1, "text": doc.load_page(page_index).get_text("text")}
+
+
+def parse_pdf_pages(file_path: str, start: int = 0, stop: int = None):
+    """
+    Page-streaming variant of parse_pdf.
+    Yields one parsed document per page, with the page number in its metadata.
+    """
+    with fitz.open(file_path) as doc:
+        metadata = _pdf_metadata(doc, file_path)
+    doc_id = os.path.splitext(os.path.basename(file_path))[0]
+    for page in iter_pdf_pages(file_path, start, stop):
+        yield {
+            "doc_id": doc_id,
+            "content": page["text"].strip(),
+            "metadata": {**metadata, "page": page["page"]},
+        }
+
+
+def parse_pdf(file_path: str) -> dict:
+    """
+    Extracts text and metadata from a PDF file.
+    Returns a dictionary with cleaned content and metadata.
+    """
+    with fitz.open(file_path) as doc:
+        metadata = _pdf_metadata(doc, file_path)
+
+    parts = []
+    for page in iter_pdf_pages(file_path):
+        parts.append(f"\n--- Page {page['page']} ---\n")
+        parts.append(page["text"])
+    text = "".join(parts).strip()
+
     return {
         "doc_id": os.path.splitext(os.path.basename(file_path))[0],
         "content": text,
@@ -32,32 +72,145 @@ def parse_pdf(file_path: str) -> dict:
     }
 
 
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+RELS_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+# Run children with a fixed text equivalent (same translation as python-docx)
+DOCX_RUN_TEXT = {W_NS + "tab": "\t", W_NS + "ptab": "\t", W_NS + "cr": "\n", W_NS + "noBreakHyphen": "-"}
+
+
+def _docx_main_part(archive: zipfile.ZipFile) -> str:
+    """Locates the main document part through the package relationships."""
+    with archive.open("_rels/.rels") as f:
+        for rel in ElementTree.parse(f).getroot().iter(RELS_NS + "Relationship"):
+            if rel.get("Type", "").endswith("/officeDocument"):
+                return rel.get("Target").lstrip("/")
+    return "word/document.xml"
+
+
+def _docx_style_names(archive: zipfile.ZipFile, main_part: str) -> dict:
+    """Maps style IDs to UI style names (e.g. 'Heading1' -> 'Heading 1')."""
+    styles_part = posixpath.join(posixpath.dirname(main_part), "styles.xml")
+    if styles_part not in archive.namelist():
+        return {}
+    names = {}
+    with archive.open(styles_part) as f:
+        for style in ElementTree.parse(f).getroot().iter(W_NS + "style"):
+            name = style.find(W_NS + "name")
+            if name is not None:
+                names[style.get(W_NS + "styleId")] = BabelFish.internal2ui(name.get(W_NS + "val"))
+    return names
+
+
+def _docx_run_text(run) -> str:
+    parts = []
+    for child in run:
+        if child.tag == W_NS + "t":
+            parts.append(child.text or "")
+        elif child.tag == W_NS + "br":
+            if child.get(W_NS + "type", "textWrapping") == "textWrapping":
+                parts.append("\n")
+        elif child.tag in DOCX_RUN_TEXT:
+            parts.append(DOCX_RUN_TEXT[child.tag])
+    return "".join(parts)
+
+
+def _docx_paragraph_text(paragraph) -> str:
+    parts = []
+    for child in paragraph:
+        if child.tag == W_NS + "r":
+            parts.append(_docx_run_text(child))
+        elif child.tag == W_NS + "hyperlink":
+            parts.extend(_docx_run_text(run) for run in child.iter(W_NS + "r"))
+    return "".join(parts)
+
+
+def _docx_table_rows(table):
+    """
+    Yields the non-empty rows of a table as 'cell | cell | cell'.
+    A cell holds its own paragraphs only; tables nested in a cell follow the row that contains them.
+    """
+    for row in table.findall(W_NS + "tr"):
+        cells = []
+        nested = []
+        for cell in row.findall(W_NS + "tc"):
+            paragraphs = []
+            for block in cell:
+                if block.tag == W_NS + "p":
+                    paragraphs.append(_docx_paragraph_text(block).strip())
+                elif block.tag == W_NS + "tbl":
+                    nested.append(block)
+            cells.append(" ".join(" ".join(paragraphs).split()))
+        if any(cells):
+            yield " | ".join(cells)
+        for inner in nested:
+            yield from _docx_table_rows(inner)
+
+
+def iter_docx_blocks(file_path: str):
+    """
+    Streams the body of a DOCX file in document order, without building the python-docx object graph.
+    Yields (kind, text) with kind "heading", "paragraph" (empty ones included) or "table_row".
+    Top-level elements are released as soon as they have been processed.
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        main_part = _docx_main_part(archive)
+        style_names = _docx_style_names(archive, main_part)
+        with archive.open(main_part) as f:
+            depth = 0
+            body = None
+            for event, elem in ElementTree.iterparse(f, events=("start", "end")):
+                if event == "start":
+                    depth += 1
+                    if depth == 2 and elem.tag == W_NS + "body":
+                        body = elem
+                    continue
+                depth -= 1
+                if depth != 2 or body is None:
+                    continue
+                # Direct child of <w:body>
+                blocks = [elem]
+                if elem.tag == W_NS + "sdt":
+                    content = elem.find(W_NS + "sdtContent")
+                    blocks = list(content) if content is not None else []
+                for block in blocks:
+                    if block.tag == W_NS + "p":
+                        style = block.find(f"{W_NS}pPr/{W_NS}pStyle")
+                        style_name = style_names.get(style.get(W_NS + "val"), "") if style is not None else ""
+                        kind = "heading" if style_name.startswith("Heading") else "paragraph"
+                        yield kind, _docx_paragraph_text(block)
+                    elif block.tag == W_NS + "tbl":
+                        for row in _docx_table_rows(block):
+                            yield "table_row", row
+                body.remove(elem)
+
+
 def parse_docx(file_path: str) -> dict:
     """
-    Extract text and metadata from a DOCX file.
+    Extract text and metadata from a DOCX file in a single pass.
+    Paragraphs, headings and table rows ('cell | cell') are returned in document order.
     Returns a dictionary with cleaned content and metadata.
     """
-    doc = Document(file_path)
-
-    text = ""
-    for para in doc.paragraphs:
-        if para.text.strip():
-            text += para.text.strip() + "\n"
+    lines = []
     headings = []
-    for para in doc.paragraphs:
-        if para.style.name.startswith("Heading"):
-            headings.append(para.text.strip())
+    paragraphs = 0
+    for kind, text in iter_docx_blocks(file_path):
+        if kind != "table_row":
+            paragraphs += 1
+        if kind == "heading":
+            headings.append(text.strip())
+        if text.strip():
+            lines.append(text.strip())
     metadata = {
         "title": headings[0] if headings else os.path.basename(file_path),
         "author": "",  # DOCX metadata optional, can add later
-        "paragraphs": len(doc.paragraphs),
+        "paragraphs": paragraphs,
         "source": os.path.basename(file_path),
         "type": "docx",
     }
 
     return {
         "doc_id": os.path.splitext(os.path.basename(file_path))[0],
-        "content": text.strip(),
+        "content": "\n".join(lines),
         "metadata": metadata,
     }
 
@@ -92,21 +245,110 @@ def parse_html(file_path: str) -> dict:
     }
 
 
-def parse_json(file_path: str) -> dict:
+HTML_TEXT_TAGS = {"h1", "h2", "h3", "p", "li"}
+HTML_SKIP_TAGS = {"script", "style", "nav", "noscript", "template"}
+
+
+class _HtmlTextTarget:
     """
-    Extract text and metadata from a JSON file.
-    Flattens the JSON into a readable text format.
+    lxml parser target collecting the text of h1/h2/h3/p/li elements while the document is fed.
+    Text is gathered like BeautifulSoup's get_text(strip=True): every text node is stripped
+    and the pieces are concatenated. Nested matches each get their own entry, in start-tag order.
+    Subtrees of HTML_SKIP_TAGS are dropped as they are read.
     """
-    with open(file_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    text_parts = []
-    for key, value in data.items():
-        text_parts.append(f"{key}: {value}")
-    text = "\n".join(text_parts)
+
+    def __init__(self):
+        self.parts = []  # one slot per matched element, filled when the element closes
+        self.emitted = 0
+        self.title = None
+        self._open = []  # (tag, slot, text pieces) of matched elements still open
+        self._skip_depth = 0
+        self._in_title = False
+        self._buffer = []
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        text = "".join(self._buffer)
+        self._buffer = []
+        if self._in_title:
+            self.title = (self.title or "") + text
+        stripped = text.strip()
+        if stripped:
+            for _, _, pieces in self._open:
+                pieces.append(stripped)
+
+    def start(self, tag, attrib):
+        self._flush()
+        if self._skip_depth or tag in HTML_SKIP_TAGS:
+            self._skip_depth += 1
+            return
+        if tag == "title" and self.title is None:
+            self._in_title = True
+        if tag in HTML_TEXT_TAGS:
+            self.parts.append(None)
+            self._open.append((tag, len(self.parts) - 1, []))
+
+    def end(self, tag):
+        self._flush()
+        if self._skip_depth:
+            self._skip_depth -= 1
+            return
+        if tag == "title":
+            self._in_title = False
+        if self._open and self._open[-1][0] == tag:
+            _, slot, pieces = self._open.pop()
+            self.parts[slot] = "".join(pieces)
+
+    def data(self, data):
+        if not self._skip_depth:
+            self._buffer.append(data)
+
+    def comment(self, text):
+        self._flush()
+
+    def close(self):
+        self._flush()
+        while self._open:
+            _, slot, pieces = self._open.pop()
+            self.parts[slot] = "".join(pieces)
+
+    def pop_ready(self):
+        """Returns the texts that are complete and in order, releasing them."""
+        ready = []
+        while self.emitted < len(self.parts) and self.parts[self.emitted] is not None:
+            ready.append(self.parts[self.emitted])
+            self.parts[self.emitted] = ""
+            self.emitted += 1
+        return ready
+
+
+def iter_html_text(file_path: str, block_size: int = 1 << 16, target: _HtmlTextTarget = None):
+    """
+    Streams the heading, paragraph and list item texts of an HTML file as they are parsed,
+    feeding lxml's incremental parser `block_size` bytes at a time. Empty texts are skipped.
+    """
+    target = target or _HtmlTextTarget()
+    parser = etree.HTMLParser(target=target, encoding="utf-8")
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            parser.feed(block)
+            yield from (text for text in target.pop_ready() if text)
+    parser.close()
+    yield from (text for text in target.pop_ready() if text)
+
+
+def parse_html_stream(file_path: str) -> dict:
+    """
+    Streaming variant of parse_html built on lxml's incremental parser.
+    Same output contract; script/style/nav subtrees are dropped.
+    """
+    target = _HtmlTextTarget()
+    text = "\n".join(iter_html_text(file_path, target=target))
     metadata = {
-        "title": data.get("name", os.path.basename(file_path)),
+        "title": target.title if target.title is not None else os.path.basename(file_path),
         "source": os.path.basename(file_path),
-        "type": "json",
+        "type": "html",
     }
 
     return {
@@ -114,3 +356,115 @@ def parse_json(file_path: str) -> dict:
         "content": text.strip(),
         "metadata": metadata,
     }
+
+
+def flatten_json(value, path: str = ""):
+    """
+    Yields (path, scalar) pairs for a JSON value, e.g. ("a.b[3].c", 1).
+    Empty objects and arrays are kept as {} / [].
+    """
+    if isinstance(value, dict) and value:
+        for key, item in value.items():
+            yield from flatten_json(item, f"{path}.{key}" if path else str(key))
+    elif isinstance(value, list) and value:
+        for i, item in enumerate(value):
+            yield from flatten_json(item, f"{path}[{i}]")
+    else:
+        yield path, value
+
+
+def json_document(file_path: str, data, record: int = None) -> dict:
+    """Builds a parsed document from JSON data; `record` is the position in a top-level array."""
+    text = "\n".join(f"{path}: {value}" for path, value in flatten_json(data))
+    doc_id = os.path.splitext(os.path.basename(file_path))[0]
+    title = data.get("name") if isinstance(data, dict) else None
+    metadata = {
+        "title": title if title is not None else os.path.basename(file_path),
+        "source": os.path.basename(file_path),
+        "type": "json",
+    }
+    if record is not None:
+        doc_id = f"{doc_id}_{record}"
+        metadata["record"] = record
+
+    return {
+        "doc_id": doc_id,
+        "content": text.strip(),
+        "metadata": metadata,
+    }
+
+
+def parse_json(file_path: str) -> dict:
+    """
+    Extract text and metadata from a JSON file.
+    Flattens the JSON into a readable text format, one 'a.b[3].c: value' line per leaf.
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return json_document(file_path, data)
+
+
+def json_is_array(file_path: str) -> bool:
+    """Whether the top-level JSON value is an array (only the first characters are read)."""
+    with open(file_path, "r", encoding="utf-8") as f:
+        while True:
+            block = f.read(1024)
+            if not block:
+                return False
+            block = block.lstrip("\ufeff \t\r\n")
+            if block:
+                return block[0] == "["
+
+
+def iter_json_array(file_path: str, block_size: int = 1 << 20):
+    """
+    Incrementally decodes the elements of a top-level JSON array.
+    Only the current element (plus one read block) is held in memory.
+    """
+    decoder = json.JSONDecoder()
+    with open(file_path, "r", encoding="utf-8") as f:
+        buffer, pos, eof = "", 0, False
+
+        def fill(size=block_size):
+            nonlocal buffer, pos, eof
+            block = f.read(size)
+            eof = not block
+            buffer = buffer[pos:] + block
+            pos = 0
+
+        def next_char():
+            # Skips whitespace and returns the next character, "" at end of file
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in "\ufeff \t\r\n":
+                    pos += 1
+                if pos < len(buffer) or eof:
+                    return buffer[pos:pos + 1]
+                fill()
+
+        if next_char() != "[":
+            raise ValueError(f"{file_path} is not a JSON array")
+        pos += 1
+        if next_char() == "]":
+            return
+        while True:
+            next_char()
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+                # A value not followed by a delimiter (e.g. the "1." of "1.5") may continue in the next block
+                complete = end < len(buffer) and buffer[end] in ",]\ufeff \t\r\n"
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                complete = False
+            if not complete and not eof:
+                fill(max(block_size, len(buffer) - pos))
+                continue
+            yield item
+            pos = end
+            separator = next_char()
+            if separator == "]":
+                return
+            if separator != ",":
+                raise ValueError(f"{file_path}: expected ',' or ']' after array element")
+            pos += 1
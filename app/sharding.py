@@ -0,0 +1,182 @@
+import hashlib
+import re
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from app.config import CHUNKS_FILE, SHARDS, SHARD_KEY, SHARD_WORKERS, LAZY_LOADING
+from app.fusion import top_n
+from app.vector_backends import VectorBackend
+from app.vector_store import DocumentStore
+
+
+def shard_of(chunk_id: str, metadata: dict, n_shards: int, key: str = None) -> int:
+    """Shard of a chunk: a stable hash of its ID, or of metadata[key] when a shard key is set."""
+    value = chunk_id if key is None else str((metadata or {}).get(key))
+    digest = hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % n_shards
+
+
+class ShardedBM25:
+    """
+    BM25Index split into shards (see BM25Index.split) with the same search API.
+    top_k runs on every shard in parallel and merges the per-shard lists, so results
+    (scores and tie order) are those of the unsharded index.
+    """
+
+    def __init__(self, index, shard_of_doc, n_shards: int, executor: ThreadPoolExecutor):
+        self.corpus_size = index.corpus_size
+        self.shard_of_doc = np.asarray(shard_of_doc, dtype=np.int64)
+        self.rows = [np.flatnonzero(self.shard_of_doc == s) for s in range(n_shards)]  # global doc indices
+        self.local = np.empty(self.corpus_size, dtype=np.int64)
+        for rows in self.rows:
+            self.local[rows] = np.arange(len(rows))
+        self.shards = index.split(self.shard_of_doc, n_shards)
+        self.executor = executor
+
+    def get_scores(self, query) -> np.ndarray:
+        scores = np.zeros(self.corpus_size)
+        for rows, shard_scores in zip(self.rows, self.executor.map(lambda shard: shard.get_scores(query),
+                                                                    self.shards)):
+            scores[rows] = shard_scores
+        return scores
+
+    def get_batch_scores(self, query, doc_ids) -> np.ndarray:
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        scores = np.zeros(len(doc_ids))
+        shard = self.shard_of_doc[doc_ids]
+        for s in np.unique(shard):
+            found = shard == s
+            scores[found] = self.shards[s].get_batch_scores(query, self.local[doc_ids[found]])
+        return scores
+
+    def top_k(self, query, k: int, candidates: np.ndarray = None):
+        # Sorted global candidates -> sorted local rows of every shard
+        if candidates is not None:
+            candidate_shards = self.shard_of_doc[candidates]
+            shard_candidates = [self.local[candidates[candidate_shards == s]] for s in range(len(self.shards))]
+
+        def search(s):
+            docs, scores = self.shards[s].top_k(query, k, None if candidates is None else shard_candidates[s])
+            return self.rows[s][docs], scores
+
+        parts = list(self.executor.map(search, range(len(self.shards))))
+        docs = np.concatenate([docs for docs, _ in parts])
+        scores = np.concatenate([scores for _, scores in parts])
+        order = np.argsort(docs, kind="stable")  # ties keep document order, as in BM25Index.top_k
+        docs, scores = docs[order], scores[order]
+        best = top_n(scores, k)
+        return docs[best], scores[best]
+
+
+class ShardedBackend(VectorBackend):
+    """
+    Vector backend over several shard backends. Writes go to the shard of each chunk (see shard_of);
+    queries run on all shards in parallel and the per-shard results are merged by distance.
+    """
+
+    def __init__(self, backends: list, key: str = None, executor: ThreadPoolExecutor = None):
+        self.backends = backends
+        self.key = key
+        self.executor = executor or ThreadPoolExecutor(max_workers=len(backends))
+        self.space = backends[0].space
+        sizes = [b.max_batch_size for b in backends if b.max_batch_size]
+        self.max_batch_size = min(sizes) if sizes else None
+
+    def _map(self, fn):
+        return list(self.executor.map(fn, self.backends))
+
+    def _route(self, ids, metadatas=None) -> dict:
+        """Shard -> positions of the given chunks."""
+        groups = {}
+        for i, cid in enumerate(ids):
+            meta = metadatas[i] if metadatas else None
+            groups.setdefault(shard_of(cid, meta, len(self.backends), self.key), []).append(i)
+        return groups
+
+    def count(self) -> int:
+        return sum(self._map(lambda b: b.count()))
+
+    def _write(self, method: str, ids, embeddings, metadatas=None, documents=None):
+        for s, positions in self._route(ids, metadatas).items():
+            getattr(self.backends[s], method)(
+                ids=[ids[i] for i in positions],
+                embeddings=[embeddings[i] for i in positions],
+                metadatas=[metadatas[i] for i in positions] if metadatas else None,
+                documents=[documents[i] for i in positions] if documents else None,
+            )
+
+    def add(self, ids, embeddings, metadatas=None, documents=None):
+        self._write("add", ids, embeddings, metadatas, documents)
+
+    def upsert(self, ids, embeddings, metadatas=None, documents=None):
+        if self.key is not None:
+            # The shard key of a chunk may have changed: drop it from the other shards first
+            groups = self._route(ids, metadatas)
+            for s, backend in enumerate(self.backends):
+                others = [cid for t, positions in groups.items() if t != s for cid in (ids[i] for i in positions)]
+                if others:
+                    backend.delete(ids=others)
+        self._write("upsert", ids, embeddings, metadatas, documents)
+
+    def delete(self, ids=None, where=None):
+        if ids is not None and self.key is None:
+            groups = self._route(ids)
+            shard_ids = [[ids[i] for i in groups.get(s, [])] for s in range(len(self.backends))]
+        else:
+            shard_ids = [ids] * len(self.backends)
+        for backend, backend_ids in zip(self.backends, shard_ids):
+            if backend_ids or where:
+                backend.delete(ids=backend_ids or None, where=where)
+
+    def get(self, ids=None, where=None, include=("metadatas",)):
+        parts = self._map(lambda b: b.get(ids=ids, where=where, include=include))
+        result = {key: [] for key in ("ids", *include)}
+        for part in parts:
+            for key, values in result.items():
+                if part.get(key) is not None:
+                    values.extend(part[key])
+        return result
+
+    def query(self, query_embeddings, n_results: int = 10, where: dict = None,
+              include=("metadatas", "documents", "distances")):
+        include = tuple(dict.fromkeys((*include, "distances")))
+        parts = self._map(lambda b: b.query(query_embeddings=query_embeddings, n_results=n_results,
+                                            where=where, include=include))
+        result = {key: [] for key in ("ids", *include)}
+        for q in range(len(np.atleast_2d(query_embeddings))):
+            distances = np.concatenate([np.asarray(part["distances"][q], dtype=np.float64) for part in parts])
+            order = np.argsort(distances, kind="stable")[:n_results]
+            for key, values in result.items():
+                merged = [value for part in parts for value in part[key][q]]
+                values.append([merged[i] for i in order])
+        return result
+
+    def persist(self):
+        self._map(lambda b: b.persist())
+
+
+class ShardedDocumentStore(DocumentStore):
+    """
+    DocumentStore with its BM25 index and vector index split into `n_shards` shards.
+    semantic, keyword and hybrid search fan out to all shards on a thread pool and merge the
+    per-shard top-k. BM25 keeps the statistics of the whole corpus, so scores match the unsharded store.
+    Chunks are assigned by a hash of their ID, or of the metadata field `shard_key`.
+    """
+
+    def __init__(self, chunks_path=CHUNKS_FILE, collection_name="documents", n_shards: int = SHARDS,
+                 shard_key: str = SHARD_KEY, workers: int = SHARD_WORKERS, lazy: bool = LAZY_LOADING):
+        self.n_shards = n_shards
+        self.shard_key = shard_key
+        self.executor = ThreadPoolExecutor(max_workers=workers or n_shards)
+        # Every layout gets its own collections (and index manifest)
+        layout = f"{n_shards}x{re.sub(r'[^0-9A-Za-z]', '', shard_key) if shard_key else 'hash'}"
+        super().__init__(chunks_path, f"{collection_name}-{layout}", lazy=lazy)
+
+    def _load_bm25(self):
+        shard_of_doc = [shard_of(cid, meta, self.n_shards, self.shard_key)
+                        for cid, meta in zip(self.chunks.ids, self.chunks.metadatas)]
+        return ShardedBM25(super()._load_bm25(), shard_of_doc, self.n_shards, self.executor)
+
+    def _open_vector_backend(self, backend: str, name: str = None):
+        name = name or self.collection_name
+        return ShardedBackend([super(ShardedDocumentStore, self)._open_vector_backend(backend, f"{name}-{s}")
+                               for s in range(self.n_shards)], self.shard_key, self.executor)
@@ -0,0 +1,59 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PhaseTimer:
+    """Wall-clock time of named startup phases (chunk load, tokenization, BM25, each model, ...), in ms."""
+
+    def __init__(self):
+        self.phases = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self.phases[name] = round(elapsed, 1)
+            print(f"[startup] {name}: {elapsed:.0f} ms")
+
+    def report(self) -> dict:
+        with self._lock:
+            return {"phases_ms": dict(self.phases), "seconds_since_start": round(time.time() - self.started, 1)}
+
+
+class LazyResource:
+    """
+    Attribute loaded by `loader(obj)` on first access, once even under concurrent requests.
+    The load is timed as a phase of `obj.startup` (a PhaseTimer). Assigning the attribute replaces the resource.
+    """
+
+    def __init__(self, loader):
+        self.loader = loader
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        if self.name not in obj.__dict__:
+            with obj.__dict__.setdefault("_load_locks", {}).setdefault(self.name, threading.Lock()):
+                if self.name not in obj.__dict__:
+                    with obj.startup.phase(self.name):
+                        obj.__dict__[self.name] = self.loader(obj)
+        return obj.__dict__[self.name]
+
+    def __set__(self, obj, value):
+        obj.__dict__[self.name] = value
+
+    def __delete__(self, obj):
+        obj.__dict__.pop(self.name, None)
+
+    def is_loaded(self, obj) -> bool:
+        return self.name in obj.__dict__
@@ -0,0 +1,77 @@
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from app.config import TOKENIZER_STOPWORDS, TOKENIZER_STEMMING, TOKENIZER_QUERY_CACHE_SIZE
+
+# Unicode words; inner hyphens, apostrophes and dots stay in the token ("e-mail", "o'neil", "3.5", "u.s")
+TOKEN_RE = re.compile(r"\w+(?:[-'.]\w+)*")
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below between both
+but by can could did do does doing down during each few for from further had has have having he her here hers
+herself him himself his how i if in into is it its itself just me more most my myself no nor not now of off on
+once only or other our ours ourselves out over own same she should so some such than that the their theirs them
+themselves then there these they this those through to too under until up very was we were what when where which
+while who whom why will with would you your yours yourself yourselves
+""".split())
+
+
+class Tokenizer:
+    """
+    Regex tokenizer shared by indexing and querying: lowercased Unicode word tokens,
+    optionally without English stopwords and Porter-stemmed.
+    """
+
+    def __init__(self, stopwords: bool = False, stemming: bool = False, query_cache_size: int = 4096):
+        self._args = (stopwords, stemming, query_cache_size)
+        self.stopwords = STOPWORDS if stopwords else None
+        self.stem = None
+        if stemming:
+            from nltk.stem.porter import PorterStemmer
+            # Vocabularies repeat a lot, so stems are cached per token
+            self.stem = lru_cache(maxsize=1 << 16)(PorterStemmer().stem)
+        self.tokenize_query = lru_cache(maxsize=query_cache_size)(self._tokenize_query)
+
+    def __reduce__(self):
+        # Rebuilt from its settings in worker processes; the caches are not pickled
+        return Tokenizer, self._args
+
+    @property
+    def name(self) -> str:
+        """Identifies the token output, e.g. for BM25 snapshot versions."""
+        return f"regex-v1/stopwords={self.stopwords is not None}/stemming={self.stem is not None}"
+
+    def __call__(self, text: str) -> list:
+        tokens = TOKEN_RE.findall(text.lower())
+        if self.stopwords is not None:
+            tokens = [t for t in tokens if t not in self.stopwords]
+        if self.stem is not None:
+            tokens = [self.stem(t) for t in tokens]
+        return tokens
+
+    def _tokenize_query(self, query: str) -> tuple:
+        return tuple(self(query))
+
+    def tokenize_batch(self, texts, workers: int = 1, chunksize: int = 256) -> list:
+        """Tokenizes many texts, on a process pool when workers > 1."""
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                return list(executor.map(self, texts, chunksize=chunksize))
+        return [self(text) for text in texts]
+
+
+tokenizer = Tokenizer(TOKENIZER_STOPWORDS, TOKENIZER_STEMMING, TOKENIZER_QUERY_CACHE_SIZE)
+
+
+def tokenize(text: str) -> list:
+    """Tokens of a chunk with the configured tokenizer."""
+    return tokenizer(text)
+
+
+def tokenize_query(query: str) -> tuple:
+    """Tokens of a query with the configured tokenizer; repeated queries hit an LRU cache."""
+    return tokenizer.tokenize_query(query)
+
+
+def tokenize_batch(texts, workers: int = 1) -> list:
+    return tokenizer.tokenize_batch(texts, workers)
@@ -1,4 +1,11 @@
 import re
+from concurrent.futures import ProcessPoolExecutor
+
+PAGE_MARKER_RE = re.compile(r"--- Page \d+ ---")
+BULLETS = "•*▪‣"
+BULLET_RE = re.compile(f"[{BULLETS}]")
+WHITESPACE_RE = re.compile(r"\s+")
+COLUMN_GAP_RE = re.compile(r"\s{2,}")
 
 
 def clean_text(text: str) -> str:
@@ -6,15 +13,15 @@ def clean_text(text: str) -> str:
     Basic cleaning: whitespace, lists, page markers.
     """
     # Remove page markers like "--- Page 1 ---"
-    text = re.sub(r"--- Page \d+ ---", "", text)
+    text = PAGE_MARKER_RE.sub("", text)
 
     # Normalize bullet points (convert •, *, etc. into "-")
-    text = re.sub(r"[•*▪‣]", "-", text)
+    text = BULLET_RE.sub("-", text)
 
     # Clean each line separately to preserve structure
     lines = []
     for line in text.splitlines():
-        line = re.sub(r"\s+", " ", line)
+        line = WHITESPACE_RE.sub(" ", line)
         if line.strip():
             lines.append(line.strip())
 
@@ -25,16 +32,7 @@ def normalize_lists(text: str) -> str:
     """
     Converts lines that look like lists into consistent Markdown-style lists.
     """
-    lines = text.splitlines()
-    new_lines = []
-    for line in lines:
-        if re.match(r"^\s*[-*]\s+", line):
-            new_lines.append(line.strip())
-        elif re.match(r"^\s*\d+\.\s+", line):
-            new_lines.append(line.strip())
-        else:
-            new_lines.append(line.strip())
-    return "\n".join(new_lines)
+    return "\n".join(line.strip() for line in text.splitlines())
 
 
 def normalize_tables(text: str) -> str:
@@ -45,8 +43,8 @@ def normalize_tables(text: str) -> str:
     lines = text.splitlines()
     new_lines = []
     for line in lines:
-        if re.search(r"\s{2,}", line):
-            cols = re.split(r"\s{2,}", line.strip())
+        if COLUMN_GAP_RE.search(line):
+            cols = COLUMN_GAP_RE.split(line.strip())
             new_lines.append(" | ".join(cols))
         else:
             new_lines.append(line)
@@ -55,9 +53,23 @@ def normalize_tables(text: str) -> str:
 
 def preprocess(text: str) -> str:
     """
-    Full preprocessing pipeline.
+    Full preprocessing pipeline, in a single pass over the lines.
+    Same output as normalize_tables(normalize_lists(clean_text(text))): once clean_text has collapsed
+    whitespace runs, list normalization and table splitting have nothing left to change.
     """
-    text = clean_text(text)
-    text = normalize_lists(text)
-    text = normalize_tables(text)
-    return text
+    # Remove page markers, then normalize bullets
+    if "--- Page " in text:
+        text = PAGE_MARKER_RE.sub("", text)
+    for bullet in BULLETS:
+        if bullet in text:
+            text = text.replace(bullet, "-")
+    # Collapse whitespace line by line and drop empty lines
+    return "\n".join(filter(None, [" ".join(line.split()) for line in text.splitlines()]))
+
+
+def preprocess_batch(texts, workers: int = 1, chunksize: int = 64) -> list:
+    """Preprocesses many documents, optionally on a process pool."""
+    if workers <= 1:
+        return [preprocess(text) for text in texts]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(preprocess, texts, chunksize=chunksize))
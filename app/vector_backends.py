@@ -0,0 +1,223 @@
+import json
+import os
+import numpy as np
+from app.config import OFFLINE_MODE
+from app.metadata_index import MetadataIndex, to_chroma_where
+
+
+def normalize(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+
+class VectorBackend:
+    """
+    Vector index behind DocumentStore. The API follows the Chroma collection API:
+    `where` filters use Chroma syntax and query/get return Chroma-shaped dicts.
+    """
+
+    space = "l2"  # distance reported by query(): "l2" (squared), "cosine" or "ip"
+    max_batch_size = None  # largest add/upsert batch, None if unbounded
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def add(self, ids, embeddings, metadatas=None, documents=None):
+        raise NotImplementedError
+
+    def upsert(self, ids, embeddings, metadatas=None, documents=None):
+        raise NotImplementedError
+
+    def delete(self, ids=None, where=None):
+        raise NotImplementedError
+
+    def get(self, ids=None, where=None, include=("metadatas",)):
+        raise NotImplementedError
+
+    def query(self, query_embeddings, n_results: int = 10, where: dict = None,
+              include=("metadatas", "documents", "distances")):
+        raise NotImplementedError
+
+    def persist(self):
+        """Flushes pending writes to disk."""
+
+
+class ChromaBackend(VectorBackend):
+    """A ChromaDB collection in a persistent client."""
+
+    def __init__(self, path: str, collection_name: str):
+        import chromadb
+        from chromadb.config import Settings
+        # No telemetry requests in offline mode
+        self.client = chromadb.PersistentClient(path=path, settings=Settings(anonymized_telemetry=not OFFLINE_MODE))
+        self.collection = self.client.get_or_create_collection(collection_name)
+        self.space = (self.collection.metadata or {}).get("hnsw:space", "l2")
+        self.max_batch_size = self.client.get_max_batch_size()
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def add(self, ids, embeddings, metadatas=None, documents=None):
+        self.collection.add(ids=ids, embeddings=embeddings, metadatas=metadatas, documents=documents)
+
+    def upsert(self, ids, embeddings, metadatas=None, documents=None):
+        self.collection.upsert(ids=ids, embeddings=embeddings, metadatas=metadatas, documents=documents)
+
+    def delete(self, ids=None, where=None):
+        self.collection.delete(ids=ids, where=to_chroma_where(where))
+
+    def get(self, ids=None, where=None, include=("metadatas",)):
+        return self.collection.get(ids=ids, where=to_chroma_where(where), include=list(include))
+
+    def query(self, query_embeddings, n_results: int = 10, where: dict = None,
+              include=("metadatas", "documents", "distances")):
+        return self.collection.query(query_embeddings=query_embeddings, n_results=n_results,
+                                     where=to_chroma_where(where), include=list(include))
+
+
+class HNSWBackend(VectorBackend):
+    """
+    Local approximate index (hnswlib, cosine space), persisted as index.bin plus a labels file.
+    M and ef_construction shape the graph; ef_search trades recall for query latency.
+    Deleted items are marked as deleted and their labels are reused by later additions, which hnswlib updates in
+    place, so the graph and the labels file do not grow with churn.
+    """
+
+    space = "cosine"
+
+    def __init__(self, path: str, dim: int, documents=None, M: int = 16, ef_construction: int = 200,
+                 ef_search: int = 100, initial_capacity: int = 1024):
+        try:
+            import hnswlib
+        except ImportError as e:
+            raise ImportError("The HNSW vector backend requires hnswlib (pip install hnswlib).") from e
+        self.path = path
+        self.dim = dim
+        self.documents = documents  # optional callable: chunk ID -> document text
+        self.ef_search = ef_search
+        os.makedirs(path, exist_ok=True)
+        self.index_path = os.path.join(path, "index.bin")
+        self.labels_path = os.path.join(path, "labels.json")
+
+        self.index = hnswlib.Index(space="cosine", dim=dim)
+        self.ids, self.metadatas = [], []  # by label; deleted labels hold None
+        if os.path.exists(self.index_path):
+            with open(self.labels_path, "r", encoding="utf-8") as f:
+                labels = json.load(f)
+            self.ids, self.metadatas = labels["ids"], labels["metadatas"]
+            self.index.load_index(self.index_path, max_elements=max(len(self.ids), initial_capacity))
+        else:
+            self.index.init_index(max_elements=initial_capacity, ef_construction=ef_construction, M=M)
+        self.index.set_ef(ef_search)
+        self.id_to_label = {cid: label for label, cid in enumerate(self.ids) if cid is not None}
+        self.free_labels = [label for label, cid in enumerate(self.ids) if cid is None][::-1]
+        self.dirty = False
+        self._metadata_index = None  # built on the first filtered query, dropped on writes
+
+    def count(self) -> int:
+        return len(self.id_to_label)
+
+    def add(self, ids, embeddings, metadatas=None, documents=None):
+        """Adds items; IDs already in the index are updated in place."""
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), self.dim)
+        metadatas = metadatas or [{}] * len(ids)
+        labels = []
+        for cid, meta in zip(ids, metadatas):
+            label = self.id_to_label.get(cid)
+            if label is None and self.free_labels:
+                label = self.free_labels.pop()
+                self.ids[label], self.metadatas[label] = cid, meta
+                self.id_to_label[cid] = label
+            elif label is None:
+                label = len(self.ids)
+                self.ids.append(cid)
+                self.metadatas.append(meta)
+                self.id_to_label[cid] = label
+            else:
+                self.metadatas[label] = meta
+            labels.append(label)
+        if len(self.ids) > self.index.get_max_elements():
+            self.index.resize_index(max(len(self.ids), 2 * self.index.get_max_elements()))
+        self.index.add_items(embeddings, np.asarray(labels, dtype=np.int64))
+        self.dirty = True
+        self._metadata_index = None
+
+    upsert = add
+
+    def delete(self, ids=None, where=None):
+        labels = [self.id_to_label[cid] for cid in ids or [] if cid in self.id_to_label]
+        if where:
+            labels += self._labels(where)
+        for label in set(labels):
+            self.index.mark_deleted(label)
+            del self.id_to_label[self.ids[label]]
+            self.ids[label] = self.metadatas[label] = None
+            self.free_labels.append(label)
+        if labels:
+            self.dirty = True
+            self._metadata_index = None
+
+    def _labels(self, where: dict = None):
+        """Live labels matching `where`, in label order."""
+        if not where:
+            return sorted(self.id_to_label.values())
+        if self._metadata_index is None:
+            self._metadata_index = MetadataIndex(self.metadatas)
+        return [label for label in self._metadata_index.rows(where).tolist() if self.ids[label] is not None]
+
+    def get(self, ids=None, where=None, include=("metadatas",)):
+        if ids is None:
+            labels = self._labels(where)
+        else:
+            labels = [self.id_to_label[cid] for cid in ids if cid in self.id_to_label]
+        result = {"ids": [self.ids[label] for label in labels]}
+        if "embeddings" in include:
+            result["embeddings"] = (np.asarray(self.index.get_items(labels), dtype=np.float32) if labels
+                                    else np.zeros((0, self.dim), dtype=np.float32))
+        if "metadatas" in include:
+            result["metadatas"] = [self.metadatas[label] for label in labels]
+        if "documents" in include:
+            result["documents"] = [self.documents(cid) if self.documents else None for cid in result["ids"]]
+        return result
+
+    def query(self, query_embeddings, n_results: int = 10, where: dict = None,
+              include=("metadatas", "documents", "distances")):
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        allowed = self._labels(where) if where else None
+        k = min(n_results, self.count() if allowed is None else len(allowed))
+        if k <= 0:
+            labels, distances = np.zeros((len(queries), 0), dtype=np.int64), np.zeros((len(queries), 0))
+        else:
+            allowed_set = None if allowed is None else set(allowed)
+            self.index.set_ef(max(self.ef_search, k))
+            try:
+                labels, distances = self.index.knn_query(
+                    queries, k=k, filter=None if allowed_set is None else allowed_set.__contains__)
+            except RuntimeError:
+                # Too few reachable matches for a selective filter: score the allowed items exactly
+                vectors = normalize(self.index.get_items(allowed))
+                sims = normalize(queries) @ vectors.T
+                order = np.argsort(-sims, axis=1, kind="stable")[:, :k]
+                labels = np.asarray(allowed)[order]
+                distances = 1 - np.take_along_axis(sims, order, axis=1)
+        result = {"ids": [[self.ids[label] for label in q_labels] for q_labels in labels]}
+        if "distances" in include:
+            result["distances"] = [np.asarray(q_dist, dtype=np.float64).tolist() for q_dist in distances]
+        if "metadatas" in include:
+            result["metadatas"] = [[self.metadatas[label] for label in q_labels] for q_labels in labels]
+        if "documents" in include:
+            result["documents"] = [[self.documents(cid) if self.documents else None for cid in q_ids]
+                                   for q_ids in result["ids"]]
+        return result
+
+    def persist(self):
+        """Saves the graph and labels atomically."""
+        if not self.dirty:
+            return
+        self.index.save_index(self.index_path + ".tmp")
+        with open(self.labels_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"ids": self.ids, "metadatas": self.metadatas}, f, ensure_ascii=False)
+        os.replace(self.labels_path + ".tmp", self.labels_path)
+        os.replace(self.index_path + ".tmp", self.index_path)
+        self.dirty = False
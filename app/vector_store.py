@@ -1,46 +1,170 @@
-import chromadb
+import hashlib
 import json
-import nltk
+from concurrent.futures import CancelledError, ThreadPoolExecutor, TimeoutError
 import numpy as np
 import os
 import re
-from sentence_transformers import SentenceTransformer, CrossEncoder
-from rank_bm25 import BM25Okapi
-from transformers import pipeline
-from nltk.tokenize import word_tokenize
-from cachetools import TTLCache, cachedmethod
+import threading
+from cachetools import LRUCache, TTLCache, cachedmethod
+from cachetools.keys import hashkey
 from operator import attrgetter
-from app.config import CHUNKS_FILE, CHROMA_DB_DIR, QUERY_CACHE_TTL, QUERY_CACHE_SIZE
-
-
-# Download tokenizer
-nltk.download("punkt")
+from app.config import (CHUNKS_FILE, CHROMA_DB_DIR, QUERY_CACHE_TTL, QUERY_CACHE_SIZE, MANIFEST_FILE,
+                        INCREMENTAL_INGEST, EMBED_BATCH_SIZE, INGEST_BATCH_SIZE, INGEST_PIPELINE, EMBED_MODEL_NAME,
+                        EMBEDDING_STORE_DIR, EMBEDDING_STORE_ENABLED, HYBRID_CANDIDATES, HYBRID_FUSION, RRF_K,
+                        VECTOR_BACKEND, DENSE_INDEX_DIR, DENSE_BLOCK_SIZE,
+                        HNSW_INDEX_DIR, HNSW_M, HNSW_EF_CONSTRUCTION, HNSW_EF_SEARCH, BM25_SNAPSHOT,
+                        RERANK_BATCH_SIZE, RERANK_MAX_WAIT_MS, RERANK_CACHE_SIZE,
+                        QUERY_EMBED_BATCH_SIZE, QUERY_EMBED_MAX_WAIT_MS, EXPANSION_MODEL_NAME,
+                        CROSS_ENCODER_MODEL_NAME, EXPANSION_CACHE_ENABLED, EXPANSION_CACHE_FILE, EXPANSION_DEADLINE_MS,
+                        EXPANSION_MAX_PENDING, LAZY_LOADING, OFFLINE_MODE)
+from app.chunk_store import open_chunks
+from app.batching import MicroBatcher
+from app.inference import load_embedder, load_cross_encoder, load_rewriter, model_variant
+from app.embedding_store import EmbeddingStore
+from app.expansion_cache import ExpansionCache, MemoryExpansionCache, expansion_prompt
+from app.dense_index import DenseIndex
+from app.vector_backends import ChromaBackend, HNSWBackend
+from app.bm25 import BM25Index, snapshot_path, corpus_version
+from app.tokenizer import tokenize, tokenize_query
+from app.metadata_index import MetadataIndex
+from app.fusion import (FUSION_MODES, align_candidates, weighted_fusion, select_top, minmax_normalize,
+                        zscore_normalize, rank_fusion)
+from app.manifest import load_manifest, save_manifest, diff_manifests
+from app.startup import LazyResource, PhaseTimer
 
 
 class DocumentStore:
-    def __init__(self, chunks_path=CHUNKS_FILE, collection_name="documents"):
-        """DocumentStore initializer."""
+    # Models and indexes are loaded on first use (or by warmup()); see app/startup.py
+    embed_model = LazyResource(lambda self: load_embedder(EMBED_MODEL_NAME))
+    embedding_store = LazyResource(lambda self: EmbeddingStore(
+        EMBEDDING_STORE_DIR, model_variant(EMBED_MODEL_NAME), self.embedding_dim) if EMBEDDING_STORE_ENABLED else None)
+    collection = LazyResource(lambda self: self._open_vector_backend(VECTOR_BACKEND))
+    cross_encoder = LazyResource(lambda self: load_cross_encoder(CROSS_ENCODER_MODEL_NAME))
+    query_rewriter = LazyResource(lambda self: load_rewriter(EXPANSION_MODEL_NAME))
+    # Finished expansions are kept even with EXPANSION_CACHE_ENABLED = False, in memory only
+    expansion_cache = LazyResource(lambda self: ExpansionCache(
+        EXPANSION_CACHE_FILE, model_variant(EXPANSION_MODEL_NAME)) if EXPANSION_CACHE_ENABLED
+        else MemoryExpansionCache(model_variant(EXPANSION_MODEL_NAME), maxsize=QUERY_CACHE_SIZE))
+    # Generation runs off the request thread so it can be abandoned at the deadline
+    expansion_executor = LazyResource(
+        lambda self: ThreadPoolExecutor(max_workers=1, thread_name_prefix="query-expansion"))
+    bm25 = LazyResource(lambda self: self._load_bm25())
+    LAZY_RESOURCES = ("bm25", "embed_model", "embedding_store", "collection", "cross_encoder", "query_rewriter",
+                      "expansion_cache")
+
+    def __init__(self, chunks_path=CHUNKS_FILE, collection_name="documents", lazy: bool = LAZY_LOADING):
+        """DocumentStore initializer. With lazy=False every model and index is loaded here."""
+        self.startup = PhaseTimer()
         self.chunks_path = chunks_path
         self.collection_name = collection_name
         self.embedding_cache = TTLCache(maxsize=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL)
+        self.embedding_lock = threading.Lock()
         self.query_cache = TTLCache(maxsize=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL)
-        self.chroma_client = chromadb.PersistentClient(path=CHROMA_DB_DIR)
-        self.collection = self.chroma_client.get_or_create_collection(self.collection_name)
+        # Cross-encoder scores by (query, chunk ID); cleared when the chunks are reloaded
+        self.pair_score_cache = LRUCache(maxsize=RERANK_CACHE_SIZE)
+        self.pair_score_lock = threading.Lock()
 
         # Load chunks
-        if not os.path.exists(chunks_path):
-            raise FileNotFoundError(f"{chunks_path} not found. Please run chunking first.")
-        with open(chunks_path, "r", encoding="utf-8") as f:
-            self.chunks = json.load(f)
+        self.chunks = None
+        self.tokenized_chunks = []
+        self.content_digests = []
+        self.previous_tokens = {}
+        self.load_chunks()
+
+        index_dir = {"dense": DENSE_INDEX_DIR, "hnsw": HNSW_INDEX_DIR}.get(VECTOR_BACKEND, CHROMA_DB_DIR)
+        self.index_manifest_path = os.path.join(index_dir, f"{self.collection_name}_manifest.json")
+
+        # Concurrent embed_text calls share SentenceTransformer.encode batches
+        self.embed_batcher = MicroBatcher(self._encode_queries, max_batch_size=QUERY_EMBED_BATCH_SIZE,
+                                          max_wait=QUERY_EMBED_MAX_WAIT_MS / 1000, name="embed-batcher")
+        # Pairs of concurrent advanced_search requests share cross-encoder forward passes
+        self.rerank_batcher = MicroBatcher(
+            lambda pairs: self.cross_encoder.predict(pairs, batch_size=RERANK_BATCH_SIZE),
+            max_batch_size=RERANK_BATCH_SIZE, max_wait=RERANK_MAX_WAIT_MS / 1000, name="rerank-batcher",
+        )
+        self.pending_expansions = {}  # query -> future of a running generation
+        self.pending_expansions_lock = threading.RLock()
+        if not lazy:
+            self.warmup(inference=False)
+
+    @property
+    def embedding_dim(self) -> int:
+        return self.embed_model.get_sentence_embedding_dimension()
+
+    def warmup(self, inference: bool = True):
+        """
+        Loads every model and index now instead of on first use. With `inference`, each model also runs once,
+        so the first request does not pay for the lazy initialization inside the libraries.
+        """
+        for name in self.LAZY_RESOURCES:
+            getattr(self, name)
+        if inference:
+            with self.startup.phase("warmup:embed_model"):
+                self.embed_model.encode(["warmup"])
+            with self.startup.phase("warmup:cross_encoder"):
+                self.cross_encoder.predict([["warmup", "warmup"]])
+            with self.startup.phase("warmup:query_rewriter"):
+                self.query_rewriter(expansion_prompt("warmup"))
+
+    def startup_report(self) -> dict:
+        """Startup phase timings, plus which models and indexes are loaded so far."""
+        report = self.startup.report()
+        report["loaded"] = [name for name in self.LAZY_RESOURCES if getattr(type(self), name).is_loaded(self)]
+        report["not_loaded"] = [name for name in self.LAZY_RESOURCES if name not in report["loaded"]]
+        report["offline_mode"] = OFFLINE_MODE
+        return report
+
+    def load_chunks(self):
+        """(Re)loads the chunks file and its metadata index. The BM25 index is rebuilt on next use."""
+        if not os.path.exists(self.chunks_path):
+            raise FileNotFoundError(f"{self.chunks_path} not found. Please run chunking first.")
+        with self.startup.phase("chunks"):
+            chunks = open_chunks(self.chunks_path)
+        self.chunks_stat = self._stat_chunks()
+        if self.tokenized_chunks:
+            # Token lists are reused by chunk ID when the content digest is unchanged
+            self.previous_tokens = dict(zip(self.chunks.ids, zip(self.content_digests, self.tokenized_chunks)))
+            self.tokenized_chunks, self.content_digests = [], []
+        if self.chunks:
+            self.chunks.close()
+        self.chunks = chunks
+        with self.startup.phase("metadata_index"):
+            self.metadata_index = MetadataIndex(chunks.metadatas)
+        del self.bm25
+        self.query_cache.clear()
+        with self.pair_score_lock:
+            self.pair_score_cache.clear()
 
-        # Build BM25 index
-        self.tokenized_chunks = [word_tokenize(c["content"].lower()) for c in self.chunks]
-        self.bm25 = BM25Okapi(self.tokenized_chunks)
+    def _stat_chunks(self):
+        stat = os.stat(self.chunks_path)
+        return stat.st_mtime_ns, stat.st_size
 
-        # Load embedding model
-        self.embed_model = SentenceTransformer("all-MiniLM-L6-v2")
-        self.cross_encoder = CrossEncoder("cross-encoder/ms-marco-MiniLM-L-6-v2")
-        self.query_rewriter = pipeline("text2text-generation", model="google/flan-t5-small")
+    def _load_bm25(self):
+        """
+        BM25 index of the current chunks. The snapshot written at build time is memory-mapped when it matches
+        the chunks file; otherwise the index is rebuilt, reusing the tokens of chunks whose content did not change.
+        """
+        if BM25_SNAPSHOT:
+            with self.startup.phase("bm25_snapshot"):
+                bm25 = BM25Index.load(snapshot_path(self.chunks_path), corpus_version(self.chunks_path))
+            if bm25 is not None and bm25.corpus_size == len(self.chunks):
+                self.tokenized_chunks, self.content_digests = [], []
+                return bm25
+            print("No up-to-date BM25 snapshot, tokenizing chunks...")
+        tokenized_chunks, content_digests = [], []
+        with self.startup.phase("tokenization"):
+            for cid, c in zip(self.chunks.ids, self.chunks):
+                digest = hashlib.blake2b(c["content"].encode("utf-8"), digest_size=16).digest()
+                old_digest, tokens = self.previous_tokens.get(cid, (None, None))
+                if old_digest != digest:
+                    tokens = tokenize(c["content"])
+                tokenized_chunks.append(tokens)
+                content_digests.append(digest)
+        self.tokenized_chunks = tokenized_chunks
+        self.content_digests = content_digests
+        self.previous_tokens = {}
+        with self.startup.phase("bm25_build"):
+            return BM25Index(tokenized_chunks)
 
     def _query_cache_key(self, *args, **kwargs):
         default_top_k = 5
@@ -51,6 +175,8 @@ class DocumentStore:
         w_semantic = kwargs.get("w_semantic", args[2] if len(args) > 2 else default_w_semantic)
         w_keyword = kwargs.get("w_keyword", args[3] if len(args) > 3 else default_w_keyword)
         metadata_filter = kwargs.get("metadata_filter", args[4] if len(args) > 4 else None)
+        fusion = kwargs.get("fusion", args[6] if len(args) > 6 else HYBRID_FUSION)
+        rank_depth = kwargs.get("rank_depth", args[7] if len(args) > 7 else None)
         try:
             top_k = int(top_k)
         except Exception:
@@ -66,19 +192,55 @@ class DocumentStore:
         if metadata_filter is None:
             mf_tuple = tuple()
         elif isinstance(metadata_filter, dict):
-            mf_tuple = tuple(sorted(metadata_filter.items()))
+            # Filters may nest ($and / $or / $in), so the key is their canonical JSON
+            mf_tuple = (json.dumps(metadata_filter, sort_keys=True, default=str),)
         else:
             mf_tuple = (str(metadata_filter),)
-        return str(query), top_k, round(w_semantic, 6), round(w_keyword, 6), mf_tuple
+        return str(query), top_k, round(w_semantic, 6), round(w_keyword, 6), mf_tuple, str(fusion), rank_depth
 
-    def expand_query(self, query: str):
-        """Expand query using Hugging Face."""
-        expanded = self.query_rewriter(
-            f"Rewrite this query to improve search results. Keep the meaning, add synonyms and context {query}"
-        )
-        return expanded[0]['generated_text']
+    def _generate_expansion(self, query: str) -> str:
+        expanded = self.query_rewriter(expansion_prompt(query))[0]["generated_text"]
+        self.expansion_cache.put(query, expanded)
+        return expanded
 
-    def sanitize_query(self, query: str) -> str:
+    def expand_query(self, query: str, deadline_ms: int = EXPANSION_DEADLINE_MS):
+        """
+        Expand query using Hugging Face. Expansions are read from (and written to) the expansion cache.
+        On a miss, generation gets `deadline_ms`; if it takes longer the original query is used, and the
+        expansion is still cached for later requests when it finishes. Generations run one at a time; at most
+        EXPANSION_MAX_PENDING distinct queries wait for one, further misses use the original query right away.
+        """
+        return self._expand(query, deadline_ms)[0]
+
+    def _expand(self, query: str, deadline_ms: int = EXPANSION_DEADLINE_MS):
+        """(query to search with, whether it is the expansion) — False when expand_query fell back."""
+        cached = self.expansion_cache.get(query)
+        if cached is not None:
+            return cached, True
+        with self.pending_expansions_lock:
+            # Concurrent misses of the same query share one generation
+            future = self.pending_expansions.get(query)
+            if future is None:
+                if len(self.pending_expansions) >= EXPANSION_MAX_PENDING:
+                    print("Query expansion is busy, using the original query.")
+                    return query, False
+                future = self.expansion_executor.submit(self._generate_expansion, query)
+                self.pending_expansions[query] = future
+                future.add_done_callback(lambda _: self._forget_expansion(query))
+        try:
+            return future.result(timeout=deadline_ms / 1000 if deadline_ms is not None else None), True
+        except (TimeoutError, CancelledError):
+            # A generation that has not started yet is dropped; a running one finishes and fills the cache
+            future.cancel()
+            print(f"Query expansion took longer than {deadline_ms} ms, using the original query.")
+            return query, False
+
+    def _forget_expansion(self, query: str):
+        with self.pending_expansions_lock:
+            self.pending_expansions.pop(query, None)
+
+    @staticmethod
+    def sanitize_query(query: str) -> str:
         """
         Prevent prompt injection by removing dangerous instructions.
         Example: 'ignore previous instructions', 'delete', 'system prompt'
@@ -96,34 +258,197 @@ class DocumentStore:
 
         return clean_query
 
-    @cachedmethod(attrgetter("embedding_cache"))
-    def embed_text(self, text: str):
-        emb = self.embed_model.encode(text)
-        if isinstance(emb, np.ndarray):
-            emb = emb.tolist()
+    def _encode_queries(self, texts: list) -> np.ndarray:
+        """Batch function of the query embedding batcher; queries are looked up in the store but not added to it."""
+        return self.embed_texts(texts, batch_size=len(texts), persist=False)
+
+    @cachedmethod(attrgetter("embedding_cache"), lock=attrgetter("embedding_lock"))
+    def embed_text(self, text: str) -> np.ndarray:
+        """Query embedding (float32 array). Concurrent calls are encoded together in one batch."""
+        return self.embed_batcher([text])[0]
+
+    async def embed_text_async(self, text: str) -> np.ndarray:
+        """embed_text for async code: awaits the batch without blocking the event loop."""
+        key = hashkey(text)
+        with self.embedding_lock:
+            emb = self.embedding_cache.get(key)
+        if emb is None:
+            emb = (await self.embed_batcher.call_async([text]))[0]
+            with self.embedding_lock:
+                self.embedding_cache[key] = emb
         return emb
 
-    def ingest_chunks(self):
-        """Ingest chunks into ChromaDB if empty."""
+    def _chunk_id(self, idx: int) -> str:
+        return self.chunks.ids[idx]
+
+    def _chunk_content(self, chunk_id: str) -> str:
+        chunk = self.chunks.get(chunk_id)
+        return chunk["content"] if chunk else None
+
+    def chunk_context(self, chunk: dict, chars: int = 200):
+        """
+        Text of `chunk` widened by up to `chars` characters on each side, from the saved source text its
+        char_start/char_end point into. Returns (text, (start, end) of the chunk inside it); None without source texts.
+        """
+        meta = chunk["metadata"]
+        text = self.chunks.texts.get(meta["text_id"]) if "text_id" in meta else None
+        if text is None:
+            return None
+        start, end = max(0, meta["char_start"] - chars), min(len(text), meta["char_end"] + chars)
+        return text[start:end], (meta["char_start"] - start, meta["char_end"] - start)
+
+    def _open_vector_backend(self, backend: str, name: str = None):
+        """
+        Opens the configured vector backend: chroma, dense or hnsw (collection `name`, default collection_name).
+        Only dense and hnsw need the embedding dimension, so only they load the embedding model.
+        """
+        name = name or self.collection_name
+        if backend == "dense":
+            return DenseIndex(os.path.join(DENSE_INDEX_DIR, name), self.embedding_dim,
+                              documents=self._chunk_content, block_size=DENSE_BLOCK_SIZE)
+        if backend == "hnsw":
+            return HNSWBackend(os.path.join(HNSW_INDEX_DIR, name), self.embedding_dim,
+                               documents=self._chunk_content, M=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION,
+                               ef_search=HNSW_EF_SEARCH)
+        if backend == "chroma":
+            return ChromaBackend(CHROMA_DB_DIR, name)
+        raise ValueError(f"Unknown vector backend '{backend}', expected chroma, dense or hnsw.")
+
+    def embed_texts(self, texts: list, batch_size: int = EMBED_BATCH_SIZE, persist: bool = True) -> np.ndarray:
+        """
+        Encodes many texts in batches. Returns a float32 array of shape (len(texts), dim).
+        Embeddings found in the embedding store are reused; only missing (distinct) texts are encoded,
+        and added to the store when `persist` is set.
+        """
+        if self.embedding_store is None:
+            return np.asarray(
+                self.embed_model.encode(texts, batch_size=batch_size, convert_to_numpy=True),
+                dtype=np.float32,
+            )
+
+        vectors, found = self.embedding_store.get_many(texts)
+        if not found.all():
+            missing = {}
+            for i in np.flatnonzero(~found):
+                missing.setdefault(self.embedding_store.key(texts[i]), []).append(i)
+            positions = list(missing.values())
+            new_texts = [texts[rows[0]] for rows in positions]
+            new_vectors = np.asarray(
+                self.embed_model.encode(new_texts, batch_size=batch_size, convert_to_numpy=True),
+                dtype=np.float32,
+            )
+            for rows, vector in zip(positions, new_vectors):
+                vectors[rows] = vector
+            if persist:
+                self.embedding_store.put_many(new_texts, new_vectors)
+        return vectors
+
+    def _iter_batches(self, indices, batch_size: int):
+        batch = []
+        for idx in indices:
+            batch.append(idx)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _write_chunks(self, indices, upsert=False, batch_size: int = INGEST_BATCH_SIZE,
+                      pipelined: bool = INGEST_PIPELINE):
+        """
+        Embeds the chunks at `indices` and adds (or upserts) them into the vector index in bounded batches.
+        With pipelined=True the next batch is encoded while the current one is being written.
+        """
+        indices = list(indices)
+        if self.collection.max_batch_size:
+            batch_size = min(batch_size, self.collection.max_batch_size)
+        write = self.collection.upsert if upsert else self.collection.add
+
+        def write_batch(batch, embeddings):
+            write(
+                ids=[self._chunk_id(idx) for idx in batch],
+                embeddings=embeddings,
+                metadatas=[self.chunks.metadatas[idx] for idx in batch],
+                documents=[self.chunks.content(idx) for idx in batch]
+            )
+            return len(batch)
+
+        done = 0
+
+        def report(future):
+            nonlocal done
+            done += future.result()
+            print(f"Ingested {done}/{len(indices)} chunks...")
+
+        with ThreadPoolExecutor(max_workers=1) as writer:
+            pending = None
+            for batch in self._iter_batches(indices, batch_size):
+                embeddings = self.embed_texts([self.chunks.content(idx) for idx in batch])
+                if pending is not None:
+                    report(pending)
+                pending = writer.submit(write_batch, batch, embeddings)
+                if not pipelined:
+                    report(pending)
+                    pending = None
+            if pending is not None:
+                report(pending)
+        return done
+
+    def ingest_chunks(self, incremental: bool = INCREMENTAL_INGEST, manifest_path: str = MANIFEST_FILE):
+        """
+        Ingest chunks into the vector index (VECTOR_BACKEND: chroma, dense or hnsw).
+        Without a build manifest (or with incremental=False) chunks are only ingested if the collection is empty.
+        """
+        if incremental and os.path.exists(manifest_path):
+            return self.sync_chunks(manifest_path)
         if self.collection.count() > 0:
             print(f"Collection already has {self.collection.count()} chunks.")
             return
         print("Collection empty — ingesting chunks...")
-        ids, embeddings, metadatas, documents = [], [], [], []
-
-        for idx, chunk in enumerate(self.chunks):
-            ids.append(str(idx))
-            emb = self.embed_text(chunk["content"])
-            embeddings.append(emb)
-            metadatas.append(chunk["metadata"])
-            documents.append(chunk["content"])
-        self.collection.add(
-            ids=ids,
-            embeddings=embeddings,
-            metadatas=metadatas,
-            documents=documents
-        )
-        print(f"Ingested {len(documents)} chunks into ChromaDB.")
+        count = self._write_chunks(range(len(self.chunks)))
+        self.collection.persist()
+        if os.path.exists(manifest_path):
+            save_manifest(load_manifest(manifest_path), self.index_manifest_path)
+        print(f"Ingested {count} chunks into the {VECTOR_BACKEND} index.")
+
+    def sync_chunks(self, manifest_path: str = MANIFEST_FILE):
+        """
+        Incrementally brings the vector index and BM25 in line with the latest build.
+        The build manifest (file path -> content hash -> chunk IDs) is compared with the manifest of
+        the last sync: chunks of new or changed files are re-embedded and upserted, chunks of removed
+        files are deleted. Unchanged files cost nothing.
+        """
+        if self._stat_chunks() != self.chunks_stat:
+            self.load_chunks()
+        manifest = load_manifest(manifest_path)
+        indexed = load_manifest(self.index_manifest_path)
+        changed, removed = diff_manifests(indexed, manifest)
+        # Files whose chunk IDs changed (e.g. IDs of an older build scheme) are re-indexed as well
+        changed += [path for path in set(manifest).intersection(indexed).difference(changed)
+                    if indexed[path]["chunk_ids"] != manifest[path]["chunk_ids"]]
+        if not changed and not removed:
+            print("Vector index is up to date with the build manifest.")
+            return 0, 0
+
+        new_ids = {cid for path in changed for cid in manifest[path]["chunk_ids"]}
+        if indexed:
+            stale_ids = {cid for path in changed + removed if path in indexed
+                         for cid in indexed[path]["chunk_ids"]}
+        else:
+            # First sync: drop anything the collection holds that is not part of this build
+            all_ids = set(self.chunks.ids)
+            stale_ids = set(self.collection.get(include=[])["ids"]) - all_ids
+        delete_ids = sorted(stale_ids - new_ids)
+        if delete_ids:
+            self.collection.delete(ids=delete_ids)
+
+        upserted = self._write_chunks([idx for idx in range(len(self.chunks)) if self._chunk_id(idx) in new_ids],
+                                      upsert=True)
+        self.collection.persist()
+        save_manifest(manifest, self.index_manifest_path)
+        print(f"Synced {len(changed)} changed and {len(removed)} removed files: "
+              f"upserted {upserted} chunks, deleted {len(delete_ids)}.")
+        return upserted, len(delete_ids)
 
     def semantic_search(self, query: str, top_k: int = 3, metadata_filter: dict = None):
         """Semantic search."""
@@ -152,18 +477,13 @@ class DocumentStore:
     def keyword_search(self, query: str, top_k: int = 3, metadata_filter: dict = None):
         """Keyword search."""
         query = self.sanitize_query(query)
-        query_tokens = word_tokenize(query.lower())
-        scores = self.bm25.get_scores(query_tokens)
-        top_indices = np.argsort(scores)[-top_k:][::-1]
+        query_tokens = tokenize_query(query)
+        top_indices, _ = self.bm25.top_k(query_tokens, top_k, self.metadata_index.candidates(metadata_filter))
 
         print(f"\nKeyword Search Results for: '{query}'")
         results = []
         for idx in top_indices:
-            chunk = self.chunks[idx]
-            if metadata_filter:
-                match = all(chunk["metadata"].get(k) == v for k, v in metadata_filter.items())
-                if not match:
-                    continue
+            chunk = self.chunks[int(idx)]
             results.append(chunk)
             meta = chunk["metadata"]
             doc = chunk["content"]
@@ -171,37 +491,80 @@ class DocumentStore:
             print(f"  {doc[:200]}...\n")
         return results
 
+    def _semantic_scores(self, query_emb, indices) -> np.ndarray:
+        """1 - distance between the query and the stored embeddings of the given chunks, as the backend computes it."""
+        ids = [self._chunk_id(int(idx)) for idx in indices]
+        stored = self.collection.get(ids=ids, include=["embeddings"])
+        by_id = dict(zip(stored["ids"], stored["embeddings"]))
+        query_emb = np.asarray(query_emb, dtype=np.float64)
+        space = self.collection.space
+        scores = np.full(len(ids), np.nan)
+        for i, cid in enumerate(ids):
+            if cid not in by_id:
+                continue
+            emb = np.asarray(by_id[cid], dtype=np.float64)
+            if space == "cosine":
+                distance = 1 - emb @ query_emb / (np.linalg.norm(emb) * np.linalg.norm(query_emb) or 1)
+            elif space == "ip":
+                distance = 1 - emb @ query_emb
+            else:
+                distance = np.sum((emb - query_emb) ** 2)
+            scores[i] = 1 - distance
+        return scores
+
     @cachedmethod(attrgetter("query_cache"), key=_query_cache_key)
     def hybrid_search(self, query: str, top_k: int = 3, w_semantic: float = 0.7, w_keyword: float = 0.3,
-                      metadata_filter: dict = None, called_from_advanced: bool = False):
-        """Combine semantic + keyword scores with weights."""
-        # Semantic
+                      metadata_filter: dict = None, called_from_advanced: bool = False, fusion: str = HYBRID_FUSION,
+                      rank_depth: int = None):
+        """
+        Combine semantic + keyword scores with weights.
+        Only the top `rank_depth` (default HYBRID_CANDIDATES) chunks of each retriever are fused, aligned by chunk ID.
+        fusion: "weighted" (raw scores), "minmax" / "zscore" (per-retriever normalized scores)
+        or "rrf" (Reciprocal Rank Fusion).
+        """
+        if fusion not in FUSION_MODES:
+            raise ValueError(f"Unknown fusion mode '{fusion}', expected one of {', '.join(FUSION_MODES)}.")
         query = self.sanitize_query(query)
+        n_candidates = min(max(top_k, rank_depth or HYBRID_CANDIDATES), len(self.chunks))
+        if not n_candidates:
+            return []
+        # Semantic candidates
         query_emb = self.embed_text(query)
         sem_results = self.collection.query(
             query_embeddings=[query_emb],
-            n_results=len(self.chunks),
+            n_results=n_candidates,
             where=metadata_filter
         )
-        sem_scores = sem_results.get("distances", [[]])[0]
-        sem_scores = [1 - s for s in sem_scores]
-        # Keyword
-        query_tokens = word_tokenize(query.lower())
-        kw_scores = self.bm25.get_scores(query_tokens)
-        # Combine
-        final_scores = []
-        for i, chunk in enumerate(self.chunks):
-            if metadata_filter:
-                match = all(chunk["metadata"].get(k) == v for k, v in metadata_filter.items())
-                if not match:
-                    continue
-            sem_score = sem_scores[i] if i < len(sem_scores) else 0
-            kw_score = kw_scores[i] if i < len(kw_scores) else 0
-            final_score = w_semantic * sem_score + w_keyword * kw_score
-            final_scores.append((final_score, chunk))
-        # Sort by score
-        final_scores.sort(key=lambda x: x[0], reverse=True)
-        top_results = final_scores[:top_k]
+        sem_pairs = [(self.chunks.id_to_index[cid], 1 - dist)
+                     for cid, dist in zip(sem_results.get("ids", [[]])[0], sem_results.get("distances", [[]])[0])
+                     if cid in self.chunks.id_to_index]
+        sem_indices = np.array([idx for idx, _ in sem_pairs], dtype=np.int64)
+        sem_scores = np.array([score for _, score in sem_pairs], dtype=np.float64)
+        # Keyword candidates
+        query_tokens = tokenize_query(query)
+        candidates = self.metadata_index.candidates(metadata_filter)
+        kw_indices, kw_scores = self.bm25.top_k(query_tokens, n_candidates, candidates)
+        # Combine over the candidate union
+        indices, sem, kw = align_candidates(sem_indices, sem_scores, kw_indices, kw_scores)
+        if fusion == "weighted":
+            # Scores missing from one retriever are computed for those chunks only
+            missing = np.isnan(sem)
+            if missing.any():
+                sem[missing] = self._semantic_scores(query_emb, indices[missing])
+                # Chunks that are not in the collection yet are left out, as in a semantic search
+                indices, sem = indices[~np.isnan(sem)], sem[~np.isnan(sem)]
+            fused = weighted_fusion(sem, self.bm25.get_batch_scores(query_tokens, indices), w_semantic, w_keyword)
+        elif fusion == "minmax":
+            fused = weighted_fusion(minmax_normalize(sem), minmax_normalize(kw), w_semantic, w_keyword)
+        elif fusion == "zscore":
+            fused = weighted_fusion(zscore_normalize(sem), zscore_normalize(kw), w_semantic, w_keyword)
+        else:
+            _, sem_rank, kw_rank = align_candidates(sem_indices, np.arange(len(sem_indices)),
+                                                    kw_indices, np.arange(len(kw_indices)))
+            fused = rank_fusion(sem_rank, kw_rank, w_semantic, w_keyword, k=RRF_K)
+        indices, scores = select_top(indices, fused, top_k)
+        # Only the top chunks are materialized
+        top_results = [(float(score), self.chunks[int(i)]) for score, i in zip(scores, indices)]
         if not called_from_advanced:
             print(f"\n Hybrid Search Results for: '{query}' ")
             for score, chunk in top_results:
@@ -211,11 +574,19 @@ class DocumentStore:
                 print(f"  {doc[:200]}...\n")
         return top_results
 
-    @cachedmethod(attrgetter("query_cache"), key=_query_cache_key)
     def advanced_search(self, query: str, top_k=3, w_semantic=0.7, w_keyword=0.3, metadata_filter=None):
+        """
+        Query expansion, hybrid search and cross-encoder reranking.
+        Results are cached in query_cache, unless expansion fell back to the original query:
+        the next request then searches with the expansion once it is cached.
+        """
+        key = ("advanced",) + self._query_cache_key(query, top_k, w_semantic, w_keyword, metadata_filter)
+        cached = self.query_cache.get(key)
+        if cached is not None:
+            return cached
         # Step 1: Query expansion
         query = self.sanitize_query(query)
-        expanded_query = self.expand_query(query)
+        expanded_query, expanded = self._expand(query)
         print(f"\nExpanded query: {expanded_query}")
         # Step 2: Hybrid search
         top_chunks = self.hybrid_search(expanded_query, top_k=3, w_semantic=w_semantic, w_keyword=w_keyword,
@@ -228,11 +599,25 @@ class DocumentStore:
             meta = chunk["metadata"]
             print(f"- {meta['source']} (chunk {meta['chunk_index']}) | CE score: {score:.4f}")
             print(f"  {chunk['content'][:200]}...\n")
+        if expanded:
+            self.query_cache[key] = reranked[:top_k]
         return reranked[:top_k]
 
     def cross_encoder_rerank(self, query: str, chunks: list):
-        texts = [chunk["content"] for chunk in chunks]
-        scores = self.cross_encoder.predict([[query, text] for text in texts])
+        """
+        Scores (query, chunk) pairs with the cross-encoder, best first.
+        Cached pair scores are reused; the other pairs are batched with those of concurrent requests.
+        """
+        keys = [(query, chunk["id"]) for chunk in chunks]
+        with self.pair_score_lock:
+            scores = [self.pair_score_cache.get(key) for key in keys]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if missing:
+            new_scores = self.rerank_batcher([[query, chunks[i]["content"]] for i in missing])
+            with self.pair_score_lock:
+                for i, score in zip(missing, new_scores):
+                    scores[i] = float(score)
+                    self.pair_score_cache[keys[i]] = scores[i]
         reranked = sorted(zip(scores, chunks), key=lambda x: x[0], reverse=True)
         return reranked
 
@@ -1,49 +1,376 @@
+import argparse
 import os
 import json
-from app.parsers.parsers import parse_pdf, parse_docx, parse_html, parse_json
+from collections import deque
+from itertools import groupby
+from operator import itemgetter
+from concurrent.futures import ProcessPoolExecutor
+from app.parsers.parsers import (parse_pdf, parse_docx, parse_html, parse_html_stream, parse_json, parse_pdf_pages,
+                                 pdf_page_count, json_document, json_is_array, iter_json_array)
 from app.utils.preprocess import preprocess
-from app.chunking import chunk_document
+from app.chunking import chunk_document_spans, html_line_filter
+from app.config import (MAX_LINES, OVERLAP, INGEST_WORKERS, INGEST_MAX_PENDING, PDF_PAGE_MODE, PDF_PAGES_PER_TASK,
+                        HTML_STREAMING, JSON_RECORDS_MODE, JSON_RECORDS_PER_TASK, BM25_SNAPSHOT)
+from app.chunk_store import (ChunkStore, ChunkStoreWriter, BUILD_SUFFIX, TEXTS_SUFFIX, open_chunks,
+                             write_build_id)
+from app.manifest import file_entry, load_manifest, save_manifest, diff_manifests
+from app.bm25 import BM25Index, build_snapshot, corpus_version, snapshot_path
 
+PARSERS = {
+    ".pdf": parse_pdf,
+    ".docx": parse_docx,
+    ".html": parse_html_stream if HTML_STREAMING else parse_html,
+    ".json": parse_json,
+}
 
-def process_all_documents(input_dir="documents", output_file="output/chunks.json"):
-    """Creates chunks file based on processed documents."""
-    all_chunks = []
-    # Walk through subdirectories (pdfs, docx, html, json)
-    for subdir, _, files in os.walk(input_dir):
-        for file in files:
-            path = os.path.join(subdir, file)
-            if file.endswith(".pdf"):
-                parsed = parse_pdf(path)
-            elif file.endswith(".docx"):
-                parsed = parse_docx(path)
-            elif file.endswith(".html"):
-                parsed = parse_html(path)
-            elif file.endswith(".json"):
-                parsed = parse_json(path)
-            else:
+
+def iter_documents(input_dir="documents"):
+    """Yields supported document paths in a deterministic (sorted) order."""
+    for subdir, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        for file in sorted(files):
+            if os.path.splitext(file)[1] in PARSERS:
+                yield os.path.join(subdir, file)
+
+
+def chunk_with_offsets(parsed, max_lines=MAX_LINES, overlap=OVERLAP):
+    """
+    Chunks a preprocessed document with the offset-based chunker.
+    Returns (text, [(chunk text, {"char_start", "char_end"}), ...]): every chunk is text[char_start:char_end].
+    The text is the one saved in the source text store; for HTML it is without the short lines
+    that chunk_document drops.
+    """
+    text = parsed["content"]
+    if parsed["metadata"].get("type") == "html":
+        text = "\n".join(line for line in text.split("\n") if html_line_filter(line))
+    spans = chunk_document_spans({"content": text, "metadata": parsed["metadata"]}, max_lines=max_lines,
+                                 overlap=overlap)
+    return text, [(text[start:end], {"char_start": start, "char_end": end}) for start, end in spans]
+
+
+def process_document(path, part=None, max_lines=MAX_LINES, overlap=OVERLAP):
+    """
+    Parses, preprocesses and chunks a single file. Runs inside worker processes.
+    In PDF page mode PDFs are streamed page by page (`part` optionally selects a (start, stop) page range)
+    and every chunk keeps its page number. In JSON records mode `part` is (first record index, records)
+    of a top-level array and every record is chunked as its own document.
+    Chunk offsets are relative to the saved text of the document (page / record).
+    Returns (doc_type, [(chunk text, extra chunk metadata), ...], [(text key, text), ...]);
+    the text key is {}, {"page": n} or {"record": n}.
+    """
+    if PDF_PAGE_MODE and path.endswith(".pdf"):
+        start, stop = part or (0, None)
+        pieces, texts = [], []
+        for page in parse_pdf_pages(path, start, stop):
+            page["content"] = preprocess(page["content"])
+            key = {"page": page["metadata"]["page"]}
+            text, chunks = chunk_with_offsets(page, max_lines, overlap)
+            pieces.extend((chunk, {**key, **offsets}) for chunk, offsets in chunks)
+            texts.append((key, text))
+        return "pdf", pieces, texts
+
+    if JSON_RECORDS_MODE and part is not None and path.endswith(".json"):
+        first_record, records = part
+        pieces, texts = [], []
+        for record, data in enumerate(records, first_record):
+            parsed = json_document(path, data, record=record)
+            parsed["content"] = preprocess(parsed["content"])
+            key = {"record": record}
+            text, chunks = chunk_with_offsets(parsed, max_lines, overlap)
+            pieces.extend((chunk, {**key, **offsets}) for chunk, offsets in chunks)
+            texts.append((key, text))
+        return "json", pieces, texts
+
+    parsed = PARSERS[os.path.splitext(path)[1]](path)
+    # Preprocess text
+    parsed["content"] = preprocess(parsed["content"])
+    text, pieces = chunk_with_offsets(parsed, max_lines, overlap)
+    return parsed["metadata"]["type"], pieces, [({}, text)]
+
+
+def chunk_id(path, input_dir, chunk_index):
+    """Chunk ID from the file path relative to the input directory, so equal file names in other folders differ."""
+    return f"{os.path.relpath(path, input_dir).replace(os.sep, '/')}_chunk{chunk_index}"
+
+
+def text_id(path, input_dir, metadata):
+    """ID of the saved text a chunk's char_start/char_end point into: the file, or one of its pages / records."""
+    base = os.path.relpath(path, input_dir).replace(os.sep, "/")
+    for key in ("page", "record"):
+        if key in metadata:
+            return f"{base}#{key}{metadata[key]}"
+    return base
+
+
+def to_records(path, doc_type, pieces, start=1, input_dir="documents"):
+    """Adds IDs and metadata to chunks of one file; `start` is the chunk index of the first piece."""
+    return [
+        {
+            "id": chunk_id(path, input_dir, i),
+            "content": chunk,
+            "metadata": {
+                "doc_type": doc_type,
+                "source": path,
+                "chunk_index": i,
+                **extra,
+                "text_id": text_id(path, input_dir, extra),
+            }
+        }
+        for i, (chunk, extra) in enumerate(pieces, start)
+    ]
+
+
+def to_text_records(path, texts, input_dir="documents"):
+    """Source text store entries of one file."""
+    return [{"id": text_id(path, input_dir, key), "content": text, "metadata": {"source": path, **key}}
+            for key, text in texts]
+
+
+def iter_tasks(paths):
+    """
+    Yields (path, part) work items. Large PDFs are split into PDF_PAGES_PER_TASK page ranges and
+    top-level JSON arrays into batches of JSON_RECORDS_PER_TASK records, read incrementally.
+    """
+    for path in paths:
+        if PDF_PAGE_MODE and path.endswith(".pdf"):
+            page_count = pdf_page_count(path)
+            if page_count > PDF_PAGES_PER_TASK:
+                for start in range(0, page_count, PDF_PAGES_PER_TASK):
+                    yield path, (start, start + PDF_PAGES_PER_TASK)
                 continue
-            # Preprocess text
-            cleaned = preprocess(parsed["content"])
-            parsed["content"] = cleaned
-
-            chunks = chunk_document(parsed, max_lines=5, overlap=1)
-            # Add metadata to each chunk
-            for i, chunk in enumerate(chunks, 1):
-                all_chunks.append({
-                    "id": f"{os.path.basename(path)}_chunk{i}",
-                    "content": chunk,
-                    "metadata": {
-                        "doc_type": parsed["metadata"]["type"],
-                        "source": path,
-                        "chunk_index": i
-                    }
-                })
-    os.makedirs(os.path.dirname(output_file), exist_ok=True)
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(all_chunks, f, ensure_ascii=False, indent=2)
-
-    print(f"Processed {len(all_chunks)} chunks saved to {output_file}")
+        if JSON_RECORDS_MODE and path.endswith(".json") and json_is_array(path):
+            first_record, records = 0, []
+            for data in iter_json_array(path):
+                records.append(data)
+                if len(records) >= JSON_RECORDS_PER_TASK:
+                    yield path, (first_record, records)
+                    first_record, records = first_record + len(records), []
+            if records or not first_record:
+                yield path, (first_record, records)
+            continue
+        yield path, None
+
+
+def run_tasks(tasks, workers=INGEST_WORKERS, max_pending=None):
+    """
+    Yields (path, process_document result) for every task, in input order.
+    With workers > 1 tasks run on a process pool; at most `max_pending` tasks
+    are in flight so memory stays bounded.
+    """
+    if workers <= 1:
+        for path, part in tasks:
+            yield path, process_document(path, part)
+        return
+
+    max_pending = max_pending or workers * INGEST_MAX_PENDING
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for path, part in tasks:
+            pending.append((path, executor.submit(process_document, path, part)))
+            if len(pending) >= max_pending:
+                path, future = pending.popleft()
+                yield path, future.result()
+        while pending:
+            path, future = pending.popleft()
+            yield path, future.result()
+
+
+def iter_processed(paths, workers=INGEST_WORKERS, max_pending=None, input_dir="documents"):
+    """
+    Yields (path, chunks, source texts) for every work item, in input order. Every path yields at least once;
+    chunk indexes continue across the work items of one path.
+    """
+    current, next_index = None, 1
+    for path, (doc_type, pieces, texts) in run_tasks(iter_tasks(paths), workers, max_pending):
+        if path != current:
+            current, next_index = path, 1
+        yield (path, to_records(path, doc_type, pieces, start=next_index, input_dir=input_dir),
+               to_text_records(path, texts, input_dir))
+        next_index += len(pieces)
+
+
+def stored_chunk(chunk):
+    """A chunk as it is written: a span without "content", which is read back from the source texts."""
+    return {key: value for key, value in chunk.items() if key != "content"}
+
+
+def write_chunks(chunk_lists, output_file):
+    """
+    Streams (chunks, source texts) lists to `output_file` and returns the chunk count.
+    A .jsonl path produces a JSONL chunk store, anything else a JSON array with one chunk per line.
+    Chunks are written as spans; the source texts go to a chunk store next to them (<output_file>.texts).
+    """
+    with ChunkStoreWriter(output_file + TEXTS_SUFFIX) as texts_writer:
+        if output_file.endswith(".jsonl"):
+            with ChunkStoreWriter(output_file) as writer:
+                for chunks, texts in chunk_lists:
+                    for chunk in chunks:
+                        writer.add(stored_chunk(chunk))
+                    for text in texts:
+                        texts_writer.add(text)
+                return len(writer)
+        return write_json_array(chunk_lists, output_file, texts_writer)
+
+
+def write_json_array(chunk_lists, output_file, texts_writer):
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    tmp_file = output_file + ".tmp"
+    count = 0
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        f.write("[")
+        for chunks, texts in chunk_lists:
+            for chunk in chunks:
+                f.write(",\n" if count else "\n")
+                f.write(json.dumps(stored_chunk(chunk), ensure_ascii=False))
+                count += 1
+            for text in texts:
+                texts_writer.add(text)
+        f.write("\n]\n")
+    write_build_id(output_file, ".tmp")
+    os.replace(output_file + BUILD_SUFFIX + ".tmp", output_file + BUILD_SUFFIX)
+    os.replace(tmp_file, output_file)
+    return count
+
+
+class PreviousChunks:
+    """
+    Reads the chunks of a previous build source by source, in file order.
+    Builds write files in iter_documents order, so the chunks of unchanged files are found by reading ahead;
+    only the chunks of one file are held in memory at a time.
+    """
+
+    def __init__(self, chunks_file, opener=open_chunks):
+        self.chunks = opener(chunks_file) if os.path.exists(chunks_file) else []
+        self._lines = iter(self.chunks)
+        self._groups = groupby(self._lines, key=lambda chunk: chunk["metadata"]["source"])
+        self._current = next(self._groups, None)
+
+    def take(self, source, wanted_later):
+        """
+        Chunks of `source`, or None if they are not ahead in the file. Sources in between are skipped,
+        unless they are in `wanted_later` (then the file is out of order and `source` is re-parsed).
+        """
+        while self._current is not None and self._current[0] != source:
+            if self._current[0] in wanted_later:
+                return None
+            self._current = next(self._groups, None)
+        if self._current is None:
+            return None
+        chunks = list(self._current[1])
+        self._current = next(self._groups, None)
+        return chunks
+
+    def close(self):
+        if hasattr(self._lines, "close"):
+            self._lines.close()
+        if hasattr(self.chunks, "close"):
+            self.chunks.close()
+
+
+def load_previous_bm25(output_file):
+    """(BM25 snapshot of the current output, chunk ID -> row in it), or None without an up-to-date snapshot."""
+    if not os.path.exists(output_file):
+        return None
+    bm25 = BM25Index.load(snapshot_path(output_file), corpus_version(output_file))
+    if bm25 is None:
+        return None
+    chunks = open_chunks(output_file)
+    ids = chunks.ids
+    chunks.close()
+    if bm25.corpus_size != len(ids):
+        return None
+    return bm25, {cid: row for row, cid in enumerate(ids)}
+
+
+def process_all_documents(input_dir="documents", output_file="output/chunks.jsonl", workers=INGEST_WORKERS,
+                          incremental=False, manifest_file=None, bm25_snapshot=BM25_SNAPSHOT):
+    """
+    Creates chunks file based on processed documents.
+    In incremental mode only new or changed files (by content hash) are re-parsed;
+    chunks of unchanged files are carried over from the previous build.
+    With bm25_snapshot the BM25 index is built and saved next to the chunks file.
+    """
+    manifest_file = manifest_file or os.path.join(os.path.dirname(output_file), "manifest.json")
+    old_manifest = load_manifest(manifest_file) if incremental else {}
+
+    # Walk through subdirectories (pdfs, docx, html, json)
+    manifest = {path: file_entry(path, old_manifest.get(path)) for path in iter_documents(input_dir)}
+    changed, removed = diff_manifests(old_manifest, manifest)
+    changed_set = set(changed)
+    previous_bm25 = load_previous_bm25(output_file) if incremental and bm25_snapshot else None
+    reused_ids = {}  # chunk ID -> its ID in the previous build, for chunks carried over unchanged
+    processed = groupby(iter_processed([path for path in manifest if path in changed_set], workers=workers,
+                                       input_dir=input_dir), key=itemgetter(0))
+    reparsed = len(changed_set)
+
+    def chunk_lists():
+        nonlocal reparsed
+        previous = PreviousChunks(output_file) if incremental else None
+        previous_texts = PreviousChunks(output_file + TEXTS_SUFFIX, opener=ChunkStore) if incremental else None
+        unchanged = {path for path in manifest if path not in changed_set}
+        try:
+            for path, entry in manifest.items():
+                if path in changed_set:
+                    _, parts = next(processed)
+                    for _, chunks, texts in parts:
+                        entry["chunk_ids"].extend(chunk["id"] for chunk in chunks)
+                        yield chunks, texts
+                    continue
+                unchanged.discard(path)
+                chunks, texts = [], []
+                if old_manifest[path].get("chunk_ids"):
+                    chunks = previous.take(path, unchanged)
+                    texts = previous_texts.take(path, unchanged)
+                if chunks is None or texts is None:
+                    # Previous chunks or texts are missing: re-parse the file here
+                    reparsed += 1
+                    parts = list(iter_processed([path], workers=1, input_dir=input_dir))
+                    chunks = [chunk for _, part, _ in parts for chunk in part]
+                    texts = [text for _, _, part in parts for text in part]
+                else:
+                    reused_ids.update((chunk_id(path, input_dir, chunk["metadata"]["chunk_index"]), chunk["id"])
+                                      for chunk in chunks)
+                # IDs of older builds may use another scheme
+                for chunk in chunks:
+                    chunk["id"] = chunk_id(path, input_dir, chunk["metadata"]["chunk_index"])
+                    chunk["metadata"]["text_id"] = text_id(path, input_dir, chunk["metadata"])
+                for text in texts:
+                    text["id"] = text_id(path, input_dir, text["metadata"])
+                entry["chunk_ids"] = [chunk["id"] for chunk in chunks]
+                yield chunks, texts
+        finally:
+            for reader in (previous, previous_texts):
+                if reader is not None:
+                    reader.close()
+
+    count = write_chunks(chunk_lists(), output_file)
+    save_manifest(manifest, manifest_file)
+
+    print(f"Processed {count} chunks saved to {output_file}")
+    if incremental:
+        print(f"Re-parsed {reparsed} files, reused {len(manifest) - reparsed}, "
+              f"removed {len(removed)}.")
+    if bm25_snapshot:
+        previous = None
+        if previous_bm25 is not None:
+            old_bm25, old_row_of_id = previous_bm25
+            new_ids = [cid for entry in manifest.values() for cid in entry["chunk_ids"]]
+            old_rows = [old_row_of_id.get(reused_ids.get(cid), -1) for cid in new_ids]
+            previous = (old_bm25, old_rows)
+            print(f"BM25: reusing the postings of {sum(row >= 0 for row in old_rows)} of {len(new_ids)} chunks")
+        build_snapshot(output_file, workers=workers, previous=previous)
+        print(f"BM25 snapshot saved to {output_file}.bm25")
+    return count
 
 
 if __name__ == "__main__":
-    process_all_documents()
+    parser = argparse.ArgumentParser(description="Parse, preprocess and chunk all documents.")
+    parser.add_argument("--input-dir", default="documents")
+    parser.add_argument("--output", default="output/chunks.jsonl")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    parser.add_argument("--incremental", action="store_true", help="Only re-parse new or changed files.")
+    parser.add_argument("--no-bm25-snapshot", dest="bm25_snapshot", action="store_false",
+                        help="Do not save the BM25 index next to the chunks file.")
+    args = parser.parse_args()
+    process_all_documents(args.input_dir, args.output, workers=args.workers, incremental=args.incremental,
+                          bm25_snapshot=args.bm25_snapshot)
@@ -0,0 +1,47 @@
+"""
+Precomputes query expansions for advanced_search in bulk and stores them in the expansion cache.
+Run from the project root: python -m data_gen_scripts.precompute_expansions popular_queries.txt
+(one query per line).
+"""
+import argparse
+from app.config import EXPANSION_MODEL_NAME, EXPANSION_CACHE_FILE
+from app.expansion_cache import ExpansionCache, expansion_prompt
+from app.inference import load_rewriter, model_variant
+from app.vector_store import DocumentStore
+
+
+def precompute_expansions(queries, cache_file=EXPANSION_CACHE_FILE, batch_size=32, overwrite=False):
+    """Generates the expansions of `queries` missing from the cache (all of them with overwrite=True)."""
+    cache = ExpansionCache(cache_file, model_variant(EXPANSION_MODEL_NAME))
+    # advanced_search expands sanitized queries; duplicates are generated once
+    unique = {}
+    for query in queries:
+        if query.strip():
+            query = DocumentStore.sanitize_query(query)
+            unique.setdefault(cache.key(query), query)
+    todo = [q for q in unique.values() if overwrite or cache.get(q) is None]
+    print(f"{len(unique)} distinct queries, {len(unique) - len(todo)} already cached.")
+    if not todo:
+        cache.close()
+        return 0
+
+    rewriter = load_rewriter(EXPANSION_MODEL_NAME)
+    for start in range(0, len(todo), batch_size):
+        batch = todo[start:start + batch_size]
+        outputs = rewriter([expansion_prompt(q) for q in batch], batch_size=batch_size)
+        cache.put_many(batch, [(out[0] if isinstance(out, list) else out)["generated_text"] for out in outputs])
+        print(f"Expanded {start + len(batch)}/{len(todo)} queries...")
+    cache.close()
+    return len(todo)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute query expansions into the expansion cache.")
+    parser.add_argument("queries_file", help="Text file with one query per line.")
+    parser.add_argument("--cache-file", default=EXPANSION_CACHE_FILE)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--overwrite", action="store_true", help="Regenerate queries that are already cached.")
+    args = parser.parse_args()
+    with open(args.queries_file, "r", encoding="utf-8") as f:
+        queries = f.read().splitlines()
+    precompute_expansions(queries, args.cache_file, batch_size=args.batch_size, overwrite=args.overwrite)
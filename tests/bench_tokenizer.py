@@ -0,0 +1,43 @@
+"""
+Micro-benchmark: app.tokenizer vs nltk word_tokenize on the parsed fixture documents.
+Run from the project root: python -m tests.bench_tokenizer
+"""
+import os
+import timeit
+from nltk.tokenize import word_tokenize, TreebankWordTokenizer
+from app.parsers.parsers import parse_pdf, parse_docx, parse_html, parse_json
+from app.utils.preprocess import preprocess
+from app.tokenizer import Tokenizer
+
+project_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+docs_to_test = {
+    "pdf": ("documents/pdfs/messy_pdf.pdf", parse_pdf),
+    "docx": ("documents/docx/messy_docx.docx", parse_docx),
+    "html": ("documents/html/messy_html.html", parse_html),
+    "json": ("documents/json/messy_json.json", parse_json),
+}
+REPEAT = 200  # the fixtures are tiny; repeat them to get a measurable document
+
+
+def nltk_tokenize(text):
+    return word_tokenize(text.lower())
+
+
+if __name__ == "__main__":
+    try:
+        nltk_tokenize("probe")
+    except LookupError:
+        # word_tokenize needs the punkt data; its Treebank word step alone is a lower bound of its cost
+        print("punkt data not installed: comparing against TreebankWordTokenizer (no sentence splitting)")
+        treebank = TreebankWordTokenizer()
+
+        def nltk_tokenize(text):
+            return treebank.tokenize(text.lower())
+
+    for name, tokenizer in (("regex", Tokenizer()), ("regex+stop+stem", Tokenizer(stopwords=True, stemming=True))):
+        for doc_type, (path, parser) in docs_to_test.items():
+            text = "\n".join([preprocess(parser(os.path.join(project_dir, path))["content"])] * REPEAT)
+            old = min(timeit.repeat(lambda: nltk_tokenize(text), number=5, repeat=3))
+            new = min(timeit.repeat(lambda: tokenizer(text), number=5, repeat=3))
+            print(f"{name:15} {doc_type:5} {len(text):>8} chars | nltk {old * 200:8.2f} ms | "
+                  f"tokenizer {new * 200:8.2f} ms | {old / new:5.1f}x")
@@ -0,0 +1,57 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+from app.batching import MicroBatcher
+
+
+def test_concurrent_requests_share_batches():
+    sizes = []
+    started = threading.Event()
+
+    def square(items):
+        sizes.append(len(items))
+        started.wait(1)
+        return np.asarray(items) ** 2
+
+    batcher = MicroBatcher(square, max_batch_size=8, max_wait=0.05)
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        futures = [pool.submit(batcher, [i, i + 100]) for i in range(10)]
+        started.set()
+        results = [f.result() for f in futures]
+    for i, result in enumerate(results):
+        assert result.tolist() == [i * i, (i + 100) ** 2]
+    assert max(sizes) <= 8 and sum(sizes) == 20
+    assert batcher.batches == len(sizes) < 10
+
+
+def test_large_request_is_split_and_errors_reach_callers():
+    batcher = MicroBatcher(lambda items: np.asarray(items) + 1, max_batch_size=3, max_wait=0)
+    assert batcher(range(7)).tolist() == list(range(1, 8))
+    assert batcher([]).tolist() == []
+
+    def fail(items):
+        raise RuntimeError("model error")
+
+    with pytest.raises(RuntimeError, match="model error"):
+        MicroBatcher(fail)(["a"])
+
+
+def test_async_and_sync_callers_share_batches():
+    sizes = []
+
+    def encode(texts):
+        sizes.append(len(texts))
+        return np.asarray([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+    batcher = MicroBatcher(encode, max_batch_size=16, max_wait=0.05)
+
+    async def main():
+        sync = asyncio.get_running_loop().run_in_executor(None, batcher, ["sync"])
+        return await asyncio.gather(*(batcher.call_async(["q" * n]) for n in range(1, 6)), sync)
+
+    results = asyncio.run(main())
+    assert [r[0, 0] for r in results] == [1, 2, 3, 4, 5, 4]
+    assert isinstance(results[0], np.ndarray) and results[0].dtype == np.float32
+    assert sum(sizes) == 6 and len(sizes) < 6
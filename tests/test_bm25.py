@@ -0,0 +1,135 @@
+import numpy as np
+import pytest
+from rank_bm25 import BM25Okapi
+from app.bm25 import BM25Index
+
+CORPUS = [
+    "alice works at openai in the usa".split(),
+    "bob works in the uk".split(),
+    "the the the report".split(),
+    "alice and bob meet".split(),
+    "quarterly report for the usa office".split(),
+    [],
+]
+QUERIES = [["alice"], ["the", "report"], ["alice", "alice", "usa"], ["missing"], ["works", "the", "uk", "bob"], []]
+
+
+def test_scores_match_rank_bm25():
+    reference = BM25Okapi(CORPUS)
+    index = BM25Index(CORPUS)
+    for query in QUERIES:
+        expected = reference.get_scores(query)
+        np.testing.assert_allclose(index.get_scores(query), expected, rtol=1e-6, atol=1e-6)
+        np.testing.assert_allclose(index.get_batch_scores(query, [4, 0, 2]), expected[[4, 0, 2]], rtol=1e-6, atol=1e-6)
+
+
+def test_top_k_only_scores_matching_documents():
+    reference = BM25Okapi(CORPUS)
+    index = BM25Index(CORPUS)
+    for query in QUERIES:
+        expected = reference.get_scores(query)
+        matching = [i for i, doc in enumerate(CORPUS) if set(query) & set(doc)]
+        best = sorted(matching, key=lambda i: -expected[i])[:3]
+        docs, scores = index.top_k(query, 3)
+        assert docs.tolist() == best
+        np.testing.assert_allclose(scores, expected[best], rtol=1e-6)
+
+    assert index.top_k(["alice"], 3, candidates=np.array([1, 2, 3, 4, 5]))[0].tolist() == [3]
+    assert index.top_k(["alice"], 3, candidates=np.zeros(0, dtype=np.int64))[0].tolist() == []
+
+
+def test_random_corpus_parity():
+    rng = np.random.default_rng(0)
+    words = [f"w{i}" for i in range(40)]
+    corpus = [list(rng.choice(words, size=rng.integers(1, 30))) for _ in range(300)]
+    reference = BM25Okapi(corpus)
+    index = BM25Index(corpus)
+    for _ in range(20):
+        query = list(rng.choice(words + ["unknown"], size=4))
+        np.testing.assert_allclose(index.get_scores(query), reference.get_scores(query), rtol=1e-5, atol=1e-5)
+
+
+def test_snapshot_roundtrip(tmp_path):
+    index = BM25Index(CORPUS)
+    path = str(tmp_path / "chunks.jsonl.bm25")
+    index.save(path, version="v1")
+    index.save(path, version="v1")  # overwriting swaps the directory in
+
+    loaded = BM25Index.load(path, version="v1")
+    assert isinstance(loaded.impacts, np.memmap)
+    for query in QUERIES:
+        np.testing.assert_array_equal(loaded.get_scores(query), index.get_scores(query))
+        assert loaded.top_k(query, 3)[0].tolist() == index.top_k(query, 3)[0].tolist()
+    assert BM25Index.load(path, version="v2") is None
+    assert BM25Index.load(str(tmp_path / "missing")) is None
+
+
+def test_corpus_version_uses_the_build_id(tmp_path, monkeypatch):
+    import app.bm25 as bm25
+    from app.chunk_store import ChunkStoreWriter
+
+    path = str(tmp_path / "chunks.jsonl")
+    versions = []
+    for _ in range(2):
+        with ChunkStoreWriter(path) as writer:
+            writer.add({"id": "c1", "content": "alice", "metadata": {}})
+        monkeypatch.setattr(bm25, "file_hash", lambda _: pytest.fail("the chunks file was hashed"))
+        versions.append(bm25.corpus_version(path))
+        assert bm25.corpus_version(path) == versions[-1]
+        monkeypatch.undo()
+    # Every build gets a new version, even with the same content
+    assert versions[0] != versions[1]
+
+
+def test_update_reuses_postings_and_matches_a_fresh_build(tmp_path):
+    previous = BM25Index(CORPUS)
+    previous.save(str(tmp_path / "snapshot"), version="v1")
+    previous = BM25Index.load(str(tmp_path / "snapshot"), version="v1")
+    # Documents 1 and 3 are dropped ("meet" and "uk" disappear), two new ones come in, the rest moves
+    corpus = [CORPUS[4], ["brand", "new", "alice"], CORPUS[0], CORPUS[2], [], ["über", "report"]]
+    old_rows = [4, -1, 0, 2, 5, -1]
+    index = BM25Index.update(previous, old_rows, [corpus[1], corpus[5]])
+    expected = BM25Index(corpus)
+    # Term ids may differ; scores may not
+    for query in QUERIES + [["über"], ["brand", "report"], ["meet"]]:
+        np.testing.assert_array_equal(index.get_scores(query), expected.get_scores(query))
+        assert index.top_k(query, 4)[0].tolist() == expected.top_k(query, 4)[0].tolist()
+    assert set(index.vocab) == set(expected.vocab)
+    assert index.average_idf == expected.average_idf
+
+
+def test_snapshot_vocabulary_is_memory_mapped(tmp_path):
+    from app.bm25 import MappedVocab
+    corpus = [["zeta", "über", "alpha"], ["ärger", "alpha", "b"], ["b"]]
+    BM25Index(corpus).save(str(tmp_path / "snapshot"))
+    loaded = BM25Index.load(str(tmp_path / "snapshot"))
+    assert isinstance(loaded.vocab, MappedVocab)
+    assert len(loaded.vocab) == 5 and "über" in loaded.vocab and "missing" not in loaded.vocab
+    assert dict(loaded.vocab.items()) == BM25Index(corpus).vocab
+    with pytest.raises(KeyError):
+        loaded.vocab["missing"]
+
+
+def test_pruned_top_k_equals_the_exhaustive_scan(monkeypatch):
+    rng = np.random.default_rng(3)
+    words = [f"w{i}" for i in range(200)]
+    frequencies = 1 / np.arange(1, 201)  # Zipf: a few common terms with long postings, many rare ones
+    corpus = [list(rng.choice(words, size=rng.integers(5, 40), p=frequencies / frequencies.sum()))
+              for _ in range(2000)]
+    index = BM25Index(corpus)
+    queries = [list(rng.choice(words[:5], size=2)) + list(rng.choice(words[50:], size=2)) for _ in range(30)]
+    filters = (None, np.flatnonzero(rng.random(2000) < 0.3))
+    pruned = {(i, f, k): index.top_k(query, k, candidates)
+              for i, query in enumerate(queries) for f, candidates in enumerate(filters) for k in (1, 5, 50)}
+    survivors = []
+    for query in queries:
+        terms = index._query_terms(query)
+        survivors.append(index._maxscore_candidates(terms, [index._postings(t) for t, _ in terms], 5))
+    assert sum(s is not None for s in survivors) > len(queries) // 2
+    assert all(len(s) < 2000 // 2 for s in survivors if s is not None)
+
+    monkeypatch.setattr(BM25Index, "_maxscore_candidates", lambda *args: None)
+    for (i, f, k), (docs, scores) in pruned.items():
+        expected_docs, expected_scores = index.top_k(queries[i], k, filters[f])
+        assert docs.tolist() == expected_docs.tolist()
+        assert scores.tolist() == expected_scores.tolist()
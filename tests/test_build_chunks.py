@@ -0,0 +1,198 @@
+import os
+import json
+import shutil
+import numpy as np
+from app.chunk_store import open_chunks
+from data_gen_scripts.build_chunks import process_all_documents
+
+documents_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "documents")
+
+
+def make_corpus(tmp_path):
+    corpus = tmp_path / "documents"
+    for subdir, name in [("json", "messy_json.json"), ("html", "messy_html.html"), ("html", "article_1.html"),
+                         ("docx", "messy_docx.docx"), ("pdfs", "messy_pdf.pdf")]:
+        os.makedirs(corpus / subdir, exist_ok=True)
+        shutil.copy(os.path.join(documents_dir, subdir, name), corpus / subdir / name)
+    return str(corpus)
+
+
+def test_parallel_output_matches_serial(tmp_path):
+    corpus = make_corpus(tmp_path)
+    serial_file = str(tmp_path / "serial.json")
+    parallel_file = str(tmp_path / "parallel.json")
+
+    count = process_all_documents(corpus, serial_file, workers=1)
+    assert process_all_documents(corpus, parallel_file, workers=2) == count
+
+    serial, parallel = list(open_chunks(serial_file)), list(open_chunks(parallel_file))
+    assert len(serial) == count > 0
+    assert serial == parallel
+    # Files are visited in sorted order
+    sources = [c["metadata"]["source"] for c in serial]
+    assert sources == sorted(sources, key=lambda s: (os.path.dirname(s), s))
+
+
+def test_incremental_build_reparses_only_changed_files(tmp_path, monkeypatch):
+    import data_gen_scripts.build_chunks as build_chunks
+    from app.manifest import load_manifest
+
+    corpus = make_corpus(tmp_path)
+    output_file = str(tmp_path / "out" / "chunks.json")
+    process_all_documents(corpus, output_file, workers=1, incremental=True)
+    full = list(open_chunks(output_file))
+
+    changed = os.path.join(corpus, "json", "messy_json.json")
+    with open(changed, "w", encoding="utf-8") as f:
+        json.dump({"name": "Changed", "price": 1}, f)
+    os.remove(os.path.join(corpus, "html", "article_1.html"))
+
+    parsed = []
+    original = build_chunks.process_document
+    monkeypatch.setattr(build_chunks, "process_document", lambda path, part=None: parsed.append(path) or original(path, part))
+    process_all_documents(corpus, output_file, workers=1, incremental=True)
+
+    assert parsed == [changed]
+    chunks = list(open_chunks(output_file))
+    manifest = load_manifest(str(tmp_path / "out" / "manifest.json"))
+    assert set(manifest) == {c["metadata"]["source"] for c in chunks}
+    assert [c["content"] for c in chunks if c["metadata"]["source"] == changed] == ["name: Changed\nprice: 1"]
+    unchanged = [c for c in full if c["metadata"]["source"] not in (changed, os.path.join(corpus, "html", "article_1.html"))]
+    assert [c for c in chunks if c["metadata"]["source"] != changed] == unchanged
+
+
+def test_large_pdf_is_split_into_page_ranges(tmp_path, monkeypatch):
+    import fitz
+    import data_gen_scripts.build_chunks as build_chunks
+
+    corpus = tmp_path / "documents"
+    os.makedirs(corpus / "pdfs")
+    pdf = fitz.open()
+    for page_num in range(1, 6):
+        page = pdf.new_page()
+        page.insert_text((72, 72), f"Page {page_num} heading\nFirst line\nSecond line")
+    pdf.save(str(corpus / "pdfs" / "manual.pdf"))
+
+    whole_file = str(tmp_path / "whole.jsonl")
+    process_all_documents(str(corpus), whole_file, workers=1)
+    monkeypatch.setattr(build_chunks, "PDF_PAGES_PER_TASK", 2)
+    split_file = str(tmp_path / "split.jsonl")
+    process_all_documents(str(corpus), split_file, workers=2)
+
+    from app.chunk_store import ChunkStore
+    whole, split = list(ChunkStore(whole_file)), list(ChunkStore(split_file))
+    assert whole == split
+    assert [c["metadata"]["chunk_index"] for c in split] == list(range(1, len(split) + 1))
+    assert sorted({c["metadata"]["page"] for c in split}) == [1, 2, 3, 4, 5]
+    assert all(c["content"].startswith(f"Page {c['metadata']['page']} heading") for c in split)
+
+
+def test_json_array_records_are_chunked_separately(tmp_path, monkeypatch):
+    import data_gen_scripts.build_chunks as build_chunks
+
+    corpus = tmp_path / "documents"
+    os.makedirs(corpus / "json")
+    records = [{"name": f"Item {i}", "details": {"color": "blue", "sizes": [1, 2]}} for i in range(7)]
+    (corpus / "json" / "export.json").write_text(json.dumps(records), encoding="utf-8")
+    monkeypatch.setattr(build_chunks, "JSON_RECORDS_PER_TASK", 3)
+    output_file = str(tmp_path / "chunks.json")
+    assert process_all_documents(str(corpus), output_file, workers=2) == 7
+
+    chunks = list(open_chunks(output_file))
+    assert [c["metadata"]["record"] for c in chunks] == list(range(7))
+    assert [c["metadata"]["chunk_index"] for c in chunks] == list(range(1, 8))
+    assert chunks[4]["content"] == "name: Item 4\ndetails.color: blue\ndetails.sizes[0]: 1\ndetails.sizes[1]: 2"
+
+
+def test_chunk_ids_are_unique_across_folders(tmp_path):
+    corpus = tmp_path / "documents"
+    for folder in ("a", "b"):
+        os.makedirs(corpus / folder)
+        (corpus / folder / "data.json").write_text(json.dumps({"folder": folder}), encoding="utf-8")
+    output_file = str(tmp_path / "out" / "chunks.jsonl")
+    process_all_documents(str(corpus), output_file, workers=1, incremental=True, bm25_snapshot=False)
+
+    from app.chunk_store import ChunkStore
+    store = ChunkStore(output_file)
+    assert store.ids == ["a/data.json_chunk1", "b/data.json_chunk1"]
+    store.close()
+
+    # Without the previous chunks, unchanged files are parsed again
+    os.remove(output_file)
+    assert process_all_documents(str(corpus), output_file, workers=1, incremental=True, bm25_snapshot=False) == 2
+    assert ChunkStore(output_file).ids == ["a/data.json_chunk1", "b/data.json_chunk1"]
+
+
+def test_chunks_are_stored_as_spans_of_saved_source_texts(tmp_path):
+    import pytest
+    from app.chunk_store import ChunkStore, TEXTS_SUFFIX, META_SUFFIX
+    from app.vector_store import DocumentStore
+    from data_gen_scripts.build_chunks import iter_documents, iter_processed
+
+    corpus = make_corpus(tmp_path)
+    records = [{"name": f"Item {i}", "tags": ["a", "b"]} for i in range(3)]
+    with open(os.path.join(corpus, "json", "export.json"), "w", encoding="utf-8") as f:
+        json.dump(records, f)
+    output_file = str(tmp_path / "out" / "chunks.jsonl")
+
+    def check():
+        # Lines hold no text; content is sliced from the source texts and equals the chunker's output
+        with open(output_file, encoding="utf-8") as f:
+            assert all("content" not in json.loads(line) for line in f)
+        expected = [chunk["content"] for _, chunks, _ in iter_processed(list(iter_documents(corpus)), workers=1,
+                                                                        input_dir=corpus) for chunk in chunks]
+        chunks = ChunkStore(output_file)
+        assert [chunk["content"] for chunk in chunks] == expected
+        assert [chunks.content(idx) for idx in range(len(chunks))] == expected
+        assert {c["doc_type"] for c in chunks.metadatas} == {"pdf", "docx", "html", "json"}
+        assert any("record" in m for m in chunks.metadatas) and any("page" in m for m in chunks.metadatas)
+        return chunks
+
+    process_all_documents(corpus, output_file, workers=1, incremental=True, bm25_snapshot=False)
+    check()
+    # Texts of unchanged files are carried over by incremental builds
+    with open(os.path.join(corpus, "json", "messy_json.json"), "w", encoding="utf-8") as f:
+        json.dump({"name": "Changed", "price": 1}, f)
+    process_all_documents(corpus, output_file, workers=1, incremental=True, bm25_snapshot=False)
+    chunks = check()
+
+    store = DocumentStore(chunks_path=output_file, collection_name="test")
+    chunk = next(c for c in chunks if c["metadata"]["doc_type"] == "html" and c["metadata"]["char_start"] > 0)
+    context, (start, end) = store.chunk_context(chunk, chars=10)
+    assert context[start:end] == chunk["content"] and start == min(10, chunk["metadata"]["char_start"])
+
+    # JSON arrays are written as spans too and resolved on load
+    array_file = str(tmp_path / "out" / "chunks.json")
+    process_all_documents(corpus, array_file, workers=1, bm25_snapshot=False)
+    assert list(open_chunks(array_file)) == list(chunks)
+
+    os.remove(output_file + TEXTS_SUFFIX + META_SUFFIX)
+    with pytest.raises(ValueError, match="missing"):
+        ChunkStore(output_file)[0]
+
+
+def test_incremental_build_only_tokenizes_new_chunks_for_bm25(tmp_path, monkeypatch):
+    import app.bm25 as bm25
+    from app.bm25 import BM25Index, snapshot_path
+
+    corpus = make_corpus(tmp_path)
+    output_file = str(tmp_path / "out" / "chunks.jsonl")
+    process_all_documents(corpus, output_file, workers=1, incremental=True)
+    with open(os.path.join(corpus, "json", "messy_json.json"), "w", encoding="utf-8") as f:
+        json.dump({"name": "Changed", "price": 1}, f)
+    os.remove(os.path.join(corpus, "html", "article_1.html"))
+
+    tokenized = []
+    original = bm25.tokenize_batch
+    monkeypatch.setattr(bm25, "tokenize_batch", lambda texts, workers=1: original(
+        [tokenized.append(text) or text for text in texts], workers))
+    process_all_documents(corpus, output_file, workers=1, incremental=True)
+    assert tokenized == ["name: Changed\nprice: 1"]
+    incremental = BM25Index.load(snapshot_path(output_file))
+
+    fresh_file = str(tmp_path / "fresh" / "chunks.jsonl")
+    process_all_documents(corpus, fresh_file, workers=1)
+    fresh = BM25Index.load(snapshot_path(fresh_file))
+    assert set(incremental.vocab) == set(fresh.vocab)
+    for query in (["alice", "usa"], ["changed"], ["messy", "table", "report"]):
+        np.testing.assert_array_equal(incremental.get_scores(query), fresh.get_scores(query))
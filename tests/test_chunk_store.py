@@ -0,0 +1,57 @@
+import json
+import pytest
+from app.chunk_store import ChunkStore, ChunkStoreWriter, open_chunks
+
+chunks = [
+    {"id": f"doc_{i}.txt_chunk1", "content": f"Chunk {i} – ünïcode\ncontent", "metadata": {"source": f"doc_{i}.txt", "chunk_index": 1}}
+    for i in range(5)
+]
+
+
+def test_roundtrip_and_lazy_access(tmp_path):
+    path = str(tmp_path / "chunks.jsonl")
+    with ChunkStoreWriter(path) as writer:
+        for chunk in chunks:
+            writer.add(chunk)
+
+    store = ChunkStore(path)
+    assert len(store) == 5
+    assert store.ids == [c["id"] for c in chunks]
+    assert store.metadatas == [c["metadata"] for c in chunks]
+    assert store[3] == chunks[3]
+    assert store[-1] == chunks[-1]
+    assert store.content(2) == chunks[2]["content"]
+    assert store.get("doc_4.txt_chunk1") == chunks[4]
+    assert store.get("missing") is None
+    assert list(store) == chunks
+    with pytest.raises(IndexError):
+        store[5]
+    store.close()
+
+
+def test_open_chunks_reads_json_arrays(tmp_path):
+    path = tmp_path / "chunks.json"
+    path.write_text(json.dumps(chunks), encoding="utf-8")
+    loaded = open_chunks(str(path))
+    assert loaded == chunks
+    assert loaded.metadatas[1] == chunks[1]["metadata"]
+    assert loaded.get("doc_0.txt_chunk1") == chunks[0]
+
+
+def test_json_array_chunks_without_ids_get_their_index(tmp_path):
+    path = tmp_path / "chunks.json"
+    without_ids = [{"content": c["content"], "metadata": c["metadata"]} for c in chunks]
+    path.write_text(json.dumps(without_ids), encoding="utf-8")
+    loaded = open_chunks(str(path))
+    assert loaded.ids == ["0", "1", "2", "3", "4"]
+    assert loaded[3]["id"] == "3" and loaded.get("3") is loaded[3]
+
+
+def test_mismatched_index_is_rejected(tmp_path):
+    path = str(tmp_path / "chunks.jsonl")
+    with ChunkStoreWriter(path) as writer:
+        writer.add(chunks[0])
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(chunks[1]) + "\n")
+    with pytest.raises(ValueError):
+        ChunkStore(path)
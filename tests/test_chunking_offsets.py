@@ -0,0 +1,42 @@
+import os
+from app.parsers.parsers import parse_pdf, parse_docx, parse_html, parse_json
+from app.utils.preprocess import preprocess
+from app.chunking import (chunk_document, chunk_document_spans, materialize, html_line_filter, semantic_chunk,
+                          semantic_spans, semantic_chunk_with_overlap, size_overlap_spans)
+
+project_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+docs_to_test = {
+    "pdf": ("documents/pdfs/messy_pdf.pdf", parse_pdf),
+    "docx": ("documents/docx/messy_docx.docx", parse_docx),
+    "html": ("documents/html/messy_html.html", parse_html),
+    "json": ("documents/json/messy_json.json", parse_json),
+}
+
+
+def load(doc_type):
+    path, parser = docs_to_test[doc_type]
+    parsed = parser(os.path.join(project_dir, path))
+    parsed["content"] = preprocess(parsed["content"])
+    return parsed
+
+
+def test_spans_match_string_chunkers():
+    for doc_type in docs_to_test:
+        parsed = load(doc_type)
+        text = parsed["content"]
+        keep = html_line_filter if doc_type == "html" else None
+        for max_lines, overlap in [(3, 1), (5, 1), (2, 0)]:
+            spans = chunk_document_spans(parsed, max_lines=max_lines, overlap=overlap)
+            expected = chunk_document(parsed, max_lines=max_lines, overlap=overlap)
+            assert [materialize(text, span, keep) for span in spans] == expected
+        for size in [30, 150]:
+            assert [text[s:e] for s, e in size_overlap_spans(text, size, 1)] == semantic_chunk_with_overlap(text, size, 1)
+            assert [text[s:e] for s, e in semantic_spans(text, size)] == semantic_chunk(text, size)
+
+
+def test_overlapping_spans_share_text():
+    text = "one\ntwo\nthree\nfour\nfive"
+    parsed = {"content": text, "metadata": {"type": "pdf"}}
+    spans = chunk_document_spans(parsed, max_lines=3, overlap=1)
+    assert spans == [(0, 13), (8, 23), (19, 23)]
+    assert text[spans[1][0]:spans[0][1]] == "three"
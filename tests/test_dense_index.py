@@ -0,0 +1,79 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+from app.dense_index import DenseIndex
+
+
+def brute_force(embeddings, query, allowed, k):
+    emb = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    q = query / np.linalg.norm(query)
+    return sorted(allowed, key=lambda i: -(emb[i] @ q))[:k]
+
+
+def test_blocked_search_matches_brute_force(tmp_path):
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(20, 4)).astype(np.float32)
+    metadatas = [{"doc_type": "pdf" if i % 2 else "html", "i": i} for i in range(20)]
+    index = DenseIndex(str(tmp_path), dim=4, documents=lambda cid: f"text of {cid}", block_size=3)
+    index.add([f"c{i}" for i in range(10)], embeddings[:10], metadatas[:10])
+    index.persist()
+    # Saved (memory-mapped) and pending rows are searched together
+    index.add([f"c{i}" for i in range(10, 20)], embeddings[10:], metadatas[10:])
+    index.delete(ids=["c5"])
+    index.delete(where={"i": {"$in": [7, 8]}})
+
+    queries = rng.normal(size=(3, 4))
+    results = index.query(queries, n_results=4, where={"doc_type": "pdf"})
+    allowed = [i for i in range(20) if i % 2 and i not in (5, 7)]
+    for query, ids in zip(queries, results["ids"]):
+        assert ids == [f"c{i}" for i in brute_force(embeddings, query, allowed, 4)]
+    assert results["documents"][0][0] == f"text of {results['ids'][0][0]}"
+
+    index.persist()
+    reopened = DenseIndex(str(tmp_path), dim=4)
+    assert reopened.count() == 17
+    assert reopened.query(queries, n_results=4, where={"doc_type": "pdf"})["ids"] == results["ids"]
+
+
+def test_upsert_replaces_row(tmp_path):
+    index = DenseIndex(str(tmp_path), dim=2)
+    index.add(["a", "b"], [[1, 0], [0, 1]], [{"v": 1}, {"v": 1}])
+    index.upsert(["a"], [[0, 1]], [{"v": 2}])
+    assert index.count() == 2
+    rows, scores = index.search([[0, 1]], n_results=2)
+    assert sorted(index.ids[row] for row in rows[0]) == ["a", "b"]
+    np.testing.assert_allclose(scores, [[1, 1]])
+    assert index.get(ids=["a"])["metadatas"] == [{"v": 2}]
+
+
+def test_concurrent_persists_do_not_collide(tmp_path):
+    indexes = []
+    for i in range(4):
+        index = DenseIndex(str(tmp_path), dim=2, block_size=7)
+        index.add([f"{i}-{j}" for j in range(50)], np.full((50, 2), i + 1), [{"writer": i}] * 50)
+        indexes.append(index)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(DenseIndex.persist, indexes))
+    # The last persist wins whole: vectors, IDs and metadata all come from the same writer
+    reopened = DenseIndex(str(tmp_path), dim=2)
+    writer = reopened.metadatas[0]["writer"]
+    assert reopened.ids == [f"{writer}-{j}" for j in range(50)]
+    assert all(m == {"writer": writer} for m in reopened.metadatas)
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_pending_rows_are_not_restacked(tmp_path, monkeypatch):
+    rng = np.random.default_rng(1)
+    embeddings = rng.normal(size=(100, 4)).astype(np.float32)
+    index = DenseIndex(str(tmp_path), dim=4, block_size=8)
+    monkeypatch.setattr(np, "stack", lambda *args, **kwargs: pytest.fail("pending rows were re-stacked"))
+    for start in range(0, 100, 7):
+        index.add([f"c{i}" for i in range(start, min(start + 7, 100))], embeddings[start:start + 7])
+    before = index.query(embeddings[:3], n_results=5)["ids"]
+    index.persist()
+    monkeypatch.undo()
+    reopened = DenseIndex(str(tmp_path), dim=4)
+    assert np.allclose(reopened.get(ids=["c42"], include=["embeddings"])["embeddings"][0],
+                       embeddings[42] / np.linalg.norm(embeddings[42]))
+    assert reopened.query(embeddings[:3], n_results=5)["ids"] == before
@@ -0,0 +1,231 @@
+import json
+import os
+import threading
+import time
+import numpy as np
+import pytest
+from app.chunk_store import ChunkStoreWriter
+from app.dense_index import DenseIndex
+from app.expansion_cache import ExpansionCache
+from app.vector_store import DocumentStore
+from data_gen_scripts.build_chunks import process_all_documents
+
+
+class FakeEmbedder:
+    """Deterministic 8-dimensional embeddings; remembers every text it encoded."""
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        self.encoded.extend(texts)
+        return np.asarray([np.random.default_rng(sum(map(ord, t))).normal(size=8) for t in texts], dtype=np.float32)
+
+    def get_sentence_embedding_dimension(self):
+        return 8
+
+
+def write_chunks(path, chunks):
+    with ChunkStoreWriter(str(path)) as writer:
+        for chunk in chunks:
+            writer.add(chunk)
+
+
+@pytest.fixture
+def store(tmp_path):
+    chunks = [{"id": f"doc{i}.txt_chunk1", "content": f"chunk {i}",
+               "metadata": {"source": f"doc{i}.txt", "chunk_index": 1}} for i in range(3)]
+    write_chunks(tmp_path / "chunks.jsonl", chunks)
+    store = DocumentStore(chunks_path=str(tmp_path / "chunks.jsonl"), collection_name="test")
+    store.expansion_cache = ExpansionCache(str(tmp_path / "expansions.sqlite"), "model")
+    return store
+
+
+def slow_rewriter(release, prompts):
+    def rewrite(prompt):
+        prompts.append(prompt)
+        release.wait(5)
+        return [{"generated_text": "alice usa united states"}]
+    return rewrite
+
+
+def wait_for_expansions(store):
+    for _ in range(200):
+        if not store.pending_expansions:
+            return
+        time.sleep(0.01)
+
+
+def test_expansion_deadline_falls_back_and_queue_stays_bounded(store, monkeypatch):
+    import app.vector_store as vector_store
+    from concurrent.futures import ThreadPoolExecutor
+    monkeypatch.setattr(vector_store, "EXPANSION_MAX_PENDING", 3)
+    release, prompts = threading.Event(), []
+    store.query_rewriter = slow_rewriter(release, prompts)
+    assert store.expand_query("alice usa", deadline_ms=50) == "alice usa"
+    # Misses that time out while waiting are dropped, not left queued behind the running generation
+    for i in range(5):
+        assert store.expand_query(f"query {i}", deadline_ms=20) == f"query {i}"
+    assert len(store.pending_expansions) == 1
+
+    # Concurrent misses wait for their turn, at most EXPANSION_MAX_PENDING at a time
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        results = list(pool.map(lambda i: (store.expand_query(f"other {i}", deadline_ms=300), time.perf_counter()),
+                                range(6)))
+    assert [query for query, _ in results] == [f"other {i}" for i in range(6)]
+    waited = sorted(end - started for _, end in results)
+    assert waited[3] < 0.2 and waited[4] >= 0.25  # 4 misses were turned away at once, 2 queued behind the first
+    assert len(store.pending_expansions) == 1
+
+    release.set()
+    wait_for_expansions(store)
+    assert len(prompts) == 1
+    # The abandoned generation still fills the cache
+    assert store.expand_query("alice usa", deadline_ms=50) == "alice usa united states"
+    assert store.expand_query("query 0", deadline_ms=1000) == "alice usa united states"
+    assert len(prompts) == 2
+
+
+def test_fallback_results_of_advanced_search_are_not_cached(store):
+    chunk = {"id": "doc0.txt_chunk1", "content": "chunk 0", "metadata": {"source": "doc0.txt", "chunk_index": 1}}
+    searched = []
+    store.hybrid_search = lambda query, **kwargs: searched.append(query) or [(1.0, chunk)]
+    store.cross_encoder_rerank = lambda query, chunks: [(0.5, c) for c in chunks]
+    release, prompts = threading.Event(), []
+    store.query_rewriter = slow_rewriter(release, prompts)
+
+    assert store.advanced_search("alice usa") == [(0.5, chunk)]
+    release.set()
+    wait_for_expansions(store)
+    store.advanced_search("alice usa")
+    store.advanced_search("alice usa")
+    # The fallback was not cached, so the second request searched with the expansion, and the third hit the cache
+    assert searched == ["alice usa", "alice usa united states"]
+
+
+def test_expansions_stay_in_memory_without_the_sqlite_cache(store, monkeypatch):
+    import app.vector_store as vector_store
+    monkeypatch.setattr(vector_store, "EXPANSION_CACHE_ENABLED", False)
+    del store.expansion_cache
+    release, prompts = threading.Event(), []
+    store.query_rewriter = slow_rewriter(release, prompts)
+    assert store.expand_query("alice usa", deadline_ms=20) == "alice usa"
+    release.set()
+    wait_for_expansions(store)
+    assert store.expand_query("Alice  USA", deadline_ms=20) == "alice usa united states"
+    assert len(prompts) == 1 and len(store.expansion_cache) == 1
+
+
+def test_sync_chunks_indexes_changed_added_and_removed_files(tmp_path):
+    corpus = tmp_path / "documents"
+    os.makedirs(corpus)
+    for name in ("keep", "change", "remove"):
+        (corpus / f"{name}.json").write_text(json.dumps({"name": name}), encoding="utf-8")
+    chunks_file = str(tmp_path / "out" / "chunks.jsonl")
+    manifest_file = str(tmp_path / "out" / "manifest.json")
+    process_all_documents(str(corpus), chunks_file, workers=1, incremental=True, bm25_snapshot=False)
+
+    store = DocumentStore(chunks_path=chunks_file, collection_name="test")
+    store.embed_model = FakeEmbedder()
+    store.embedding_store = None
+    store.collection = DenseIndex(str(tmp_path / "index"), dim=8)
+    store.index_manifest_path = str(tmp_path / "index" / "manifest.json")
+    assert store.sync_chunks(manifest_file) == (3, 0)
+    assert sorted(store.collection.get()["ids"]) == ["change.json_chunk1", "keep.json_chunk1", "remove.json_chunk1"]
+
+    (corpus / "change.json").write_text(json.dumps({"name": "changed"}), encoding="utf-8")
+    (corpus / "add.json").write_text(json.dumps({"name": "added"}), encoding="utf-8")
+    os.remove(corpus / "remove.json")
+    process_all_documents(str(corpus), chunks_file, workers=1, incremental=True, bm25_snapshot=False)
+    store.embed_model.encoded.clear()
+    assert store.sync_chunks(manifest_file) == (2, 1)
+    assert sorted(store.embed_model.encoded) == ["name: added", "name: changed"]
+    assert sorted(store.collection.get()["ids"]) == ["add.json_chunk1", "change.json_chunk1", "keep.json_chunk1"]
+    # The reloaded chunks are searchable by keyword as well
+    assert store.keyword_search("changed", top_k=1)[0]["id"] == "change.json_chunk1"
+
+    store.embed_model.encoded.clear()
+    assert store.sync_chunks(manifest_file) == (0, 0)
+    assert store.embed_model.encoded == []
+
+
+class FakeCollection:
+    """Records every write; fails on the write of `fail_on` (a chunk ID) when given."""
+
+    def __init__(self, max_batch_size=None, fail_on=None):
+        self.max_batch_size = max_batch_size
+        self.fail_on = fail_on
+        self.writes = []
+
+    def add(self, ids, embeddings, metadatas, documents):
+        assert len(ids) == len(embeddings) == len(metadatas) == len(documents)
+        if self.fail_on in ids:
+            raise RuntimeError("write failed")
+        self.writes.append(("add", list(ids), threading.current_thread().name))
+
+    def upsert(self, ids, embeddings, metadatas, documents):
+        self.add(ids, embeddings, metadatas, documents)
+        self.writes[-1] = ("upsert",) + self.writes[-1][1:]
+
+
+@pytest.fixture
+def ingest_store(tmp_path):
+    chunks = [{"id": f"doc{i}.txt_chunk1", "content": f"chunk {i}",
+               "metadata": {"source": f"doc{i}.txt", "chunk_index": 1}} for i in range(10)]
+    write_chunks(tmp_path / "chunks.jsonl", chunks)
+    store = DocumentStore(chunks_path=str(tmp_path / "chunks.jsonl"), collection_name="test")
+    store.embed_model = FakeEmbedder()
+    store.embedding_store = None
+    return store
+
+
+@pytest.mark.parametrize("pipelined", [True, False])
+def test_write_chunks_batches_in_order(ingest_store, capsys, pipelined):
+    ingest_store.collection = FakeCollection()
+    assert ingest_store._write_chunks(range(10), batch_size=4, pipelined=pipelined) == 10
+    writes = ingest_store.collection.writes
+    assert [len(ids) for _, ids, _ in writes] == [4, 4, 2]
+    assert [i for _, ids, _ in writes for i in ids] == [f"doc{i}.txt_chunk1" for i in range(10)]
+    # Writes run on the writer thread, not the caller's
+    assert all(thread != threading.current_thread().name for _, _, thread in writes)
+    assert ingest_store.embed_model.encoded == [f"chunk {i}" for i in range(10)]
+    assert capsys.readouterr().out.splitlines() == [
+        "Ingested 4/10 chunks...", "Ingested 8/10 chunks...", "Ingested 10/10 chunks..."]
+
+
+@pytest.mark.parametrize("pipelined", [True, False])
+def test_write_chunks_clamps_to_backend_batch_limit(ingest_store, pipelined):
+    ingest_store.collection = FakeCollection(max_batch_size=3)
+    assert ingest_store._write_chunks([1, 3, 5, 7, 9], upsert=True, batch_size=1024, pipelined=pipelined) == 5
+    writes = ingest_store.collection.writes
+    assert [(op, len(ids)) for op, ids, _ in writes] == [("upsert", 3), ("upsert", 2)]
+    assert [i for _, ids, _ in writes for i in ids] == [f"doc{i}.txt_chunk1" for i in (1, 3, 5, 7, 9)]
+
+
+@pytest.mark.parametrize("pipelined", [True, False])
+@pytest.mark.parametrize("fail_on", ["doc0.txt_chunk1", "doc5.txt_chunk1", "doc9.txt_chunk1"])
+def test_write_chunks_propagates_writer_errors(ingest_store, capsys, pipelined, fail_on):
+    ingest_store.collection = FakeCollection(fail_on=fail_on)
+    with pytest.raises(RuntimeError, match="write failed"):
+        ingest_store._write_chunks(range(10), batch_size=4, pipelined=pipelined)
+    # Batches before the failing one were written and reported; none after it were written
+    written = len(ingest_store.collection.writes)
+    assert written == int(fail_on[3]) // 4
+    assert capsys.readouterr().out.count("Ingested") == written
+
+
+def test_rerank_chunks_of_a_json_array_without_ids(tmp_path):
+    path = tmp_path / "chunks.json"
+    path.write_text(json.dumps([{"content": f"chunk {i}", "metadata": {"source": "a.txt", "chunk_index": i}}
+                                for i in range(3)]), encoding="utf-8")
+    store = DocumentStore(chunks_path=str(path), collection_name="test")
+
+    class FakeCrossEncoder:
+        def predict(self, pairs, batch_size=32):
+            return [float(passage[-1]) for _, passage in pairs]
+
+    store.cross_encoder = FakeCrossEncoder()
+    reranked = store.cross_encoder_rerank("query", [store.chunks[i] for i in range(3)])
+    assert [(score, chunk["id"]) for score, chunk in reranked] == [(2.0, "2"), (1.0, "1"), (0.0, "0")]
+    assert store.pair_score_cache[("query", "1")] == 1.0
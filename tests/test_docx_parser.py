@@ -10,3 +10,37 @@ print("Doc ID:", parsed_doc["doc_id"])
 print("Metadata:", parsed_doc["metadata"])
 print("\n--- Content Preview ---")
 print(parsed_doc["content"][:200])
+
+
+def test_single_pass_matches_python_docx_paragraphs():
+    from docx import Document
+    for name in ["notes_1.docx", "messy_docx.docx"]:
+        path = os.path.join(documents_dir, "docx", name)
+        doc = Document(path)
+        expected = [p.text.strip() for p in doc.paragraphs if p.text.strip()]
+        parsed = parse_docx(path)
+        lines = parsed["content"].split("\n")
+        assert [line for line in lines if " | " not in line] == "\n".join(expected).split("\n")
+        assert parsed["metadata"]["paragraphs"] == len(doc.paragraphs)
+
+
+def test_tables_are_extracted_in_order():
+    parsed = parse_docx(os.path.join(documents_dir, "docx", "messy_docx.docx"))
+    assert parsed["content"].endswith("Name | Age | Country\nAlice | 30 | USA\nBob | 25 | UK")
+    assert parsed["metadata"]["title"] == "Messy DOCX Example"
+
+
+def test_nested_tables_are_emitted_once(tmp_path):
+    from docx import Document
+    doc = Document()
+    table = doc.add_table(rows=2, cols=2)
+    table.cell(0, 0).text, table.cell(0, 1).text = "Team", "Members"
+    table.cell(1, 0).text = "Sales"
+    inner = table.cell(1, 1).add_table(rows=2, cols=2)
+    inner.cell(0, 0).text, inner.cell(0, 1).text = "Alice", "30"
+    inner.cell(1, 0).text, inner.cell(1, 1).text = "Bob", "25"
+    doc.add_paragraph("After the table")
+    path = str(tmp_path / "nested.docx")
+    doc.save(path)
+    assert parse_docx(path)["content"].split("\n") == [
+        "Team | Members", "Sales |", "Alice | 30", "Bob | 25", "After the table"]
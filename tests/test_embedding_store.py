@@ -0,0 +1,36 @@
+import numpy as np
+from app.embedding_store import EmbeddingStore
+
+
+def test_roundtrip_and_normalized_keys(tmp_path):
+    store = EmbeddingStore(str(tmp_path), "all-MiniLM-L6-v2", dim=4)
+    vectors = np.arange(8, dtype=np.float32).reshape(2, 4)
+    assert store.put_many(["Alice  works\nat OpenAI", "Bob"], vectors) == 2
+    # Already stored (after whitespace normalization) -> nothing appended
+    assert store.put_many(["Alice works at OpenAI"], vectors[:1] + 100) == 0
+
+    found_vectors, found = store.get_many(["Bob", "missing", " Alice works at OpenAI "])
+    assert found.tolist() == [True, False, True]
+    np.testing.assert_array_equal(found_vectors[0], vectors[1])
+    np.testing.assert_array_equal(found_vectors[1], np.zeros(4))
+    np.testing.assert_array_equal(found_vectors[2], vectors[0])
+
+
+def test_rows_are_shared_between_instances(tmp_path):
+    writer = EmbeddingStore(str(tmp_path), "model/name", dim=3)
+    reader = EmbeddingStore(str(tmp_path), "model/name", dim=3)
+    other_model = EmbeddingStore(str(tmp_path), "other-model", dim=3)
+    writer.put_many(["text"], np.ones((1, 3)))
+
+    vectors, found = reader.get_many(["text"])
+    assert found.all()
+    np.testing.assert_array_equal(vectors, np.ones((1, 3)))
+    assert not other_model.get_many(["text"])[1].any()
+
+    # A vector row without its key (interrupted write) is overwritten by the next append
+    with open(writer.vectors_path, "ab") as f:
+        f.write(np.full(3, 9, dtype=np.float32).tobytes())
+    writer.put_many(["next"], np.full((1, 3), 2))
+    vectors, found = EmbeddingStore(str(tmp_path), "model/name", dim=3).get_many(["text", "next"])
+    assert found.all()
+    np.testing.assert_array_equal(vectors[1], np.full(3, 2))
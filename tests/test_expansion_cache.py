@@ -0,0 +1,25 @@
+from concurrent.futures import ThreadPoolExecutor
+from app.expansion_cache import ExpansionCache
+
+
+def test_expansions_persist_by_normalized_query(tmp_path):
+    path = str(tmp_path / "expansions.sqlite")
+    cache = ExpansionCache(path, "model-a")
+    assert cache.get("alice usa") is None
+    cache.put("Alice   USA", "alice usa united states")
+    cache.put_many(["q1", "q2"], ["e1", "e2"])
+    assert cache.get("alice usa") == "alice usa united states"
+    assert len(cache) == 3
+    cache.close()
+
+    # Shared by other workers, separately per model
+    assert ExpansionCache(path, "model-a").get(" ALICE usa ") == "alice usa united states"
+    assert ExpansionCache(path, "model-b").get("alice usa") is None
+
+
+def test_concurrent_access(tmp_path):
+    cache = ExpansionCache(str(tmp_path / "expansions.sqlite"), "model")
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: cache.put(f"q{i}", f"e{i}"), range(50)))
+        results = list(pool.map(lambda i: cache.get(f"q{i}"), range(50)))
+    assert results == [f"e{i}" for i in range(50)]
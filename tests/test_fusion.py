@@ -0,0 +1,35 @@
+import numpy as np
+from app.fusion import (top_n, align_candidates, weighted_fusion, select_top, minmax_normalize, zscore_normalize,
+                        rank_fusion)
+
+
+def test_top_n_ties_and_mask():
+    scores = np.array([1.0, 3.0, 2.0, 3.0, 0.5])
+    assert top_n(scores, 2).tolist() == [1, 3]
+    assert top_n(scores, 3, mask=np.array([True, False, True, True, True])).tolist() == [3, 2, 0]
+    assert top_n(scores, 10).tolist() == [1, 3, 2, 0, 4]
+
+
+def test_align_by_chunk_not_position():
+    # The semantic retriever returns chunks sorted by distance, not by chunk index
+    indices, sem, kw = align_candidates([7, 2], [0.9, 0.4], [2, 5], [3.0, 1.0])
+    assert indices.tolist() == [2, 5, 7]
+    np.testing.assert_array_equal(sem, [0.4, np.nan, 0.9])
+    np.testing.assert_array_equal(kw, [3.0, 1.0, np.nan])
+
+    sem[1], kw[2] = 0.1, 0.0
+    best, scores = select_top(indices, weighted_fusion(sem, kw, 0.7, 0.3), 2)
+    assert best.tolist() == [2, 7]
+    np.testing.assert_allclose(scores, [0.7 * 0.4 + 0.3 * 3.0, 0.7 * 0.9])
+
+
+def test_normalized_and_rank_fusion():
+    sem = np.array([0.2, np.nan, 0.8, 0.5])
+    np.testing.assert_allclose(minmax_normalize(sem), [0.0, 0.0, 1.0, 0.5])
+    z = zscore_normalize(sem)
+    assert z[1] == z[0] == z.min() and z[2] > z[3] > z[0]
+    np.testing.assert_allclose(minmax_normalize(np.array([3.0, 3.0])), [1.0, 1.0])
+
+    # RRF depends on ranks only: 1 / (k + rank), with 1-based ranks
+    scores = rank_fusion(np.array([0.0, np.nan, 1.0]), np.array([1.0, 0.0, np.nan]), 1.0, 1.0, k=60)
+    np.testing.assert_allclose(scores, [1 / 61 + 1 / 62, 1 / 61, 1 / 62])
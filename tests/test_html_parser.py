@@ -10,3 +10,23 @@ print("Doc ID:", parsed_doc["doc_id"])
 print("Metadata:", parsed_doc["metadata"])
 print("\n--- Content Preview ---")
 print(parsed_doc["content"][:200])
+
+
+def test_streaming_parser_matches_parse_html():
+    from app.parsers.parsers import parse_html_stream
+    for name in ["article_1.html", "messy_html.html"]:
+        path = os.path.join(documents_dir, "html", name)
+        assert parse_html_stream(path) == parse_html(path)
+
+
+def test_streaming_parser_drops_script_style_nav(tmp_path):
+    from app.parsers.parsers import iter_html_text
+    path = tmp_path / "page.html"
+    path.write_text(
+        "<html><head><title>T</title><style>p {}</style><script>var p = '<p>no</p>';</script></head><body>"
+        "<nav><ul><li>Home</li></ul></nav><ul><li>Item <b>bold</b> &amp; more<p>inner</p></li></ul>"
+        "<p>a<!-- comment -->b</p><p>   </p><h2>Ünïcode</h2></body></html>",
+        encoding="utf-8",
+    )
+    # Tiny blocks exercise text nodes and multi-byte characters split across feeds
+    assert list(iter_html_text(str(path), block_size=5)) == ["Itembold& moreinner", "inner", "ab", "Ünïcode"]
@@ -0,0 +1,77 @@
+import os
+import pytest
+from app.inference import check_parity, load_embedder, model_variant
+
+
+def test_model_variant_and_validation():
+    assert model_variant("all-MiniLM-L6-v2", "torch", None) == "all-MiniLM-L6-v2"
+    assert model_variant("all-MiniLM-L6-v2", "onnx", None) == "all-MiniLM-L6-v2"
+    assert model_variant("all-MiniLM-L6-v2", "onnx", "avx2") == "all-MiniLM-L6-v2@qint8_avx2"
+    with pytest.raises(ValueError):
+        load_embedder(backend="tensorflow")
+    with pytest.raises(ValueError):
+        load_embedder(backend="onnx", quantization="int4")
+
+
+def test_onnx_parity_with_torch():
+    pytest.importorskip("optimum.onnxruntime")
+    passages = ["Alice is 30 years old and lives in the USA.", "Quarterly revenue grew by 12 percent.",
+                "Bob moved to the UK last year.", "The office in Boston opened in 2020."]
+    report = check_parity(passages, "Where does Alice live?", passages)
+    assert report["passed"], report
+
+
+def test_session_options_set_threads():
+    from app.inference import _session_options
+    options = _session_options(3)
+    assert (options.intra_op_num_threads, options.inter_op_num_threads) == (3, 1)
+    assert _session_options(None).intra_op_num_threads == 0  # runtime default
+
+
+def test_onnx_export_layout(tmp_path, monkeypatch):
+    import app.inference as inference
+    monkeypatch.setattr(inference, "ONNX_MODEL_DIR", str(tmp_path))
+    export_dir = tmp_path / "cross-encoder__ms-marco-MiniLM-L-6-v2"
+    assert inference._export_dir("cross-encoder/ms-marco-MiniLM-L-6-v2") == str(export_dir)
+
+    class Model:
+        def __init__(self, path, **kwargs):
+            self.path, self.kwargs = path, kwargs
+
+    # An existing export is loaded with the file of the quantization preset, not exported again
+    for quantization, file_name in ((None, "onnx/model.onnx"), ("avx2", "onnx/model_qint8_avx2.onnx")):
+        os.makedirs(export_dir / "onnx", exist_ok=True)
+        (export_dir / file_name).touch()
+        model = inference._load_sentence_model(Model, "cross-encoder/ms-marco-MiniLM-L-6-v2", "onnx", quantization, 2)
+        assert model.path == str(export_dir) and model.kwargs["backend"] == "onnx"
+        assert model.kwargs["model_kwargs"]["file_name"] == file_name
+        assert model.kwargs["model_kwargs"]["provider"] == "CPUExecutionProvider"
+        assert model.kwargs["model_kwargs"]["session_options"].intra_op_num_threads == 2
+
+
+def test_seq2seq_quantization_covers_merged_and_split_decoders(tmp_path):
+    import app.inference as inference
+    merged, split = tmp_path / "merged", tmp_path / "split"
+    for path, names in ((merged, ["encoder_model", "decoder_model_merged"]),
+                        (split, ["encoder_model", "decoder_model", "decoder_with_past_model"])):
+        os.makedirs(path)
+        for name in names:
+            (path / f"{name}.onnx").touch()
+        (path / "config.json").touch()
+        assert inference._seq2seq_onnx_files(str(path)) == names
+    # A finished quantization is reused without loading optimum
+    os.makedirs(merged / "qint8_avx512")
+    assert inference._quantize_seq2seq(str(merged), "avx512") == str(merged / "qint8_avx512")
+
+
+def test_quantization_presets_exist_in_optimum():
+    configuration = pytest.importorskip("optimum.onnxruntime.configuration")
+    from app.inference import QUANTIZATIONS
+    assert all(hasattr(configuration.AutoQuantizationConfig, preset) for preset in QUANTIZATIONS)
+
+
+def test_unknown_presets_are_rejected():
+    with pytest.raises(ValueError, match="quantization"):
+        load_embedder("any/model", backend="onnx", quantization="avx3")
+    with pytest.raises(ValueError, match="backend"):
+        load_embedder("any/model", backend="tensorrt")
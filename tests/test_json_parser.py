@@ -10,3 +10,29 @@ print("Doc ID:", parsed_doc["doc_id"])
 print("Metadata:", parsed_doc["metadata"])
 print("\n--- Content Preview ---")
 print(parsed_doc["content"])
+
+
+def test_nested_values_are_flattened_to_paths():
+    from app.parsers.parsers import flatten_json
+    data = {"a": {"b": [0, 1, 2, {"c": "value"}]}, "empty": {}, "flag": True}
+    assert list(flatten_json(data)) == [
+        ("a.b[0]", 0), ("a.b[1]", 1), ("a.b[2]", 2), ("a.b[3].c", "value"), ("empty", {}), ("flag", True)
+    ]
+    parsed = parse_json(os.path.join(documents_dir, "json", "messy_json.json"))
+    assert "details.size:   Medium " in parsed["content"].split("\n")
+
+
+def test_top_level_arrays_stream_one_document_per_record(tmp_path):
+    import json
+    from app.parsers.parsers import iter_json_array, json_document
+    records = [{"name": f"Product {i}", "price": i * 1.5, "tags": ["a", "b"]} for i in range(50)]
+    path = tmp_path / "export.json"
+    path.write_text(json.dumps(records, indent=2), encoding="utf-8")
+
+    # Tiny blocks split values (e.g. "1.5") across reads
+    assert list(iter_json_array(str(path), block_size=3)) == records
+    docs = [json_document(str(path), data, record=i) for i, data in enumerate(iter_json_array(str(path)))]
+    assert len(docs) == 50
+    assert docs[7]["doc_id"] == "export_7"
+    assert docs[7]["metadata"]["title"] == "Product 7"
+    assert docs[7]["content"] == "name: Product 7\nprice: 10.5\ntags[0]: a\ntags[1]: b"
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from app.metadata_index import MetadataIndex, restrict, to_chroma_where
+
+METADATAS = [
+    {"doc_type": "pdf", "source": "a.pdf", "page": 1},
+    {"doc_type": "pdf", "source": "a.pdf", "page": 2},
+    {"doc_type": "html", "source": "b.html"},
+    {"doc_type": "docx", "source": "c.docx"},
+    {"doc_type": "json", "source": "d.json", "record": 0},
+    {"doc_type": "pdf", "source": "e.pdf", "page": 7},
+]
+
+
+def rows(where):
+    return MetadataIndex(METADATAS).rows(where).tolist()
+
+
+def test_equality_and_set_operators():
+    assert rows({"doc_type": "pdf"}) == [0, 1, 5]
+    assert rows({"doc_type": "pdf", "source": "a.pdf"}) == [0, 1]
+    assert rows({"doc_type": {"$in": ["html", "json"]}}) == [2, 4]
+    assert rows({"doc_type": ["html", "json"]}) == [2, 4]
+    assert rows({"doc_type": {"$ne": "pdf"}}) == [2, 3, 4]
+    assert rows({"doc_type": {"$nin": ["pdf", "html"]}}) == [3, 4]
+    assert rows({"page": {"$gte": 2}}) == [1, 5]
+    assert rows({"page": {"$gt": 1, "$lt": 7}}) == [1]
+    assert rows({"missing": "x"}) == []
+    # As in ChromaDB, $ne / $nin match chunks without the field
+    assert rows({"page": {"$ne": 1}}) == [1, 2, 3, 4, 5]
+    assert rows({"record": {"$nin": [0]}}) == [0, 1, 2, 3, 5]
+
+
+def test_and_or():
+    assert rows({"$and": [{"doc_type": "pdf"}, {"page": {"$lte": 2}}]}) == [0, 1]
+    assert rows({"$or": [{"doc_type": "html"}, {"source": "e.pdf"}]}) == [2, 5]
+    assert rows({"$or": [{"$and": [{"doc_type": "pdf"}, {"page": 2}]}, {"record": 0}]}) == [1, 4]
+
+
+def test_candidates():
+    index = MetadataIndex(METADATAS)
+    assert index.candidates(None) is None
+    assert index.candidates({"doc_type": "pdf"}).tolist() == [0, 1, 5]
+    np.testing.assert_array_equal(restrict(np.array([0, 2, 5, 9]), np.array([2, 3, 9])), [False, True, False, True])
+
+
+def test_negations_match_chroma(tmp_path):
+    pytest.importorskip("chromadb")
+    from app.vector_backends import ChromaBackend
+    backend = ChromaBackend(str(tmp_path), "metadata-test")
+    backend.add([f"c{i}" for i in range(len(METADATAS))], np.eye(len(METADATAS)), METADATAS)
+    for where in ({"page": {"$ne": 1}}, {"record": {"$nin": [0]}}, {"doc_type": {"$ne": "pdf"}}):
+        assert sorted(backend.get(where=where)["ids"]) == [f"c{i}" for i in rows(where)]
+
+
+def test_to_chroma_where():
+    assert to_chroma_where({"doc_type": "pdf"}) == {"doc_type": "pdf"}
+    assert to_chroma_where({"doc_type": "pdf", "source": ["a.pdf", "e.pdf"]}) == {
+        "$and": [{"doc_type": "pdf"}, {"source": {"$in": ["a.pdf", "e.pdf"]}}]}
+    assert to_chroma_where(None) is None
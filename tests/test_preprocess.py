@@ -18,3 +18,12 @@ cleaned = preprocess(sample_text)
 
 print("Cleaned text:\n")
 print(cleaned)
+
+
+def test_single_pass_matches_chained_functions():
+    from app.utils.preprocess import clean_text, normalize_lists, normalize_tables, preprocess_batch
+    texts = [sample_text, "-*- Page 3 ---\n\x0b  ▪ item next\r\n\tcol  a   b", "", "   \n\n"]
+    for text in texts:
+        assert preprocess(text) == normalize_tables(normalize_lists(clean_text(text)))
+    assert preprocess_batch(texts) == [preprocess(text) for text in texts]
+    assert preprocess_batch(texts, workers=2, chunksize=1) == [preprocess(text) for text in texts]
@@ -0,0 +1,59 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from app.bm25 import BM25Index
+from app.dense_index import DenseIndex
+from app.sharding import ShardedBM25, ShardedBackend, shard_of
+
+
+def test_sharded_bm25_matches_single_index():
+    rng = np.random.default_rng(0)
+    words = [f"w{i}" for i in range(40)]
+    corpus = [list(rng.choice(words, size=rng.integers(0, 30))) for _ in range(300)]
+    index = BM25Index(corpus)
+    shard_of_doc = [shard_of(f"c{i}", None, 4) for i in range(len(corpus))]
+    sharded = ShardedBM25(index, shard_of_doc, 4, ThreadPoolExecutor(4))
+    assert sorted(len(rows) for rows in sharded.rows) != [0, 0, 0, 300]
+    candidates = np.flatnonzero(rng.random(len(corpus)) < 0.5)
+    for _ in range(20):
+        query = list(rng.choice(words + ["unknown"], size=4))
+        np.testing.assert_allclose(sharded.get_scores(query), index.get_scores(query), rtol=1e-6)
+        np.testing.assert_allclose(sharded.get_batch_scores(query, [250, 3, 17]),
+                                   index.get_batch_scores(query, [250, 3, 17]), rtol=1e-6)
+        for rows in (None, candidates):
+            docs, scores = sharded.top_k(query, 10, rows)
+            expected_docs, expected_scores = index.top_k(query, 10, rows)
+            assert docs.tolist() == expected_docs.tolist()
+            np.testing.assert_allclose(scores, expected_scores, rtol=1e-6)
+
+
+def test_shard_key_keeps_field_values_together():
+    shards = {shard_of(f"c{i}", {"source": f"doc{i % 3}"}, 8, key="source") for i in range(0, 30, 3)}
+    assert len(shards) == 1
+
+
+def test_sharded_backend_matches_single_index(tmp_path):
+    rng = np.random.default_rng(1)
+    embeddings = rng.normal(size=(60, 8)).astype(np.float32)
+    ids = [f"c{i}" for i in range(60)]
+    metadatas = [{"source": f"doc{i % 7}", "i": i} for i in range(60)]
+    single = DenseIndex(str(tmp_path / "single"), dim=8)
+    single.add(ids, embeddings, metadatas)
+    for key in (None, "source"):
+        sharded = ShardedBackend([DenseIndex(str(tmp_path / f"{key}{s}"), dim=8) for s in range(3)], key=key)
+        sharded.add(ids, embeddings, metadatas)
+        sharded.persist()
+        assert sharded.count() == 60 and min(b.count() for b in sharded.backends) > 0
+
+        queries = rng.normal(size=(2, 8))
+        for where in (None, {"source": {"$in": ["doc1", "doc2"]}}):
+            result = sharded.query(queries, n_results=5, where=where)
+            expected = single.query(queries, n_results=5, where=where)
+            assert result["ids"] == expected["ids"]
+            np.testing.assert_allclose(result["distances"], expected["distances"], rtol=1e-5, atol=1e-6)
+
+        sharded.upsert(["c0"], embeddings[:1], [{"source": "moved", "i": 0}])
+        sharded.delete(ids=["c1", "c2"])
+        assert sharded.count() == 58
+        got = sharded.get(ids=["c0", "c1", "c3"], include=["metadatas", "embeddings"])
+        assert sorted(got["ids"]) == ["c0", "c3"] and len(got["embeddings"]) == 2
+        assert sharded.get(where={"source": "moved"})["ids"] == ["c0"]
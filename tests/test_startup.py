@@ -0,0 +1,50 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.startup import LazyResource, PhaseTimer
+
+
+class Store:
+    loads = 0
+    model = LazyResource(lambda self: self.load_model())
+
+    def __init__(self):
+        self.startup = PhaseTimer()
+
+    def load_model(self):
+        Store.loads += 1
+        time.sleep(0.05)
+        return object()
+
+
+def test_lazy_resource_loads_once_under_concurrent_access():
+    Store.loads = 0
+    store = Store()
+    assert not Store.model.is_loaded(store)
+    assert store.startup.report()["phases_ms"] == {}
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        models = list(pool.map(lambda _: store.model, range(8)))
+    assert Store.loads == 1 and all(m is models[0] for m in models)
+    assert Store.model.is_loaded(store)
+    assert store.startup.report()["phases_ms"]["model"] >= 40
+
+
+def test_lazy_resource_set_and_reload():
+    Store.loads = 0
+    store = Store()
+    store.model = "replacement"
+    assert store.model == "replacement" and Store.loads == 0
+    del store.model
+    assert not Store.model.is_loaded(store)
+    assert store.model != "replacement" and Store.loads == 1
+
+
+def test_phase_timer_records_failed_phases():
+    timer = PhaseTimer()
+    try:
+        with timer.phase("broken"):
+            raise RuntimeError
+    except RuntimeError:
+        pass
+    with timer.phase("ok"):
+        pass
+    assert set(timer.report()["phases_ms"]) == {"broken", "ok"}
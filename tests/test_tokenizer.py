@@ -0,0 +1,25 @@
+import pickle
+from app.tokenizer import Tokenizer
+
+
+def test_unicode_words_and_inner_punctuation():
+    tokenize = Tokenizer()
+    assert tokenize("Alice, 30, USA!") == ["alice", "30", "usa"]
+    assert tokenize("E-mail O'Neil about v3.5 (Zürich straße)") == ["e-mail", "o'neil", "about", "v3.5", "zürich",
+                                                                     "straße"]
+    assert tokenize("") == []
+
+
+def test_stopwords_stemming_and_batch():
+    tokenize = Tokenizer(stopwords=True, stemming=True)
+    assert tokenize("The reports are running") == ["report", "run"]
+    assert tokenize.tokenize_batch(["The reports", "running"]) == [["report"], ["run"]]
+    assert tokenize.tokenize_batch(["The reports", "running"], workers=2) == [["report"], ["run"]]
+    assert pickle.loads(pickle.dumps(tokenize)).name == tokenize.name
+
+
+def test_query_cache():
+    tokenize = Tokenizer()
+    assert tokenize.tokenize_query("Alice USA") == ("alice", "usa")
+    tokenize.tokenize_query("Alice USA")
+    assert tokenize.tokenize_query.cache_info().hits == 1
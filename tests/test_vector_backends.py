@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from app.dense_index import DenseIndex
+from app.vector_backends import HNSWBackend
+
+
+def test_hnsw_matches_exact_search_and_persists(tmp_path):
+    pytest.importorskip("hnswlib")
+    rng = np.random.default_rng(1)
+    embeddings = rng.normal(size=(200, 8)).astype(np.float32)
+    ids = [f"c{i}" for i in range(200)]
+    metadatas = [{"doc_type": "pdf" if i % 3 == 0 else "html"} for i in range(200)]
+    hnsw = HNSWBackend(str(tmp_path / "hnsw"), dim=8, initial_capacity=16)
+    exact = DenseIndex(str(tmp_path / "dense"), dim=8)
+    for backend in (hnsw, exact):
+        backend.add(ids, embeddings, metadatas)
+        backend.delete(ids=["c0", "c3"])
+
+    queries = rng.normal(size=(5, 8))
+    for where in (None, {"doc_type": "pdf"}):
+        expected = exact.query(queries, n_results=5, where=where)
+        got = hnsw.query(queries, n_results=5, where=where)
+        assert got["ids"] == expected["ids"]
+        np.testing.assert_allclose(got["distances"], expected["distances"], atol=1e-5)
+
+    hnsw.upsert(["c1"], -embeddings[1:2], [{"doc_type": "docx"}])
+    hnsw.persist()
+    reopened = HNSWBackend(str(tmp_path / "hnsw"), dim=8)
+    assert reopened.count() == 198
+    assert reopened.query(-embeddings[1:2], n_results=1, where={"doc_type": "docx"})["ids"] == [["c1"]]
+    assert "c0" not in reopened.get()["ids"]
+
+
+def test_hnsw_reuses_labels_of_deleted_items(tmp_path):
+    pytest.importorskip("hnswlib")
+    rng = np.random.default_rng(2)
+    hnsw = HNSWBackend(str(tmp_path / "hnsw"), dim=8, initial_capacity=64)
+    hnsw.add([f"a{i}" for i in range(64)], rng.normal(size=(64, 8)))
+    for round_ in range(3):
+        old = hnsw.get()["ids"][:32]
+        hnsw.delete(ids=old)
+        new_ids = [f"r{round_}_{i}" for i in range(32)]
+        embeddings = rng.normal(size=(32, 8)).astype(np.float32)
+        hnsw.add(new_ids, embeddings)
+        assert hnsw.count() == 64 and len(hnsw.ids) == 64
+        assert hnsw.index.get_max_elements() == 64 and hnsw.index.get_current_count() == 64
+        assert hnsw.query(embeddings[:3], n_results=1, include=())["ids"] == [[cid] for cid in new_ids[:3]]
+        assert not set(old) & set(hnsw.get()["ids"])
+
+    hnsw.delete(ids=["r2_0"])
+    hnsw.persist()
+    reopened = HNSWBackend(str(tmp_path / "hnsw"), dim=8)
+    reopened.add(["z"], rng.normal(size=(1, 8)))
+    assert len(reopened.ids) == 64 and reopened.count() == 64